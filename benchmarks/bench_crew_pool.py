@@ -0,0 +1,63 @@
+"""
+Benchmark per-job crew setup: building a new PhotoSearchCrew per job (before)
+versus checking one out of the CrewPool (after).
+
+No LLM or Pexels calls are made; only construction cost is measured.
+Usage: python benchmarks/bench_crew_pool.py [iterations]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("PEXELS_API_KEY", "benchmark")
+
+from crew_definition import PhotoSearchCrew
+from crew_pool import CrewPool
+
+
+def measure(setup_job, iterations):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        setup_job()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "per_job_ms": round(elapsed / iterations * 1000, 3),
+        "peak_alloc_kb": round(peak / 1024, 1),
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    logging.disable(logging.CRITICAL)
+    logger = logging.getLogger("bench")
+
+    def build_per_job():
+        PhotoSearchCrew(verbose=False, logger=logger)
+
+    pool = CrewPool(verbose=False, logger=logger)
+    pool.warm(1)
+
+    def pooled_job():
+        with pool.acquire():
+            pass
+
+    before = measure(build_per_job, iterations)
+    after = measure(pooled_job, iterations)
+    print(json.dumps({
+        "iterations": iterations,
+        "before_build_per_job": before,
+        "after_crew_pool": after,
+        "pool": pool.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
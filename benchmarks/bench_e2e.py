@@ -0,0 +1,221 @@
+"""
+Offline end-to-end benchmark: /start_job -> payment -> crew -> /status.
+
+Starts the agent's FastAPI app against a local fake Pexels API, a fake
+Masumi payment service and a deterministic stub LLM, replays prompts from a
+JSONL file at a fixed concurrency and prints a JSON report with p50/p95/p99
+latency per stage, jobs per second and peak RSS.
+
+Stages (measured by the client, so crew/payment_wait resolution is the
+status poll interval):
+  start_job     POST /start_job round trip
+  payment_wait  start_job response -> job seen running
+  crew          job seen running -> job seen completed
+  end_to_end    start_job request -> job seen completed
+  status        every GET /status round trip
+
+Each JSONL line may carry "prompt", "input_data": {"prompt": ...} or "title".
+
+Usage: python benchmarks/bench_e2e.py --prompts requests.jsonl --concurrency 8 --jobs 40 [--output report.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+import resource
+import tempfile
+import threading
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+import fake_payment_service
+import fake_pexels_service
+
+PAYMENT_PORT = 3101
+PEXELS_PORT = 3102
+APP_PORT = 3103
+STAGES = ("start_job", "payment_wait", "crew", "end_to_end", "status")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--prompts", default="requests.jsonl", help="JSONL file of prompts to replay")
+    parser.add_argument("--jobs", type=int, default=0, help="Number of jobs (default: one per prompt)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Jobs in flight at once")
+    parser.add_argument("--llm-delay", type=float, default=0.5, help="Stub LLM seconds per call")
+    parser.add_argument("--pexels-latency", type=float, default=0.2, help="Fake Pexels seconds per search")
+    parser.add_argument("--confirm-after", type=float, default=1.0, help="Seconds until a payment confirms")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="Client /status poll interval")
+    parser.add_argument("--result-cache", action="store_true", help="Leave the job result cache enabled")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    return parser.parse_args()
+
+
+def load_prompts(path):
+    prompts = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            prompt = entry.get("prompt") or (entry.get("input_data") or {}).get("prompt") or entry.get("title")
+            if prompt:
+                prompts.append(prompt)
+    if not prompts:
+        raise SystemExit(f"No prompts found in {path}")
+    return prompts
+
+
+def configure_env(args, workdir):
+    """Point the agent at the local fakes; tunables such as CREW_MAX_WORKERS keep their env values"""
+    os.environ.update({
+        "PAYMENT_SERVICE_URL": f"http://127.0.0.1:{PAYMENT_PORT}",
+        "PAYMENT_API_KEY": "bench",
+        "NETWORK": "Preprod",
+        "AGENT_IDENTIFIER": "bench-agent",
+        "SELLER_VKEY": "bench",
+        "OPENAI_API_KEY": "sk-bench",
+        "PEXELS_API_KEY": "bench",
+        "PEXELS_API_URL": f"http://127.0.0.1:{PEXELS_PORT}/v1",
+        "JOB_STORE_PATH": os.path.join(workdir, "jobs.db"),
+        "PHOTO_CATALOG_PATH": os.path.join(workdir, "photo_catalog.db"),
+        "PEXELS_CACHE_PATH": os.path.join(workdir, "pexels_cache.db"),
+        "RESULT_CACHE_ENABLED": "true" if args.result_cache else "false",
+    })
+    os.environ.setdefault("PAYMENT_POLL_INTERVAL", "0.25")
+    os.environ.setdefault("PAYMENT_STATUS_MAX_AGE", "3600")
+    os.environ.setdefault("CREW_MAX_QUEUE", str(max(16, args.concurrency)))
+
+
+def serve(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {"count": len(ordered), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+async def run_job(client, prompt, index, args, timings, outcome):
+    submitted = time.perf_counter()
+    while True:
+        response = await client.post("/start_job", json={
+            "identifier_from_purchaser": f"bench{index}",
+            "input_data": {"prompt": prompt},
+        })
+        if response.status_code != 503:
+            break
+        outcome["rejected"] += 1
+        await asyncio.sleep(args.poll_interval)
+    accepted = time.perf_counter()
+    timings["start_job"].append(accepted - submitted)
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+
+    running_at = None
+    while True:
+        await asyncio.sleep(args.poll_interval)
+        request_start = time.perf_counter()
+        status = (await client.get("/status", params={"job_id": job_id})).json()
+        now = time.perf_counter()
+        timings["status"].append(now - request_start)
+        if status["status"] != "awaiting_payment" and running_at is None:
+            running_at = now
+            timings["payment_wait"].append(running_at - accepted)
+        if status["status"] in ("completed", "failed"):
+            break
+    timings["crew"].append(now - running_at)
+    timings["end_to_end"].append(now - submitted)
+    outcome[status["status"]] += 1
+
+
+async def replay(prompts, args):
+    timings = {stage: [] for stage in STAGES}
+    outcome = {"completed": 0, "failed": 0, "rejected": 0}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    jobs = args.jobs or len(prompts)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=600) as client:
+        async def one(i):
+            async with semaphore:
+                await run_job(client, prompts[i % len(prompts)], i, args, timings, outcome)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(jobs)))
+        elapsed = time.perf_counter() - start
+    return jobs, elapsed, timings, outcome
+
+
+def main():
+    args = parse_args()
+    prompts = load_prompts(args.prompts)
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    configure_env(args, workdir)
+
+    # Only the fakes above, never the developer's .env, may configure this run
+    import dotenv
+    dotenv.load_dotenv = lambda *a, **k: False
+
+    import main as agent
+    from stub_llm import StubLLM
+
+    logging.disable(logging.INFO)
+    llm = StubLLM(delay=args.llm_delay)
+    agent.crew_pool.llm = llm
+    agent.crew_pool.verbose = False
+
+    serve(fake_payment_service.create_app(args.confirm_after), PAYMENT_PORT)
+    serve(fake_pexels_service.create_app(args.pexels_latency), PEXELS_PORT)
+    serve(agent.app, APP_PORT)
+
+    # The agent prints request details; keep stdout for the JSON report
+    with redirect_stdout(sys.stderr):
+        jobs, elapsed, timings, outcome = asyncio.run(replay(prompts, args))
+    pexels_calls = httpx.get(f"http://127.0.0.1:{PEXELS_PORT}/_stats").json()["calls"]
+    payment_calls = httpx.get(f"http://127.0.0.1:{PAYMENT_PORT}/_stats").json()["calls"]
+
+    report = {
+        "config": {
+            "jobs": jobs,
+            "concurrency": args.concurrency,
+            "llm_delay": args.llm_delay,
+            "pexels_latency": args.pexels_latency,
+            "confirm_after": args.confirm_after,
+            "crew_max_workers": agent.crew_executor.max_workers,
+            "result_cache": args.result_cache,
+        },
+        "outcome": outcome,
+        "elapsed_s": round(elapsed, 2),
+        "jobs_per_s": round(outcome["completed"] / elapsed, 3),
+        "stages": {stage: percentiles(samples) for stage, samples in timings.items()},
+        "llm_calls": llm.calls,
+        "pexels_calls": pexels_calls,
+        "payment_calls": payment_calls,
+        # Linux reports ru_maxrss in KiB; includes the in-process fakes
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare upstream payment-service traffic for N pending jobs: masumi's
+per-job monitor (before) versus the shared PaymentPoller (after), both
+against the local fake payment service.
+
+Usage: python benchmarks/bench_payment_poller.py [jobs] [confirm_after]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from masumi.config import Config
+from masumi.payment import Payment
+from payment_poller import PaymentPoller
+from fake_payment_service import create_app
+
+PORT = 3099
+
+
+def start_fake_service(confirm_after):
+    server = uvicorn.Server(uvicorn.Config(create_app(confirm_after), host="127.0.0.1", port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def list_calls(config):
+    import httpx
+    async with httpx.AsyncClient() as client:
+        return (await client.get(f"{config.payment_service_url}/_stats")).json()["calls"].get("list", 0)
+
+
+async def create_payments(config, jobs):
+    payments = []
+    for i in range(jobs):
+        payment = Payment(agent_identifier="bench", config=config, network="Preprod",
+                          identifier_from_purchaser=f"p{i}", input_data={"prompt": "x"})
+        request = await payment.create_payment_request()
+        payments.append((payment, request["data"]["blockchainIdentifier"]))
+    return payments
+
+
+async def run(jobs, confirm_after, interval):
+    config = Config(payment_service_url=f"http://127.0.0.1:{PORT}", payment_api_key="bench")
+
+    # Before: one masumi monitoring loop per job
+    confirmed = asyncio.Event()
+    done = set()
+    before_start = await list_calls(config)
+    payments = await create_payments(config, jobs)
+    start = time.perf_counter()
+    for payment, bid in payments:
+        async def callback(payment_id):
+            done.add(payment_id)
+            if len(done) == jobs:
+                confirmed.set()
+        await payment.start_status_monitoring(callback, interval_seconds=interval)
+    await confirmed.wait()
+    before = {"upstream_list_calls": await list_calls(config) - before_start,
+              "seconds_to_confirm_all": round(time.perf_counter() - start, 2)}
+    for payment, _ in payments:
+        payment.stop_status_monitoring()
+
+    # After: a single poller for all jobs
+    confirmed = asyncio.Event()
+    done = set()
+
+    async def on_confirmed(job_id, bid):
+        done.add(bid)
+        if len(done) == jobs:
+            confirmed.set()
+
+    poller = PaymentPoller(
+        payment_factory=lambda: Payment(agent_identifier="bench", config=config, network="Preprod"),
+        on_confirmed=on_confirmed, base_interval=interval
+    )
+    after_start = await list_calls(config)
+    payments = await create_payments(config, jobs)
+    start = time.perf_counter()
+    poller.start()
+    for i, (_, bid) in enumerate(payments):
+        poller.track(bid, f"job-{i}")
+    await confirmed.wait()
+    await poller.stop()
+    after = {"upstream_list_calls": await list_calls(config) - after_start,
+             "seconds_to_confirm_all": round(time.perf_counter() - start, 2)}
+    return {"jobs": jobs, "interval_seconds": interval, "before_per_job_monitor": before, "after_shared_poller": after}
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    confirm_after = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    logging.disable(logging.CRITICAL)
+    start_fake_service(confirm_after)
+    print(json.dumps(asyncio.run(run(jobs, confirm_after, interval=1.0)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
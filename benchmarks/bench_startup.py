@@ -0,0 +1,146 @@
+"""
+Cold-start benchmark: import profile of main.py and time until the API answers.
+
+1. Runs `python -X importtime -c "import main"` in a fresh interpreter and
+   reports its total import time plus the slowest modules it imports directly.
+2. Starts the app with uvicorn in a subprocess (as Railway does) and measures,
+   from process launch, when /health first answers and when the background
+   warm-up has loaded crewai/masumi and built the crews (from /startup).
+
+The payment service and Pexels are not contacted; dummy credentials are used.
+
+Usage: python benchmarks/bench_startup.py [--warm background|blocking|off] [--top 15] [--output report.json]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--warm", default="background", help="STARTUP_WARM mode to start the app with")
+    parser.add_argument("--top", type=int, default=15, help="Slowest direct imports to list")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for the app")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    return parser.parse_args()
+
+
+def bench_env(workdir, warm):
+    env = dict(os.environ)
+    env.update({
+        "PAYMENT_SERVICE_URL": "http://127.0.0.1:9",
+        "PAYMENT_API_KEY": "bench",
+        "NETWORK": "Preprod",
+        "AGENT_IDENTIFIER": "bench-agent",
+        "OPENAI_API_KEY": "sk-bench",
+        "PEXELS_API_KEY": "bench",
+        "JOB_STORE_PATH": os.path.join(workdir, "jobs.db"),
+        "PHOTO_CATALOG_PATH": os.path.join(workdir, "photo_catalog.db"),
+        "PEXELS_CACHE_PATH": os.path.join(workdir, "pexels_cache.db"),
+        "STARTUP_WARM": warm,
+        "CREW_VERBOSE": "false",
+    })
+    return env
+
+
+def import_profile(env, top):
+    """Parse `-X importtime` output into main's import time and its slowest direct imports (cumulative ms)"""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise SystemExit(f"import main failed:\n{proc.stderr[-2000:]}")
+    modules = {}
+    loaded = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        loaded.add(name.strip().split(".")[0])
+        # One space before top-level names, two more per nesting level: keep main and what it imports directly
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            modules[name.strip()] = int(cumulative) / 1000
+    main_ms = modules.pop("main", 0)
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "wall_s": round(wall, 3),
+        "main_ms": round(main_ms, 1),
+        "slowest_ms": {name: round(ms, 1) for name, ms in slowest},
+        "crewai_loaded": "crewai" in loaded,
+        "masumi_loaded": "masumi" in loaded,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_profile(env, timeout):
+    """Launch uvicorn and time /health and the warm-up milestones from process start"""
+    port = free_port()
+    launched = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    first_health = None
+    report = None
+    try:
+        while time.perf_counter() - launched < timeout:
+            if proc.poll() is not None:
+                raise SystemExit(f"uvicorn exited with code {proc.returncode}")
+            try:
+                health = httpx.get(base + "/health", timeout=1).json()
+            except httpx.HTTPError:
+                time.sleep(0.02)
+                continue
+            if first_health is None:
+                first_health = time.perf_counter() - launched
+            if health.get("crews_ready") or env["STARTUP_WARM"] == "off":
+                report = httpx.get(base + "/startup", timeout=1).json()
+                break
+            time.sleep(0.05)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {
+        "first_health_s": round(first_health, 3) if first_health is not None else None,
+        "startup": report,
+    }
+
+
+def main():
+    args = parse_args()
+    env = bench_env(tempfile.mkdtemp(prefix="bench_startup_"), args.warm)
+    report = {
+        "config": {"warm": args.warm, "python": sys.version.split()[0]},
+        "import": import_profile(env, args.top),
+        "serve": serve_profile(env, args.timeout),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
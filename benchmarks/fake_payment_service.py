@@ -0,0 +1,86 @@
+"""
+Local fake of the Masumi payment service endpoints used by the agent.
+
+Payments confirm (onChainState=FundsLocked) `confirm_after` seconds after they
+are created. GET /_stats reports how many requests each endpoint received.
+Usage: python benchmarks/fake_payment_service.py [port] [confirm_after]
+"""
+import sys
+import time
+import uuid
+from collections import Counter
+from fastapi import FastAPI, Request
+
+
+def create_app(confirm_after: float = 2.0) -> FastAPI:
+    app = FastAPI(title="Fake Masumi Payment Service")
+    payments = {}
+    calls = Counter()
+
+    def view(payment: dict) -> dict:
+        state = payment["onChainState"]
+        if state is None and time.time() - payment["created_at"] >= confirm_after:
+            state = payment["onChainState"] = "FundsLocked"
+        return {
+            "blockchainIdentifier": payment["blockchainIdentifier"],
+            "onChainState": state,
+            "NextAction": {"requestedAction": "WaitingForExternalAction"},
+        }
+
+    @app.post("/payment/")
+    async def create_payment(request: Request):
+        calls["create"] += 1
+        body = await request.json()
+        blockchain_identifier = uuid.uuid4().hex
+        payments[blockchain_identifier] = {
+            "blockchainIdentifier": blockchain_identifier,
+            "created_at": time.time(),
+            "onChainState": None,
+            "inputHash": body.get("inputHash"),
+        }
+        return {"status": "success", "data": {
+            "blockchainIdentifier": blockchain_identifier,
+            "payByTime": body.get("payByTime"),
+            "submitResultTime": body.get("submitResultTime"),
+            "unlockTime": body.get("submitResultTime"),
+            "externalDisputeUnlockTime": body.get("submitResultTime"),
+        }}
+
+    @app.get("/payment/")
+    async def list_payments(limit: int = 10, cursorId: str = None):
+        calls["list"] += 1
+        ids = sorted(payments)
+        if cursorId:
+            ids = [i for i in ids if i > cursorId]
+        page = [view(payments[i]) for i in ids[:limit]]
+        cursor = page[-1]["blockchainIdentifier"] if len(page) == limit else None
+        return {"status": "success", "data": {"Payments": page, "cursorId": cursor}}
+
+    @app.post("/payment/resolve-blockchain-identifier")
+    async def resolve_payment(request: Request):
+        calls["resolve"] += 1
+        body = await request.json()
+        payment = payments.get(body.get("blockchainIdentifier"))
+        return {"status": "success", "data": view(payment) if payment else None}
+
+    @app.post("/payment/submit-result")
+    async def submit_result(request: Request):
+        calls["submit_result"] += 1
+        body = await request.json()
+        payment = payments.get(body.get("blockchainIdentifier"))
+        if payment:
+            payment["onChainState"] = "ResultSubmitted"
+        return {"status": "success", "data": {"blockchainIdentifier": body.get("blockchainIdentifier")}}
+
+    @app.get("/_stats")
+    async def stats():
+        return {"payments": len(payments), "calls": dict(calls)}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 3001
+    confirm_after = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    uvicorn.run(create_app(confirm_after), host="127.0.0.1", port=port)
@@ -0,0 +1,67 @@
+"""
+Local fake of the Pexels search API.
+
+GET /v1/search returns page `page` of deterministic photos whose alt text is
+built from the query (with `next_page` while more remain), after `latency`
+seconds. GET /v1/photos/{id} returns one photo (its alt text no longer knows
+the query). GET /_stats reports request counts.
+Usage: python benchmarks/fake_pexels_service.py [port] [latency]
+"""
+import sys
+import asyncio
+import zlib
+from collections import Counter
+from fastapi import FastAPI
+
+
+def fake_photo(photo_id: int, query: str) -> dict:
+    width, height = (1920, 1280) if photo_id % 3 else (1080, 1620)
+    return {
+        "id": photo_id,
+        "width": width,
+        "height": height,
+        "url": f"https://www.pexels.com/photo/{photo_id}/",
+        "photographer": f"Photographer {photo_id % 97}",
+        "photographer_url": f"https://www.pexels.com/@photographer-{photo_id % 97}",
+        "alt": f"{query.capitalize()} scene number {photo_id % 1000}",
+        "src": {
+            "original": f"https://images.pexels.com/photos/{photo_id}/pexels-photo-{photo_id}.jpeg",
+            "medium": f"https://images.pexels.com/photos/{photo_id}/pexels-photo-{photo_id}.jpeg?h=350",
+        },
+    }
+
+
+def create_app(latency: float = 0.2, total_results: int = 500) -> FastAPI:
+    app = FastAPI(title="Fake Pexels API")
+    calls = Counter()
+
+    @app.get("/v1/search")
+    async def search(query: str, per_page: int = 15, page: int = 1, orientation: str = None):
+        calls["search"] += 1
+        await asyncio.sleep(latency)
+        base = zlib.crc32(query.lower().encode()) % 1_000_000 * 1000
+        start = (page - 1) * per_page
+        photos = [fake_photo(base + i, query) for i in range(start, min(start + per_page, total_results))]
+        result = {"page": page, "per_page": per_page, "total_results": total_results, "photos": photos}
+        if start + per_page < total_results:
+            result["next_page"] = f"/v1/search/?page={page + 1}&per_page={per_page}&query={query}"
+        return result
+
+    @app.get("/v1/photos/{photo_id}")
+    async def photo(photo_id: int):
+        calls["photo"] += 1
+        await asyncio.sleep(latency)
+        return fake_photo(photo_id, "photo")
+
+    @app.get("/_stats")
+    async def stats():
+        return {"calls": dict(calls)}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 3002
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    uvicorn.run(create_app(latency), host="127.0.0.1", port=port)
@@ -0,0 +1,114 @@
+"""
+Deterministic stand-in for the OpenAI LLM, for offline benchmarks.
+
+Each call sleeps `delay` seconds, then answers in CrewAI's text (ReAct) format:
+the query analyst gets search queries built from the prompt's content words,
+the curator calls the multi-query search tool (with the queries it was given
+if the analyst was skipped) until photo lines come back and then picks five
+of them by ID as a CuratedPicks JSON final answer.
+"""
+import os
+import re
+import sys
+import json
+import time
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crewai.events.types.llm_events import LLMCallType
+from crewai.llms.base_llm import BaseLLM
+from prompt_text import content_words
+
+MULTI_SEARCH_TOOL = re.compile(r"Tool Name: (\S*multiple_queries)", re.IGNORECASE)
+PHOTO_LINE = re.compile(r"^\d+\.\s+(.*)$", re.MULTILINE)
+# Queries handed to the curator when the rule-based expansion skipped the analyst
+GIVEN_QUERIES = re.compile(r"using these search queries:\n((?:\d+\. .*\n?)+)", re.IGNORECASE)
+
+
+def _text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(m.get("content") or "") for m in messages)
+
+
+def _prompt(text: str) -> str:
+    match = re.search(r'request: "(.*?)"', text, re.DOTALL)
+    return match.group(1) if match else ""
+
+
+def _queries(prompt: str, text: str = "") -> list:
+    given = GIVEN_QUERIES.search(text)
+    if given:
+        return [line.split(". ", 1)[1].strip() for line in given.group(1).splitlines() if ". " in line]
+    words = list(dict.fromkeys(content_words(prompt))) or ["stock"]
+    queries = [" ".join(words[:3]), " ".join(words[1:4]) or words[0], words[0]]
+    return list(dict.fromkeys(q for q in queries if q))
+
+
+def _parse_photos(text: str) -> list:
+    photos = []
+    for line in PHOTO_LINE.findall(text):
+        fields = dict(part.split(": ", 1) for part in line.split(" | ") if ": " in part)
+        if "id" not in fields:
+            continue
+        width, _, height = fields.get("size", "0x0").partition("x")
+        photos.append({
+            "id": int(fields["id"]),
+            "description": fields.get("description", ""),
+            "photographer": fields.get("photographer", ""),
+            "photographer_url": fields.get("photographer_url", ""),
+            "width": int(width or 0),
+            "height": int(height or 0),
+            "pexels_url": fields.get("pexels_url", ""),
+            "thumbnail_url": fields.get("thumbnail_url", ""),
+            "original_url": fields.get("original_url", ""),
+        })
+    return photos
+
+
+class StubLLM(BaseLLM):
+    """Offline LLM with a fixed per-call delay (seconds)."""
+    delay: float = 0.5
+    calls: int = 0
+
+    def __init__(self, delay: float = 0.5, **kwargs):
+        super().__init__(model="stub", delay=delay, **kwargs)
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None) -> Any:
+        self._emit_call_started_event(messages=messages, from_task=from_task, from_agent=from_agent)
+        time.sleep(self.delay)
+        self.calls += 1
+        text = _text(messages)
+        response = self._respond(text)
+        # Rough token estimate (4 characters per token) so usage metrics have data
+        usage = {"prompt_tokens": len(text) // 4, "completion_tokens": len(response) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self._emit_call_completed_event(
+            response=response, call_type=LLMCallType.LLM_CALL, from_task=from_task,
+            from_agent=from_agent, messages=messages, usage=usage
+        )
+        return response
+
+    def _respond(self, text: str) -> str:
+        prompt = _prompt(text)
+        tool = MULTI_SEARCH_TOOL.search(text)
+        if tool is None:
+            queries = _queries(prompt)
+            return "Thought: I now know the final answer\nFinal Answer: " + "\n".join(
+                f"{i}. {q}" for i, q in enumerate(queries, 1)
+            )
+        photos = _parse_photos(text)
+        if not photos:
+            return (
+                "Thought: I should search for all queries at once\n"
+                f"Action: {tool.group(1)}\n"
+                f"Action Input: {json.dumps({'queries': _queries(prompt, text), 'per_page': 15})}"
+            )
+        ids = [photo["id"] for photo in photos]
+        selection = {"closest_matches": ids[:3], "varied_options": ids[3:5]}
+        return "Thought: I now know the final answer\nFinal Answer: " + json.dumps(selection)
@@ -1,46 +1,127 @@
 import os
 from crewai import Agent, Crew, Task, LLM
 from logging_config import get_logger
-from pexels_tool import PexelsSearchTool
+from job_events import emit
+from metrics import QUERY_EXPANSION_TOTAL
+from query_expansion import expand_query, min_confidence_from_env
+from pexels_tool import PexelsSearchTool, PexelsMultiSearchTool
+from photo_records import CURATION_FIELDS
+from photo_registry import hydrate
+from results_formatter import CuratedPicks, render_results
+
+
+_api_key_logged = False
+
+
+def _log_openai_key(logger):
+    """Log whether the OpenAI key is configured, once per process"""
+    global _api_key_logged
+    if _api_key_logged:
+        return
+    _api_key_logged = True
+    openai_key = os.getenv("OPENAI_API_KEY")
+    if openai_key:
+        logger.info("OpenAI API key found: %s...%s", openai_key[:10], openai_key[-4:] if len(openai_key) > 14 else '***')
+    else:
+        logger.warning("OPENAI_API_KEY not found in environment variables!")
+
+
+def render_curated_result(result):
+    """After-kickoff hook: replace the curator's raw output with the deterministic rendering of its picks"""
+    picks = result.pydantic
+    if isinstance(picks, CuratedPicks):
+        result.raw = render_results(hydrate(picks))
+    else:
+        get_logger(__name__).warning("Curator did not return structured output, returning its raw text")
+    return result
+
+
+def report_task_progress(output):
+    """Task callback: stream each finished task's output to the subscribers of the running job"""
+    name = output.name or "task"
+    if name == "analysis":
+        emit("queries", text=output.raw)
+    elif name == "curation":
+        if isinstance(output.pydantic, CuratedPicks):
+            # Each pick is usable as soon as the curator is done, before the results are rendered
+            selection = hydrate(output.pydantic)
+            for category, photos in (("closest_matches", selection.closest_matches),
+                                     ("varied_options", selection.varied_options)):
+                for photo in photos:
+                    emit("photo", category=category, **photo.model_dump())
+        else:
+            emit("selection", text=output.raw)
+    emit("task_completed", task=name)
 
 
 class PhotoSearchCrew:
-    def __init__(self, verbose=True, logger=None, model=None):
+    def __init__(self, verbose=True, logger=None, model=None, llm=None, pexels_tool=None, pexels_multi_tool=None, formatter=None):
         self.verbose = verbose
+        # 'deterministic' renders the curator's structured picks in Python, 'llm' uses the formatter agent
+        self.formatter = (formatter or os.getenv("RESULTS_FORMATTER", "deterministic")).lower()
         self.logger = logger or get_logger(__name__)
         
         # Check OpenAI API key
-        openai_key = os.getenv("OPENAI_API_KEY")
-        if openai_key:
-            self.logger.info(f"OpenAI API key found: {openai_key[:10]}...{openai_key[-4:] if len(openai_key) > 14 else '***'}")
-        else:
-            self.logger.warning("OPENAI_API_KEY not found in environment variables!")
+        _log_openai_key(self.logger)
         
-        # Configure LLM - support custom model, default to gpt-5-mini
+        # Configure LLM - reuse a shared one if given, else support custom model, default to gpt-5-mini
         try:
-            if model:
-                self.logger.info(f"Initializing LLM with custom model: {model}")
+            if llm is not None:
+                self.llm = llm
+            elif model:
+                self.logger.info("Initializing LLM with custom model: %s", model)
                 self.llm = LLM(model=model)
-                self.logger.info(f"LLM initialized successfully with model: {model}")
+                self.logger.info("LLM initialized successfully with model: %s", model)
             else:
                 default_model = "gpt-5-mini"
-                self.logger.info(f"Initializing LLM with default model: {default_model}")
+                self.logger.info("Initializing LLM with default model: %s", default_model)
                 self.llm = LLM(model=default_model)
-                self.logger.info(f"LLM initialized successfully with default model: {default_model}")
+                self.logger.info("LLM initialized successfully with default model: %s", default_model)
         except Exception as e:
-            self.logger.error(f"Failed to initialize LLM: {str(e)}", exc_info=True)
+            self.logger.error("Failed to initialize LLM: %s", e, exc_info=True)
             raise
         
-        # Initialize Pexels tool
-        pexels_api_key = os.getenv("PEXELS_API_KEY")
-        if not pexels_api_key:
-            raise ValueError("PEXELS_API_KEY not found in environment variables")
-        
-        self.pexels_tool = PexelsSearchTool(api_key=pexels_api_key)
+        # Initialize Pexels tools (shared tools are stateless and safe to reuse)
+        if pexels_tool is not None and pexels_multi_tool is not None:
+            self.pexels_tool = pexels_tool
+            self.pexels_multi_tool = pexels_multi_tool
+        else:
+            pexels_api_key = os.getenv("PEXELS_API_KEY")
+            if not pexels_api_key:
+                raise ValueError("PEXELS_API_KEY not found in environment variables")
+            # The deterministic formatter fills URLs and attribution in by photo ID, so the curator doesn't need them
+            fields = CURATION_FIELDS if self.formatter != "llm" and not os.getenv("PEXELS_PHOTO_FIELDS") else None
+            self.pexels_tool = PexelsSearchTool(api_key=pexels_api_key, fields=fields)
+            self.pexels_multi_tool = PexelsMultiSearchTool(api_key=pexels_api_key, fields=fields)
         self.crew = self.create_crew()
+        # Same pipeline without the analyst, for prompts the rule-based expansion handles
+        self.fast_crew = self.create_crew(with_analysis=False)
         self.logger.info("PhotoSearchCrew initialized")
 
-    def create_crew(self):
+    def plan(self, prompt):
+        """
+        Choose the crew for a prompt
+
+        Short, concrete prompts get their search queries from expand_query()
+        and skip the analyst's LLM call; the rest run the full crew.
+
+        Returns:
+            (crew, kickoff inputs)
+        """
+        expansion = expand_query(prompt)
+        if expansion.confidence < min_confidence_from_env():
+            QUERY_EXPANSION_TOTAL.inc(source="llm")
+            return self.crew, {"prompt": prompt}
+        self.logger.info("Skipping query analyst (confidence %.2f): %s", expansion.confidence, expansion.queries)
+        QUERY_EXPANSION_TOTAL.inc(source="rules")
+        emit("queries", text=expansion.as_text(), source="rules", confidence=expansion.confidence)
+        return self.fast_crew, {"prompt": prompt, "queries": expansion.as_text()}
+
+    def create_crew(self, with_analysis=True):
+        """
+        Build the crew; without analysis the curator is given the search
+        queries as the 'queries' kickoff input instead of asking the analyst.
+        """
         self.logger.info("Creating photo search crew with agents")
         
         # Agent 1: Query Analyst - Understands user intent and refines search terms
@@ -57,21 +138,105 @@ class PhotoSearchCrew:
         )
 
         # Agent 2: Photo Curator - Searches and selects the best photos
+        if self.formatter == "llm":
+            url_handling = (
+                'You are meticulous about preserving exact URLs from the API responses - you NEVER '
+                'modify, shorten, or recreate URLs. You copy them exactly as provided.'
+            )
+        else:
+            url_handling = 'You refer to photos by their Pexels photo ID.'
         photo_curator = Agent(
             role='Stock Photo Curator',
             goal='Search Pexels for high-quality stock photos that perfectly match the user\'s needs',
             backstory=(
                 'You are a professional photo curator with an eye for quality and relevance. '
                 'You use the Pexels API to find photos and select the most appropriate ones based on '
-                'composition, quality, relevance, and usability for various projects. '
-                'You are meticulous about preserving exact URLs from the API responses - you NEVER '
-                'modify, shorten, or recreate URLs. You copy them exactly as provided.'
+                'composition, quality, relevance, and usability for various projects. ' + url_handling
             ),
-            tools=[self.pexels_tool],
+            tools=[self.pexels_multi_tool, self.pexels_tool],
             llm=self.llm,
             verbose=self.verbose
         )
 
+        self.logger.info("Created query analyst and photo curator agents")
+
+        analysis_task = Task(
+            name='analysis',
+            description=(
+                'Analyze this user request: "{prompt}"\n\n'
+                'Extract 2-4 effective search queries that will find the most relevant stock photos. '
+                'Consider synonyms, related concepts, and different ways to describe what the user needs. '
+                'Be specific and creative with your search terms.'
+            ),
+            expected_output=(
+                'A list of 2-4 optimized search queries with brief explanations of why each query '
+                'will help find relevant photos for the user\'s request.'
+            ),
+            agent=query_analyst
+        )
+
+        # Without analysis the crew starts at curation
+        first_agents, first_tasks = ([query_analyst], [analysis_task]) if with_analysis else ([], [])
+        if with_analysis:
+            searching = (
+                'Using the search queries from the analyst, search Pexels for stock photos. '
+                'Call the multi-query search tool ONCE with ALL of the analyst\'s queries, '
+            )
+        else:
+            searching = (
+                'Search Pexels for stock photos using these search queries:\n{queries}\n\n'
+                'Call the multi-query search tool ONCE with ALL of these queries, '
+            )
+        curation_description = searching + (
+            'requesting 15-18 photos per query '
+            'to ensure a wide selection while keeping data manageable. Only use the single-query search tool '
+            'for a follow-up search if the combined results are not good enough. '
+            'Review all results and select 5 photos total, organized into TWO categories for the user\'s request: "{prompt}": '
+            '\n\nCATEGORY 1 - Closest Matches (2-3 photos): '
+            'Select 2-3 photos that are the MOST DIRECT match to the user\'s original request. '
+            'These should match the prompt as closely as possible in subject, style, mood, and context. '
+            '\n\nCATEGORY 2 - Varied but Related (2-3 photos): '
+            'Select 2-3 photos that are still related to the prompt but offer more variety - different angles, '
+            'compositions, styles, or interpretations while still being relevant. These should complement the '
+            'closest matches by providing alternative perspectives. '
+            '\n\nUse the photo descriptions (alt text) to understand what each photo contains. '
+        )
+        if self.formatter == "llm":
+            curation_description += (
+                'For EACH photo include: '
+                'Photo description, Photo ID, photographer name with markdown link, dimensions, Pexels page link, '
+                'Thumbnail URL, and Original download link. Clearly label which category each photo belongs to. '
+                '\n\nIMPORTANT: You must copy the EXACT URLs from the Pexels API response. '
+                'Do NOT modify or create new URLs. Use the exact Pexels page URL and Original photo URL '
+                'provided by the API for each selected photo.'
+            )
+        else:
+            curation_description += (
+                'Answer with the Photo ID of each selected photo only; links and attribution are added afterwards.'
+            )
+
+        if self.formatter != "llm":
+            # Curator returns photo IDs only; hydrate() fills in the details and render_results()
+            # lays them out without a third LLM call
+            curation_task = Task(
+                name='curation',
+                description=curation_description,
+                expected_output=(
+                    'The Photo IDs of the 5 selected photos split into closest_matches (2-3 IDs) '
+                    'and varied_options (2-3 IDs).'
+                ),
+                agent=photo_curator,
+                output_pydantic=CuratedPicks
+            )
+            crew = Crew(
+                agents=[*first_agents, photo_curator],
+                tasks=[*first_tasks, curation_task],
+                task_callback=report_task_progress,
+                after_kickoff_callbacks=[render_curated_result]
+            )
+            self.logger.info("Crew setup completed (deterministic results formatting)")
+            return crew
+
         # Agent 3: Results Formatter - Organizes and presents the final selection
         results_formatter = Agent(
             role='Results Presenter',
@@ -86,44 +251,15 @@ class PhotoSearchCrew:
             llm=self.llm,
             verbose=self.verbose
         )
-
-        self.logger.info("Created query analyst, photo curator, and results formatter agents")
+        self.logger.info("Created results formatter agent")
 
         crew = Crew(
-            agents=[query_analyst, photo_curator, results_formatter],
+            agents=[*first_agents, photo_curator, results_formatter],
             tasks=[
+                *first_tasks,
                 Task(
-                    description=(
-                        'Analyze this user request: "{prompt}"\n\n'
-                        'Extract 2-4 effective search queries that will find the most relevant stock photos. '
-                        'Consider synonyms, related concepts, and different ways to describe what the user needs. '
-                        'Be specific and creative with your search terms.'
-                    ),
-                    expected_output=(
-                        'A list of 2-4 optimized search queries with brief explanations of why each query '
-                        'will help find relevant photos for the user\'s request.'
-                    ),
-                    agent=query_analyst
-                ),
-                Task(
-                    description=(
-                        'Using the search queries from the analyst, search Pexels for stock photos. '
-                        'For each query, request 15-18 photos to ensure a wide selection while keeping data manageable. '
-                        'Review all results and select 5 photos total, organized into TWO categories for the user\'s request: "{prompt}": '
-                        '\n\nCATEGORY 1 - Closest Matches (2-3 photos): '
-                        'Select 2-3 photos that are the MOST DIRECT match to the user\'s original request. '
-                        'These should match the prompt as closely as possible in subject, style, mood, and context. '
-                        '\n\nCATEGORY 2 - Varied but Related (2-3 photos): '
-                        'Select 2-3 photos that are still related to the prompt but offer more variety - different angles, '
-                        'compositions, styles, or interpretations while still being relevant. These should complement the '
-                        'closest matches by providing alternative perspectives. '
-                        '\n\nUse the photo descriptions (alt text) to understand what each photo contains. For EACH photo include: '
-                        'Photo description, Photo ID, photographer name with markdown link, dimensions, Pexels page link, '
-                        'Thumbnail URL, and Original download link. Clearly label which category each photo belongs to. '
-                        '\n\nIMPORTANT: You must copy the EXACT URLs from the Pexels API response. '
-                        'Do NOT modify or create new URLs. Use the exact Pexels page URL and Original photo URL '
-                        'provided by the API for each selected photo.'
-                    ),
+                    name='curation',
+                    description=curation_description,
                     expected_output=(
                         'A curated collection of 5 photos organized into two categories. For EACH photo include: '
                         'Category label (Closest Match OR Varied/Related), Photo description, Photo ID, photographer name with markdown link, '
@@ -133,6 +269,7 @@ class PhotoSearchCrew:
                     agent=photo_curator
                 ),
                 Task(
+                    name='formatting',
                     description=(
                         'Take the curated selection of 5 photos (organized into two categories by the curator) and format them into TWO SECTIONS. '
                         '\n\nSECTION 1 - Closest Matches: '
@@ -165,7 +302,8 @@ class PhotoSearchCrew:
                     ),
                     agent=results_formatter
                 )
-            ]
+            ],
+            task_callback=report_task_progress
         )
         self.logger.info("Crew setup completed")
         return crew
\ No newline at end of file
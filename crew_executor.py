@@ -0,0 +1,142 @@
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from logging_config import get_logger
+
+
+class CrewCapacityError(RuntimeError):
+    """Raised when a reservation is asked for while every worker and queue slot is taken."""
+
+
+class CrewExecutor:
+    """
+    Runs blocking crew kickoffs on a bounded thread pool so the event loop
+    keeps serving /status, /health and payment callbacks while crews work.
+
+    Capacity (`max_workers` running plus `max_queue` waiting) is handed out as
+    reservations when a job is accepted and held until it finishes, so a job
+    that was admitted and paid for always gets to run. Reservations not used
+    by a run within `reservation_ttl` seconds (unpaid jobs) lapse. Runs are
+    never rejected: one without a reservation waits for a free worker.
+    """
+
+    def __init__(self, max_workers=None, max_queue=None, reservation_ttl=None, logger=None):
+        self.logger = logger or get_logger(__name__)
+        self.max_workers = max_workers or int(os.getenv("CREW_MAX_WORKERS", "4"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("CREW_MAX_QUEUE", "16"))
+        self.reservation_ttl = reservation_ttl or float(os.getenv("CREW_RESERVATION_TTL", "900"))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crew")
+        self._lock = threading.Lock()
+        self.running = 0
+        self.queued = 0
+        # key -> [slots, expires_at]; expires_at is None once a run used the reservation
+        self._reservations = {}
+        # Runs without a reservation, which take capacity of their own
+        self._unreserved = 0
+        self.logger.info("Crew executor ready: %s workers, queue of %s", self.max_workers, self.max_queue)
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def _occupied(self):
+        """Reserved slots plus unreserved runs (call with the lock held)"""
+        now = time.monotonic()
+        for key in [key for key, (_, expires_at) in self._reservations.items() if expires_at is not None and expires_at < now]:
+            del self._reservations[key]
+        return sum(slots for slots, _ in self._reservations.values()) + self._unreserved
+
+    @property
+    def free_slots(self):
+        with self._lock:
+            return max(0, self.capacity - self._occupied())
+
+    def reserve(self, key, slots=1):
+        """
+        Hold capacity for a job from its acceptance until release(key)
+
+        Raises:
+            CrewCapacityError: If fewer than `slots` slots are free
+        """
+        with self._lock:
+            occupied = self._occupied()
+            if occupied + slots > self.capacity:
+                raise CrewCapacityError(f"Crew executor at capacity ({occupied} of {self.capacity} slots taken)")
+            self._reservations[key] = [slots, time.monotonic() + self.reservation_ttl]
+
+    def release(self, key):
+        """Give a job's reserved capacity back (no-op without a reservation)"""
+        with self._lock:
+            self._reservations.pop(key, None)
+
+    def has_capacity(self):
+        return self.free_slots > 0
+
+    def stats(self):
+        """
+        Snapshot of the executor load
+
+        Returns:
+            dict with worker/queue limits and current usage
+        """
+        with self._lock:
+            running, queued = self.running, self.queued
+            occupied = self._occupied()
+            reserved = len(self._reservations)
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": running,
+            "queued": queued,
+            "reserved": reserved,
+            "free_slots": max(0, self.capacity - occupied),
+        }
+
+    async def run(self, fn, *args, reservation=None, **kwargs):
+        """
+        Run a blocking callable on the worker pool and await its result
+
+        Args:
+            fn: The blocking callable (e.g. a crew kickoff)
+            *args, **kwargs: Passed through to fn
+            reservation: Key of the reservation the run uses; without one the run
+                takes capacity of its own (and may wait beyond max_queue)
+
+        Returns:
+            Whatever fn returns
+        """
+        with self._lock:
+            reserved = self._reservations.get(reservation)
+            if reserved is not None:
+                reserved[1] = None
+            else:
+                self._unreserved += 1
+            self.queued += 1
+
+        def work():
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        # Like asyncio.to_thread, carry the caller's context (request priority, shared searches) to the worker
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool, context.run, work)
+        finally:
+            if reserved is None:
+                with self._lock:
+                    self._unreserved -= 1
+
+    def shutdown(self, wait=False):
+        """Stop accepting work and release the worker threads"""
+        self.logger.info("Shutting down crew executor")
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,99 @@
+import threading
+from typing import Dict, Iterable
+from crewai.events import crewai_event_bus
+from crewai.events.types.llm_events import LLMCallCompletedEvent
+from crewai.events.types.task_events import TaskCompletedEvent, TaskFailedEvent, TaskStartedEvent
+from logging_config import get_logger
+from metrics import CREW_TASK_SECONDS, LLM_CALLS_TOTAL, LLM_TOKENS_TOTAL
+
+logger = get_logger(__name__)
+
+# task_id -> per-task record, only for tasks a caller asked to watch
+_records: Dict[str, dict] = {}
+_records_lock = threading.Lock()
+_handlers_registered = False
+
+
+def _record(event):
+    with _records_lock:
+        return _records.get(str(event.task_id)) if event.task_id else None
+
+
+def _on_task_started(source, event):
+    record = _record(event)
+    if record is not None:
+        record["started"] = event.timestamp
+
+
+def _on_task_finished(source, event):
+    record = _record(event)
+    if record is not None and record.get("started") is not None:
+        record["seconds"] = (event.timestamp - record["started"]).total_seconds()
+
+
+def _on_llm_call_completed(source, event):
+    record = _record(event)
+    if record is None:
+        return
+    usage = event.usage or {}
+    record["llm_calls"] += 1
+    record["prompt_tokens"] += int(usage.get("prompt_tokens") or 0)
+    record["completion_tokens"] += int(usage.get("completion_tokens") or 0)
+
+
+def _register_handlers() -> None:
+    global _handlers_registered
+    with _records_lock:
+        if _handlers_registered:
+            return
+        _handlers_registered = True
+    crewai_event_bus.on(TaskStartedEvent)(_on_task_started)
+    crewai_event_bus.on(TaskCompletedEvent)(_on_task_finished)
+    crewai_event_bus.on(TaskFailedEvent)(_on_task_finished)
+    crewai_event_bus.on(LLMCallCompletedEvent)(_on_llm_call_completed)
+
+
+def watch(tasks: Iterable) -> None:
+    """Start recording duration and token usage for these crew tasks"""
+    _register_handlers()
+    with _records_lock:
+        for task in tasks:
+            _records[str(task.id)] = {
+                "name": task.name or "task",
+                "started": None,
+                "seconds": None,
+                "llm_calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+            }
+
+
+def collect(tasks: Iterable) -> Dict[str, dict]:
+    """
+    Stop recording the tasks, export their metrics and return a per-task breakdown
+
+    Returns:
+        {task name: {"seconds", "llm_calls", "prompt_tokens", "completion_tokens"}}
+    """
+    # Event handlers run on CrewAI's handler threads; let them catch up first
+    if not crewai_event_bus.flush(timeout=5):
+        logger.warning("Timed out waiting for CrewAI event handlers, task metrics may be incomplete")
+    breakdown = {}
+    with _records_lock:
+        records = [_records.pop(str(task.id), None) for task in tasks]
+    for record in records:
+        if record is None:
+            continue
+        name = record["name"]
+        if record["seconds"] is not None:
+            CREW_TASK_SECONDS.observe(record["seconds"], task=name)
+        LLM_CALLS_TOTAL.inc(record["llm_calls"], task=name)
+        LLM_TOKENS_TOTAL.inc(record["prompt_tokens"], task=name, kind="prompt")
+        LLM_TOKENS_TOTAL.inc(record["completion_tokens"], task=name, kind="completion")
+        breakdown[name] = {
+            "seconds": round(record["seconds"], 3) if record["seconds"] is not None else None,
+            "llm_calls": record["llm_calls"],
+            "prompt_tokens": record["prompt_tokens"],
+            "completion_tokens": record["completion_tokens"],
+        }
+    return breakdown
@@ -0,0 +1,104 @@
+import os
+import threading
+from contextlib import contextmanager
+from logging_config import get_logger
+
+
+class CrewPool:
+    """
+    Pool of warmed PhotoSearchCrew instances, keyed by model.
+
+    The LLM and Pexels tool are built once per model and shared, since they
+    hold no per-job state. Each Crew (agents, tasks, task outputs) is checked
+    out by exactly one job at a time and returned afterwards, so concurrent
+    jobs never share a running crew. An llm passed in is used for every model
+    instead of building one (e.g. a stub LLM in benchmarks).
+    """
+
+    def __init__(self, verbose=None, logger=None, max_idle=None, llm=None):
+        # CREW_VERBOSE=false silences CrewAI's per-step console output
+        self.verbose = verbose if verbose is not None else os.getenv("CREW_VERBOSE", "true").lower() in ("1", "true", "yes")
+        self.llm = llm
+        self.logger = logger or get_logger(__name__)
+        self.max_idle = max_idle or int(os.getenv("CREW_POOL_MAX_IDLE", "8"))
+        self._lock = threading.Lock()
+        self._templates = {}
+        self._idle = {}
+        self.created = 0
+        self.reused = 0
+
+    def _build(self, model):
+        # crewai is heavy; import it when the first crew is built rather than at startup
+        from crew_definition import PhotoSearchCrew
+        template = self._templates.get(model)
+        if template is None:
+            # First crew for this model also provides the shared LLM and tool
+            crew = PhotoSearchCrew(verbose=self.verbose, logger=self.logger, model=model, llm=self.llm)
+            with self._lock:
+                self._templates.setdefault(model, crew)
+        else:
+            crew = PhotoSearchCrew(
+                verbose=self.verbose,
+                logger=self.logger,
+                llm=template.llm,
+                pexels_tool=template.pexels_tool,
+                pexels_multi_tool=template.pexels_multi_tool
+            )
+        with self._lock:
+            self.created += 1
+        return crew
+
+    def warm(self, count=1, model=None):
+        """
+        Pre-build idle crews so the first jobs skip construction
+
+        Args:
+            count: Number of idle crews to have ready for the model
+            model: LLM model name (None for the default model)
+        """
+        with self._lock:
+            missing = min(count, self.max_idle) - len(self._idle.get(model, []))
+        for _ in range(max(0, missing)):
+            self.release(self._build(model), model)
+        self.logger.info("Crew pool warmed with %s crew(s) for model %s", count, model or 'default')
+
+    def checkout(self, model=None):
+        """
+        Take an idle crew for the model, building one if none is free
+
+        Args:
+            model: LLM model name (None for the default model)
+
+        Returns:
+            A PhotoSearchCrew owned by the caller until release()
+        """
+        with self._lock:
+            idle = self._idle.get(model)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+        return self._build(model)
+
+    def release(self, crew, model=None):
+        """Return a crew to the pool, dropping it if the pool is full"""
+        with self._lock:
+            idle = self._idle.setdefault(model, [])
+            if len(idle) < self.max_idle:
+                idle.append(crew)
+
+    @contextmanager
+    def acquire(self, model=None):
+        """Context manager around checkout()/release()"""
+        crew = self.checkout(model)
+        try:
+            yield crew
+        finally:
+            self.release(crew, model)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "idle": {model or "default": len(crews) for model, crews in self._idle.items()},
+            }
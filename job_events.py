@@ -0,0 +1,192 @@
+import json
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Job statuses after which a job's event stream ends
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Job (or SharedReport) whose progress is reported by code running in the current context (crew worker, tool threads)
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+
+class JobEventHub:
+    """
+    In-process publish/subscribe of per-job progress events.
+
+    Publishers may run on any thread (crew workers, Pexels search threads);
+    subscribers are asyncio streams. Each job keeps a short history so a client
+    that connects late, or reconnects with Last-Event-ID, is replayed what it
+    missed.
+
+    Args:
+        history: Events kept per job for replay
+    """
+
+    def __init__(self, history: int = 200):
+        self.history = history
+        self._lock = threading.Lock()
+        self._events: Dict[str, List[tuple]] = {}
+        self._subscribers: Dict[str, list] = {}
+        self._seq: Dict[str, int] = {}
+        self.published = 0
+
+    def publish(self, job_id: str, event: str, data: dict) -> None:
+        """Record an event for a job and wake its subscribers (thread-safe)"""
+        with self._lock:
+            seq = self._seq.get(job_id, 0) + 1
+            self._seq[job_id] = seq
+            item = (seq, event, data)
+            events = self._events.setdefault(job_id, [])
+            events.append(item)
+            if len(events) > self.history:
+                del events[0]
+            subscribers = list(self._subscribers.get(job_id, ()))
+            self.published += 1
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # Subscriber's loop is closed; it is dropped when its stream ends
+                pass
+
+    async def subscribe(self, job_id: str, after: int = 0, heartbeat: float = 15.0) -> AsyncIterator[Optional[tuple]]:
+        """
+        Yield a job's events as (seq, event, data), starting after the given sequence number
+
+        Yields None after `heartbeat` seconds without events so the caller can
+        keep the connection alive or re-check the job store.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            backlog = [item for item in self._events.get(job_id, ()) if item[0] > after]
+            self._subscribers.setdefault(job_id, []).append(subscriber)
+        try:
+            last = after
+            for item in backlog:
+                last = item[0]
+                yield item
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if item[0] > last:
+                    last = item[0]
+                    yield item
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(job_id, [])
+                if subscriber in subscribers:
+                    subscribers.remove(subscriber)
+                if not subscribers:
+                    self._subscribers.pop(job_id, None)
+
+    def discard(self, job_id: str) -> None:
+        """Forget a job's history (called when the job is evicted)"""
+        with self._lock:
+            self._events.pop(job_id, None)
+            self._seq.pop(job_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "jobs": len(self._events),
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+                "published": self.published,
+            }
+
+
+# Shared by the API handlers, crew workers and Pexels tools of this process
+hub = JobEventHub()
+
+
+class SharedReport:
+    """
+    Progress of work shared by several jobs, such as one crew run for coalesced prompts.
+
+    Events go to every member job; a job that joins late is first sent the
+    events it missed (up to the hub's history).
+    """
+
+    def __init__(self, job_id: Optional[str] = None):
+        self._lock = threading.Lock()
+        self.job_ids: List[str] = [job_id] if job_id is not None else []
+        self._events: List[tuple] = []
+
+    def join(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self.job_ids:
+                return
+            self.job_ids.append(job_id)
+            for event, data in self._events:
+                hub.publish(job_id, event, data)
+
+    def publish(self, event: str, data: dict) -> None:
+        # Under the lock so a joining job sees each event exactly once, in order
+        with self._lock:
+            self._events.append((event, data))
+            if len(self._events) > hub.history:
+                del self._events[0]
+            for job_id in self.job_ids:
+                hub.publish(job_id, event, data)
+
+
+@contextmanager
+def reporting_for(job_id):
+    """Send progress emitted in the with-block (and contexts copied from it) to this job's stream, or to a SharedReport"""
+    token = _current_job.set(job_id)
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+def current_job():
+    return _current_job.get()
+
+
+def emit(event: str, **data) -> None:
+    """Publish a progress event for the job (or jobs) of the current context, if there is one"""
+    job_id = _current_job.get()
+    if job_id is None:
+        return
+    try:
+        if isinstance(job_id, SharedReport):
+            job_id.publish(event, data)
+        else:
+            hub.publish(job_id, event, data)
+    except Exception as e:
+        logger.warning("Could not publish '%s' event for job %s: %s", event, job_id, e)
+
+
+def format_sse(seq: Optional[int], event: str, data: dict) -> str:
+    """One Server-Sent Events message"""
+    lines = []
+    if seq is not None:
+        lines.append(f"id: {seq}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+def status_event(job: dict) -> dict:
+    """The 'status' event payload for a job record (with the result or error once it is finished)"""
+    data = {
+        "status": job["status"],
+        "payment_status": job.get("payment_status"),
+        "ts": time.time(),
+    }
+    if job["status"] in TERMINAL_STATUSES:
+        data["result"] = job.get("result")
+        if job.get("error"):
+            data["error"] = job["error"]
+    return data
@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import uuid
+import socket
+import random
+import asyncio
+import sqlite3
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class SQLiteJobQueue:
+    """
+    Durable work queue shared by the API and worker processes on one host.
+
+    A worker leases an entry for `visibility_timeout` seconds and keeps the lease
+    alive while it works. If the worker crashes, the lease runs out and another
+    worker picks the entry up again. Failed entries are retried with exponential
+    backoff until `max_attempts` is reached, after which they are marked dead;
+    so are entries whose lease runs out on their last attempt.
+
+    Args:
+        path: SQLite database file
+        visibility_timeout: Seconds a lease lasts without being extended
+        max_attempts: Leases per entry before it is given up
+        retry_delay: Seconds before the first retry (doubles per attempt)
+    """
+
+    def __init__(self, path: str = "data/job_queue.db", visibility_timeout: float = 300, max_attempts: int = 3, retry_delay: float = 10):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS queue ("
+                "job_id TEXT PRIMARY KEY, payload TEXT NOT NULL, state TEXT NOT NULL, attempts INTEGER NOT NULL, "
+                "available_at REAL NOT NULL, lease_owner TEXT, leased_until REAL, last_error TEXT, "
+                "enqueued_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_state ON queue(state, available_at)")
+
+    def enqueue(self, job_id: str, payload: dict) -> None:
+        """Add a job (enqueueing a job that is already queued or leased is a no-op)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO queue (job_id, payload, state, attempts, available_at, enqueued_at, updated_at) "
+                "VALUES (?, ?, 'queued', 0, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET payload = excluded.payload, state = 'queued', attempts = 0, "
+                "available_at = excluded.available_at, lease_owner = NULL, leased_until = NULL, "
+                "enqueued_at = excluded.enqueued_at, updated_at = excluded.updated_at "
+                "WHERE queue.state IN ('done', 'dead')",
+                (job_id, json.dumps(payload), now, now, now)
+            )
+
+    def lease(self, owner: str) -> Optional[dict]:
+        """
+        Take the oldest available entry, including ones whose lease has run out
+
+        Returns:
+            {"job_id", "payload", "attempts", "enqueued_at"} or None when nothing is available
+        """
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front so two workers can't lease the same entry
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT job_id, payload, attempts, enqueued_at FROM queue "
+                    "WHERE (state = 'queued' AND available_at <= ?) OR (state = 'leased' AND leased_until < ? AND attempts < ?) "
+                    "ORDER BY available_at LIMIT 1",
+                    (now, now, self.max_attempts)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE queue SET state = 'leased', attempts = attempts + 1, lease_owner = ?, leased_until = ?, "
+                    "updated_at = ? WHERE job_id = ?",
+                    (owner, now + self.visibility_timeout, now, row[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"job_id": row[0], "payload": json.loads(row[1]), "attempts": row[2] + 1, "enqueued_at": row[3]}
+
+    def expire_leases(self) -> List[str]:
+        """
+        Mark dead the entries whose lease ran out on their last attempt (their worker kept dying)
+
+        Returns:
+            IDs of the jobs given up
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "UPDATE queue SET state = 'dead', leased_until = NULL, last_error = ?, updated_at = ? "
+                "WHERE state = 'leased' AND leased_until < ? AND attempts >= ? RETURNING job_id",
+                (f"lease expired on attempt {self.max_attempts}/{self.max_attempts}", now, now, self.max_attempts)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def extend(self, job_id: str, owner: str) -> bool:
+        """Renew a lease; False if it was lost (expired and taken by another worker)"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE queue SET leased_until = ?, updated_at = ? WHERE job_id = ? AND state = 'leased' AND lease_owner = ?",
+                (now + self.visibility_timeout, now, job_id, owner)
+            )
+        return cursor.rowcount > 0
+
+    def complete(self, job_id: str, owner: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE queue SET state = 'done', leased_until = NULL, updated_at = ? WHERE job_id = ? AND lease_owner = ?",
+                (time.time(), job_id, owner)
+            )
+
+    def fail(self, job_id: str, owner: str, error: str) -> bool:
+        """
+        Record a failed attempt, scheduling a retry if attempts remain
+
+        Returns:
+            True if the entry will be retried, False if it is now dead
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts FROM queue WHERE job_id = ? AND lease_owner = ?", (job_id, owner)
+            ).fetchone()
+            if row is None:
+                return False
+            retry = row[0] < self.max_attempts
+            delay = self.retry_delay * (2 ** (row[0] - 1)) * random.uniform(0.8, 1.2)
+            self._conn.execute(
+                "UPDATE queue SET state = ?, available_at = ?, leased_until = NULL, last_error = ?, updated_at = ? "
+                "WHERE job_id = ?",
+                ("queued" if retry else "dead", now + delay, error[:1000], now, job_id)
+            )
+        return retry
+
+    def evict_finished(self, retention_seconds: float) -> int:
+        """Delete done and dead entries older than the retention window"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM queue WHERE state IN ('done', 'dead') AND updated_at < ?", (time.time() - retention_seconds,)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Entries per state (queued, leased, done, dead)"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM queue GROUP BY state").fetchall()
+        return {"queued": 0, "leased": 0, "done": 0, "dead": 0, **dict(rows)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class QueueWorker:
+    """
+    Runs queued jobs with bounded concurrency, keeping their leases alive.
+
+    The handler is awaited as `handler(job_id, payload, attempt, last_attempt)`
+    and should raise to have the job retried. If the lease on a running job is
+    lost (another worker may have taken the job over), its handler is cancelled.
+    When a job's lease runs out on its last attempt, `on_expired(job_id, error)`
+    is awaited so the job can be failed.
+
+    Args:
+        queue: The job queue
+        handler: Async callback that runs one job
+        concurrency: Jobs run at once by this worker
+        poll_interval: Seconds between queue checks while idle
+        on_expired: Optional async callback for jobs given up after their lease expired
+    """
+
+    def __init__(
+        self,
+        queue: SQLiteJobQueue,
+        handler: Callable[[str, dict, int, bool], Awaitable[None]],
+        concurrency: int = 1,
+        poll_interval: Optional[float] = None,
+        on_expired: Optional[Callable[[str, str], Awaitable[None]]] = None,
+        logger=None
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.on_expired = on_expired
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval or float(os.getenv("JOB_QUEUE_POLL_INTERVAL", "1"))
+        self.logger = logger or get_logger(__name__)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running = set()
+        # Jobs whose lease this worker lost while running them
+        self._lost = set()
+        self.completed = 0
+        self.failed = 0
+
+    async def run(self) -> None:
+        """Lease and run jobs until cancelled"""
+        self.logger.info("Queue worker %s started (concurrency %s)", self.owner, self.concurrency)
+        try:
+            while True:
+                await self._give_up_expired()
+                entry = self.queue.lease(self.owner) if len(self._running) < self.concurrency else None
+                if entry is None:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                task = asyncio.create_task(self._run_entry(entry))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+        finally:
+            for task in list(self._running):
+                task.cancel()
+            self.logger.info("Queue worker %s stopped", self.owner)
+
+    async def _give_up_expired(self) -> None:
+        for job_id in self.queue.expire_leases():
+            self.failed += 1
+            error = f"Job abandoned: its worker stopped during each of {self.queue.max_attempts} attempts"
+            self.logger.warning("Queued job %s: lease expired on the last attempt, giving up", job_id)
+            if self.on_expired is not None:
+                try:
+                    await self.on_expired(job_id, error)
+                except Exception as e:
+                    self.logger.error("Could not fail abandoned job %s: %s", job_id, e)
+
+    async def _keep_leased(self, job_id: str, work: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(self.queue.visibility_timeout / 3)
+            if not self.queue.extend(job_id, self.owner):
+                self.logger.warning("Lost the lease on job %s, stopping it", job_id)
+                self._lost.add(job_id)
+                work.cancel()
+                return
+
+    async def _run_entry(self, entry: dict) -> None:
+        job_id = entry["job_id"]
+        last_attempt = entry["attempts"] >= self.queue.max_attempts
+        self.logger.info("Running queued job %s (attempt %s/%s)", job_id, entry["attempts"], self.queue.max_attempts)
+        work = asyncio.create_task(
+            self.handler(job_id, {**entry["payload"], "enqueued_at": entry["enqueued_at"]}, entry["attempts"], last_attempt)
+        )
+        heartbeat = asyncio.create_task(self._keep_leased(job_id, work))
+        try:
+            await work
+        except asyncio.CancelledError:
+            if job_id not in self._lost:
+                raise
+            # The queue hands the job to another attempt; it is not ours to complete or fail
+        except Exception as e:
+            retry = self.queue.fail(job_id, self.owner, str(e))
+            self.failed += 1
+            self.logger.warning("Queued job %s failed (%s), %s", job_id, e, "will retry" if retry else "giving up")
+        else:
+            self.queue.complete(job_id, self.owner)
+            self.completed += 1
+        finally:
+            heartbeat.cancel()
+            self._lost.discard(job_id)
+
+
+def create_job_queue_from_env() -> Optional[SQLiteJobQueue]:
+    """
+    Build the worker job queue configured by environment variables
+
+    JOB_EXECUTION: 'inline' (default, the API process runs paid jobs) or 'queue'
+        (the API enqueues paid jobs and `python main.py worker` processes run them)
+    JOB_QUEUE_PATH: database file (default data/job_queue.db)
+    JOB_QUEUE_VISIBILITY_TIMEOUT: seconds before a crashed worker's job is picked up again (default 300)
+    JOB_QUEUE_MAX_ATTEMPTS: tries per job (default 3)
+    JOB_QUEUE_RETRY_DELAY: seconds before the first retry (default 10)
+
+    Returns:
+        A queue instance, or None for inline execution
+    """
+    if os.getenv("JOB_EXECUTION", "inline").lower() != "queue":
+        return None
+    path = os.getenv("JOB_QUEUE_PATH", "data/job_queue.db")
+    visibility_timeout = float(os.getenv("JOB_QUEUE_VISIBILITY_TIMEOUT", "300"))
+    max_attempts = int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", "3"))
+    retry_delay = float(os.getenv("JOB_QUEUE_RETRY_DELAY", "10"))
+    logger.info("Using job queue at %s (visibility timeout %ss, %s attempts)", path, visibility_timeout, max_attempts)
+    return SQLiteJobQueue(path=path, visibility_timeout=visibility_timeout, max_attempts=max_attempts, retry_delay=retry_delay)
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import List, Optional
+from logging_config import get_logger
+from metrics import JOB_STORE_SECONDS
+
+logger = get_logger(__name__)
+
+# Jobs in these states are done and can be evicted once the retention window passes
+FINISHED_STATUSES = ("completed", "failed")
+
+
+class JobStore:
+    """
+    Interface for job records.
+
+    A job is a JSON-serializable dict (status, payment_status, blockchain_identifier,
+    input_data, result, ...). Stores add created_at/updated_at timestamps.
+    """
+
+    def create(self, job_id: str, job: dict) -> dict:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        """Merge fields into the job and return the updated record (None if missing)"""
+        raise NotImplementedError
+
+    def update_if(self, job_id: str, expected: dict, **fields) -> Optional[dict]:
+        """
+        Merge fields into the job only if it still has the `expected` values
+
+        Lets several processes race for a job (e.g. awaiting_payment -> running)
+        with exactly one winner. Returns the updated record, or None if the job
+        is missing or no longer matches.
+        """
+        raise NotImplementedError
+
+    def list_by_status(self, status: str, limit: int = 100) -> List[dict]:
+        raise NotImplementedError
+
+    def evict_expired(self, retention_seconds: float, pending_retention_seconds: Optional[float] = None) -> List[str]:
+        """
+        Delete finished jobs older than the retention window
+
+        Args:
+            retention_seconds: Age after which completed/failed jobs are removed
+            pending_retention_seconds: Age after which unfinished jobs are removed too
+                (abandoned payments); None keeps them
+
+        Returns:
+            IDs of the evicted jobs
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryJobStore(JobStore):
+    """Process-local job store (single worker, lost on restart)."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, job: dict) -> dict:
+        now = time.time()
+        record = {**job, "job_id": job_id, "created_at": now, "updated_at": now}
+        with self._lock:
+            self._jobs[job_id] = record
+        return dict(record)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields, updated_at=time.time())
+            return dict(job)
+
+    def update_if(self, job_id: str, expected: dict, **fields) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or any(job.get(key) != value for key, value in expected.items()):
+                return None
+            job.update(fields, updated_at=time.time())
+            return dict(job)
+
+    def list_by_status(self, status: str, limit: int = 100) -> List[dict]:
+        with self._lock:
+            return [dict(j) for j in self._jobs.values() if j["status"] == status][:limit]
+
+    def evict_expired(self, retention_seconds: float, pending_retention_seconds: Optional[float] = None) -> List[str]:
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if (job["status"] in FINISHED_STATUSES and now - job["updated_at"] > retention_seconds)
+                or (pending_retention_seconds is not None and now - job["updated_at"] > pending_retention_seconds)
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return expired
+
+    def count(self) -> int:
+        return len(self._jobs)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    SQLite job store in WAL mode, shareable by several uvicorn workers on one host.
+
+    Indexed columns (job_id, status, blockchain_identifier, updated_at) are kept
+    next to the full record, which is stored as JSON.
+    """
+
+    def __init__(self, path: str = "data/jobs.db"):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, blockchain_identifier TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, updated_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_blockchain_identifier ON jobs(blockchain_identifier)")
+
+    def create(self, job_id: str, job: dict) -> dict:
+        now = time.time()
+        record = {**job, "job_id": job_id, "created_at": now, "updated_at": now}
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, blockchain_identifier, created_at, updated_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, record["status"], record.get("blockchain_identifier"), now, now, json.dumps(record))
+            )
+        return record
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        return self.update_if(job_id, {}, **fields)
+
+    def update_if(self, job_id: str, expected: dict, **fields) -> Optional[dict]:
+        with self._lock:
+            # IMMEDIATE takes the write lock up front so concurrent workers can't interleave read-modify-write
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                record = json.loads(row[0]) if row else None
+                if record is None or any(record.get(key) != value for key, value in expected.items()):
+                    self._conn.execute("ROLLBACK")
+                    return None
+                record.update(fields, updated_at=time.time())
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, blockchain_identifier = ?, updated_at = ?, data = ? WHERE job_id = ?",
+                    (record["status"], record.get("blockchain_identifier"), record["updated_at"], json.dumps(record), job_id)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return record
+
+    def list_by_status(self, status: str, limit: int = 100) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM jobs WHERE status = ? ORDER BY updated_at LIMIT ?", (status, limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def evict_expired(self, retention_seconds: float, pending_retention_seconds: Optional[float] = None) -> List[str]:
+        now = time.time()
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        query = f"SELECT job_id FROM jobs WHERE (status IN ({placeholders}) AND updated_at < ?)"
+        params = [*FINISHED_STATUSES, now - retention_seconds]
+        if pending_retention_seconds is not None:
+            query += " OR updated_at < ?"
+            params.append(now - pending_retention_seconds)
+        with self._lock:
+            expired = [row[0] for row in self._conn.execute(query, params).fetchall()]
+            self._conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in expired])
+        return expired
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class InstrumentedJobStore(JobStore):
+    """Wraps a job store and records the latency of each operation in the job store metrics."""
+
+    def __init__(self, store: JobStore):
+        self.store = store
+
+    def create(self, job_id: str, job: dict) -> dict:
+        with JOB_STORE_SECONDS.time(operation="create"):
+            return self.store.create(job_id, job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with JOB_STORE_SECONDS.time(operation="get"):
+            return self.store.get(job_id)
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        with JOB_STORE_SECONDS.time(operation="update"):
+            return self.store.update(job_id, **fields)
+
+    def update_if(self, job_id: str, expected: dict, **fields) -> Optional[dict]:
+        with JOB_STORE_SECONDS.time(operation="update"):
+            return self.store.update_if(job_id, expected, **fields)
+
+    def list_by_status(self, status: str, limit: int = 100) -> List[dict]:
+        with JOB_STORE_SECONDS.time(operation="list_by_status"):
+            return self.store.list_by_status(status, limit)
+
+    def evict_expired(self, retention_seconds: float, pending_retention_seconds: Optional[float] = None) -> List[str]:
+        with JOB_STORE_SECONDS.time(operation="evict_expired"):
+            return self.store.evict_expired(retention_seconds, pending_retention_seconds)
+
+    def count(self) -> int:
+        return self.store.count()
+
+    def close(self) -> None:
+        self.store.close()
+
+
+def create_job_store_from_env() -> JobStore:
+    """
+    Build the job store configured by environment variables
+
+    JOB_STORE_BACKEND: 'sqlite' (default) or 'memory'
+    JOB_STORE_PATH: database file for the sqlite backend
+    """
+    backend = os.getenv("JOB_STORE_BACKEND", "sqlite").lower()
+    if backend == "memory":
+        logger.info("Using in-memory job store")
+        return InstrumentedJobStore(MemoryJobStore())
+    path = os.getenv("JOB_STORE_PATH", "data/jobs.db")
+    logger.info("Using SQLite job store at %s", path)
+    return InstrumentedJobStore(SQLiteJobStore(path))
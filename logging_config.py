@@ -1,55 +1,224 @@
 import os
+import json
+import time
+import queue
+import atexit
+import random
 import logging
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-def setup_logging(log_level=logging.INFO):
+# Background listener that owns the file handler when queued logging is on
+_listener = None
+
+# Log call arguments of these types can't change before the listener formats them
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None), BaseException)
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, exc_info and any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _parse_per_logger(value):
+    """Parse 'crewai=0.1,httpx=0.5' into {'crewai': 0.1, 'httpx': 0.5}"""
+    settings = {}
+    for item in (value or "").split(","):
+        name, _, number = item.partition("=")
+        if name.strip() and number.strip():
+            settings[name.strip()] = float(number)
+    return settings
+
+
+class _PerLoggerFilter(logging.Filter):
+    """Applies a setting to a logger and its children (longest configured prefix wins)."""
+
+    def __init__(self, settings):
+        super().__init__()
+        self.settings = settings
+        self._names = sorted(settings, key=len, reverse=True)
+
+    def _match(self, name):
+        for prefix in self._names:
+            if name == prefix or name.startswith(prefix + "."):
+                return prefix
+        return None
+
+
+class SamplingFilter(_PerLoggerFilter):
+    """
+    Keeps only a fraction of the records below WARNING from configured loggers
+
+    Args:
+        settings: {logger name: fraction of records to keep (0-1)}
+    """
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        prefix = self._match(record.name)
+        return prefix is None or random.random() < self.settings[prefix]
+
+
+class RateLimitFilter(_PerLoggerFilter):
+    """
+    Token bucket per configured logger: at most N records per second below WARNING,
+    with bursts up to N
+
+    Args:
+        settings: {logger name: records per second}
+    """
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self._buckets = {name: [rate, time.monotonic()] for name, rate in settings.items()}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        prefix = self._match(record.name)
+        if prefix is None:
+            return True
+        rate = self.settings[prefix]
+        with self._lock:
+            bucket = self._buckets[prefix]
+            now = time.monotonic()
+            bucket[0] = min(rate, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            self.suppressed += 1
+            return False
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves %-style formatting to the listener thread.
+
+    The stock QueueHandler formats every record in the calling thread. Here the
+    message is only merged eagerly when an argument is mutable (and could change
+    before the listener gets to it).
+    """
+
+    def prepare(self, record):
+        args = record.args
+        if args:
+            values = args.values() if isinstance(args, dict) else args
+            if not all(isinstance(value, _IMMUTABLE_ARGS) for value in values):
+                record.msg = record.getMessage()
+                record.args = None
+        return record
+
+
+def setup_logging(log_level=None):
     """
     Configure application-wide logging
-    
+
+    By default a background thread owns the file handler, so logging calls
+    only enqueue records. Configured by environment variables:
+
+    LOG_LEVEL: minimum level (default INFO)
+    LOG_FORMAT: 'text' (default) or 'json' (one JSON object per line)
+    LOG_QUEUE: 'true' (default) for queued logging, 'false' to write synchronously
+    LOG_SAMPLING: per-logger fraction of sub-WARNING records kept, e.g. 'httpx=0.1,crewai=0.5'
+    LOG_RATE_LIMIT: per-logger records per second below WARNING, e.g. 'httpx=5'
+
     Args:
-        log_level: The minimum log level to capture (default: INFO)
-    
+        log_level: The minimum log level to capture (default: LOG_LEVEL or INFO)
+
     Returns:
         logger: Configured logger instance
     """
+    global _listener
+    if log_level is None:
+        log_level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+
     # Create logs directory if it doesn't exist
     log_directory = "logs"
     os.makedirs(log_directory, exist_ok=True)
     log_file = os.path.join(log_directory, "app.log")
-    
+
     # Create formatter for consistent log formatting
-    file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        file_formatter = JsonFormatter()
+    else:
+        file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
     # Set up rotating file handler (10 MB per file, keep 5 backup files)
     file_handler = RotatingFileHandler(
-        log_file, 
+        log_file,
         maxBytes=10*1024*1024,  # 10 MB
         backupCount=5
     )
     file_handler.setFormatter(file_formatter)
-    
+
     # Configure root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level)
-    
+
     # Remove any existing handlers to prevent duplicates
+    shutdown_logging()
     for handler in root_logger.handlers[:]:
-        if isinstance(handler, logging.StreamHandler):
+        if isinstance(handler, (logging.StreamHandler, QueueHandler)):
             root_logger.removeHandler(handler)
-    
-    # Add the file handler
-    root_logger.addHandler(file_handler)
-    
+
+    if os.getenv("LOG_QUEUE", "true").lower() in ("1", "true", "yes"):
+        # Callers only enqueue; the listener thread formats and writes
+        handler = DeferredQueueHandler(queue.SimpleQueue())
+        _listener = QueueListener(handler.queue, file_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+    else:
+        handler = file_handler
+
+    # Filters sit on the root handler so records from every child logger pass through them
+    sampling = _parse_per_logger(os.getenv("LOG_SAMPLING"))
+    if sampling:
+        handler.addFilter(SamplingFilter(sampling))
+    rate_limits = _parse_per_logger(os.getenv("LOG_RATE_LIMIT"))
+    if rate_limits:
+        handler.addFilter(RateLimitFilter(rate_limits))
+
+    root_logger.addHandler(handler)
+
     return root_logger
 
+def shutdown_logging():
+    """Flush queued records and stop the background listener (safe to call more than once)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
 def get_logger(name):
     """
     Get a logger for a specific module
-    
+
     Args:
         name: Usually __name__ from the calling module
-        
+
     Returns:
         A logger instance with the specified name
     """
-    return logging.getLogger(name) 
\ No newline at end of file
+    return logging.getLogger(name)
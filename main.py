@@ -1,12 +1,34 @@
+import startup
 import os
-import uvicorn
+import json
+import time
+import asyncio
+import functools
+import socket
 import uuid
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request, Response, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
-from masumi.config import Config
-from masumi.payment import Payment, Amount
-from crew_definition import PhotoSearchCrew
+from crew_executor import CrewExecutor, CrewCapacityError
+from crew_pool import CrewPool
+from pexels_client import SharedSearches, close_http_client, get_photo_catalog, get_search_cache, sharing_searches
+from job_store import create_job_store_from_env
+from job_queue import QueueWorker, create_job_queue_from_env
+from payment_poller import PaymentPoller
+from single_flight import SingleFlight
+from result_cache import create_result_cache_from_env
+from prompt_text import canonical_prompt
+from photo_ranking import ranking_prompt
+from photo_registry import PhotoRegistry, collecting_photos
+from rate_limiter import PRIORITY_BATCH, request_priority
+from metrics import (
+    CONTENT_TYPE, CREW_RUNS_COALESCED_TOTAL, REGISTRY, FunctionMetric, JOB_STAGE_SECONDS, JOBS_IN_FLIGHT, JOBS_TOTAL,
+    PAYMENT_CALL_SECONDS
+)
+from job_events import TERMINAL_STATUSES, SharedReport, format_sse, hub as job_event_hub, reporting_for, status_event
 from logging_config import setup_logging
 
 # Configure logging
@@ -22,27 +44,316 @@ PAYMENT_API_KEY = os.getenv("PAYMENT_API_KEY")
 NETWORK = os.getenv("NETWORK")
 
 logger.info("Starting application with configuration:")
-logger.info(f"PAYMENT_SERVICE_URL: {PAYMENT_SERVICE_URL}")
+logger.info("PAYMENT_SERVICE_URL: %s", PAYMENT_SERVICE_URL)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Crew Worker Pool (runs blocking crew kickoffs off the event loop)
+# ─────────────────────────────────────────────────────────────────────────────
+crew_executor = CrewExecutor(logger=logger)
+crew_pool = CrewPool(logger=logger)
+result_cache = create_result_cache_from_env()
+# Jobs with the same canonical prompt share one in-flight crew run (each still completes its own payment)
+crew_runs = SingleFlight()
+# Progress of each in-flight shared run, streamed to every job waiting on it
+crew_reports = {}
+COALESCE_CREW_RUNS = os.getenv("CREW_COALESCE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# 'background' (default) serves requests while crewai/masumi load and crews are built,
+# 'blocking' finishes that before serving, 'off' leaves it to the first paid job
+STARTUP_WARM = os.getenv("STARTUP_WARM", "background").lower()
+
+# Heavy modules that are only needed once a job is paid for
+WARM_MODULES = ("masumi.payment", "crewai", "crew_definition", "crew_metrics")
+
+def warm_up() -> None:
+    """ Imports the crew and payment stacks and builds one idle crew per worker (blocking) """
+    startup.warm_imports(WARM_MODULES)
+    try:
+        crew_pool.warm(crew_executor.max_workers)
+    except Exception as e:
+        logger.warning("Could not warm crew pool: %s", e)
+    startup.mark("crews_ready")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # With a job queue the crews run in worker processes; the API only needs masumi
+    warm = warm_up if job_queue is None else functools.partial(startup.warm_imports, ("masumi.payment",))
+    warm_task = None
+    if STARTUP_WARM == "blocking":
+        await asyncio.to_thread(warm)
+    elif STARTUP_WARM != "off":
+        warm_task = asyncio.create_task(asyncio.to_thread(warm))
+    eviction_task = asyncio.create_task(evict_jobs_periodically())
+    payment_poller.start()
+    try:
+        await recover_jobs()
+    except Exception as e:
+        logger.error("Error recovering jobs from the job store: %s", e, exc_info=True)
+    startup.mark("app_ready")
+    yield
+    await payment_poller.stop()
+    eviction_task.cancel()
+    if warm_task is not None:
+        warm_task.cancel()
+    crew_executor.shutdown()
+    close_http_client()
+    job_store.close()
+    if job_queue is not None:
+        job_queue.close()
 
 # Initialize FastAPI
 app = FastAPI(
     title="Stock Photo Search Agent - Masumi API",
     description="AI-powered stock photo search agent using Pexels API with Masumi payment integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ─────────────────────────────────────────────────────────────────────────────
-# Temporary in-memory job store (DO NOT USE IN PRODUCTION)
+# Job Store (SQLite by default, shared by all uvicorn workers on the host)
 # ─────────────────────────────────────────────────────────────────────────────
-jobs = {}
+job_store = create_job_store_from_env()
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "86400"))  # Finished jobs: 1 day
+PENDING_JOB_RETENTION_SECONDS = float(os.getenv("PENDING_JOB_RETENTION_SECONDS", "172800"))  # Unpaid jobs: 2 days
+JOB_EVICTION_INTERVAL = float(os.getenv("JOB_EVICTION_INTERVAL", "300"))
+
+# Payment objects are needed to complete payments, so they stay local to this process
 payment_instances = {}
 
+# Marks the jobs this process runs, so a restarted process can tell which ones were orphaned
+RUNNER_ID = f"{socket.gethostname()}:{os.getpid()}"
+JOB_RECOVERY_LIMIT = int(os.getenv("JOB_RECOVERY_LIMIT", "10000"))  # Jobs per status picked up at startup
+
 # ─────────────────────────────────────────────────────────────────────────────
-# Initialize Masumi Payment Config
+# Job Queue (JOB_EXECUTION=queue: paid jobs run in `python main.py worker` processes)
 # ─────────────────────────────────────────────────────────────────────────────
-config = Config(
-    payment_service_url=PAYMENT_SERVICE_URL,
-    payment_api_key=PAYMENT_API_KEY
+job_queue = create_job_queue_from_env()
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "0")) or crew_executor.max_workers
+# Queue mode: worker processes started, and jobs queued or running beyond which new jobs are refused
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "1"))
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "0")) or WORKER_CONCURRENCY * JOB_QUEUE_WORKERS + crew_executor.max_queue
+
+def capacity() -> dict:
+    """ Load and limits of what runs paid jobs: this process's crew executor, or the queue's worker processes """
+    if job_queue is None:
+        return crew_executor.stats()
+    stats = job_queue.stats()
+    workers = WORKER_CONCURRENCY * JOB_QUEUE_WORKERS
+    return {
+        "max_workers": workers,
+        "max_queue": max(0, JOB_QUEUE_MAX_DEPTH - workers),
+        "running": stats["leased"],
+        "queued": stats["queued"],
+        "free_slots": max(0, JOB_QUEUE_MAX_DEPTH - stats["leased"] - stats["queued"]),
+    }
+
+def admit(job_id: str, slots: int = 1) -> None:
+    """
+    Admission control: refuse new work while every worker and queue slot is taken
+
+    Running paid jobs in this process, the job holds `slots` crew slots from now until
+    process_paid_job releases them, so accepted jobs awaiting payment count against
+    capacity and a paid job never finds the executor full.
+    """
+    if job_queue is None:
+        try:
+            crew_executor.reserve(job_id, slots)
+            return
+        except CrewCapacityError:
+            pass
+    elif capacity()["free_slots"] > 0:
+        return
+    logger.warning("Rejecting job %s: at capacity", job_id)
+    raise HTTPException(
+        status_code=503,
+        detail="Agent is at capacity. Please retry shortly."
+    )
+
+async def evict_jobs_periodically():
+    """ Removes expired jobs from the store, stops monitors for abandoned payments and trims the photo catalog """
+    while True:
+        await asyncio.sleep(JOB_EVICTION_INTERVAL)
+        try:
+            evicted = await asyncio.to_thread(
+                job_store.evict_expired, JOB_RETENTION_SECONDS, PENDING_JOB_RETENTION_SECONDS
+            )
+            for job_id in evicted:
+                job_event_hub.discard(job_id)
+                payment_instances.pop(job_id, None)
+                crew_executor.release(job_id)
+            evicted_ids = set(evicted)
+            for blockchain_identifier in [bid for bid, check in payment_checks.items() if check[0] in evicted_ids]:
+                del payment_checks[blockchain_identifier]
+            payment_poller.untrack_jobs(evicted)
+            if evicted:
+                logger.info("Evicted %s expired job(s) from the job store", len(evicted))
+            if job_queue is not None:
+                await asyncio.to_thread(job_queue.evict_finished, JOB_RETENTION_SECONDS)
+            # The catalog indexes photos by the queries that found them, which come from user prompts
+            photo_catalog = get_photo_catalog()
+            if photo_catalog is not None:
+                await asyncio.to_thread(photo_catalog.evict)
+        except Exception as e:
+            logger.error("Error evicting expired jobs: %s", e, exc_info=True)
+
+def runner_alive(runner: str | None) -> bool:
+    """ Whether the process that started running a job (RUNNER_ID of that process) still exists """
+    if not runner or runner == RUNNER_ID:
+        return False
+    host, _, pid = runner.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+async def recover_jobs() -> None:
+    """
+    Picks up the jobs a previous run of the service left behind
+
+    Unpaid jobs go back to the payment poller. Inline jobs whose process died while
+    running them go back to the poller too, which runs them again once it sees their
+    (already confirmed) payment; in queue mode the queue's leases take care of those,
+    and queued jobs are made sure to have their queue entry.
+    """
+    now = time.time()
+    awaiting = await asyncio.to_thread(job_store.list_by_status, "awaiting_payment", JOB_RECOVERY_LIMIT)
+    for job in awaiting:
+        for blockchain_identifier in payment_ids(job):
+            payment_poller.track(blockchain_identifier, job["job_id"], age=now - job["created_at"])
+    orphaned = 0
+    if job_queue is not None:
+        # Paid jobs claimed for the queue just before a crash may have no queue entry (enqueueing again is a no-op)
+        for job in await asyncio.to_thread(job_store.list_by_status, "queued", JOB_RECOVERY_LIMIT):
+            await asyncio.to_thread(job_queue.enqueue, job["job_id"], {"payment_id": job["blockchain_identifier"]})
+    else:
+        for job in await asyncio.to_thread(job_store.list_by_status, "running", JOB_RECOVERY_LIMIT):
+            if runner_alive(job.get("runner")):
+                continue
+            # Several API processes may start at once; only one of them takes each orphan
+            reclaimed = await asyncio.to_thread(
+                job_store.update_if,
+                job["job_id"], {"status": "running", "runner": job.get("runner")}, status="awaiting_payment", runner=None
+            )
+            if reclaimed is not None:
+                for blockchain_identifier in payment_ids(job):
+                    payment_poller.track(blockchain_identifier, job["job_id"])
+                orphaned += 1
+    if awaiting or orphaned:
+        logger.info("Recovered %s job(s) awaiting payment and %s orphaned running job(s)", len(awaiting), orphaned)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Initialize Masumi Payment Config (masumi is imported on first use, not at startup)
+# ─────────────────────────────────────────────────────────────────────────────
+@functools.lru_cache(maxsize=None)
+def payment_config():
+    from masumi.config import Config
+    return Config(
+        payment_service_url=PAYMENT_SERVICE_URL,
+        payment_api_key=PAYMENT_API_KEY
+    )
+
+def new_payment(amount: str | None = None, **kwargs):
+    """ Builds a masumi Payment for this agent; `amount` (in PAYMENT_UNIT) is needed to request a payment """
+    from masumi.payment import Payment, Amount
+    amounts = [Amount(amount=amount, unit=os.getenv("PAYMENT_UNIT", "lovelace"))] if amount is not None else None
+    return Payment(
+        agent_identifier=os.getenv("AGENT_IDENTIFIER"),
+        amounts=amounts,
+        config=payment_config(),
+        network=NETWORK,
+        **kwargs
+    )
+
+def get_payment(job_id: str, job: dict):
+    """ Returns this process's Payment for a job, rebuilding it from the job record if another worker created it """
+    payment = payment_instances.get(job_id)
+    if payment is None:
+        payment = new_payment(
+            amount=os.getenv("PAYMENT_AMOUNT", "10000000"),
+            identifier_from_purchaser=job["identifier_from_purchaser"],
+            input_data=job["input_data"]
+        )
+        payment.payment_ids.add(job["blockchain_identifier"])
+    return payment
+
+def item_payment(item: dict):
+    """ Builds the Payment for one prompt of a batch, which is paid for like a single job with that prompt """
+    payment = new_payment(
+        amount=os.getenv("PAYMENT_AMOUNT", "10000000"),
+        identifier_from_purchaser=item["identifier_from_purchaser"],
+        input_data={"prompt": item["prompt"]}
+    )
+    if item.get("blockchain_identifier"):
+        payment.payment_ids.add(item["blockchain_identifier"])
+    return payment
+
+def payment_ids(job: dict) -> list:
+    """ Blockchain identifiers of a job's payments (one per prompt for a batch) """
+    if job.get("items") is not None:
+        return [item["blockchain_identifier"] for item in job["items"]]
+    return [job["blockchain_identifier"]]
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Payment Status Tracking (last known state is kept on the job record)
+# ─────────────────────────────────────────────────────────────────────────────
+PAYMENT_STATUS_MAX_AGE = float(os.getenv("PAYMENT_STATUS_MAX_AGE", "15"))  # Seconds before /status refreshes
+
+# When this process last saw each pending payment's state: blockchain_identifier -> (job_id, payment_status, checked_at).
+# Polls that find the state unchanged only update this, not the job store.
+payment_checks = {}
+
+def store_payment_status(job_id: str, blockchain_identifier: str, payment_status: str, checked_at: float) -> dict | None:
+    """ Writes a payment's state to its job if the job still awaits payment (for a batch, to the prompt it pays for) """
+    while True:
+        job = job_store.get(job_id)
+        if job is None or job["status"] != "awaiting_payment":
+            return None
+        if job.get("items") is None:
+            return job_store.update_if(
+                job_id, {"status": "awaiting_payment"}, payment_status=payment_status, payment_checked_at=checked_at
+            )
+        items = [
+            {**item, "payment_status": payment_status} if item["blockchain_identifier"] == blockchain_identifier else item
+            for item in job["items"]
+        ]
+        # The batch as a whole is pending until every prompt's payment reached the same state
+        states = {item["payment_status"] for item in items}
+        updated = job_store.update_if(
+            job_id, {"status": "awaiting_payment", "items": job["items"]},
+            items=items, payment_status=states.pop() if len(states) == 1 else "pending", payment_checked_at=checked_at
+        )
+        if updated is not None:
+            return updated
+
+async def record_payment_status(job_id: str, blockchain_identifier: str, payment: dict | None) -> None:
+    """ Stores the observed on-chain payment state for a job that is still awaiting payment, when it changed """
+    payment_status = (payment or {}).get("onChainState") or "pending"
+    now = time.time()
+    previous = payment_checks.get(blockchain_identifier)
+    payment_checks[blockchain_identifier] = (job_id, payment_status, now)
+    if previous is not None and previous[1] == payment_status:
+        return
+    updated = await asyncio.to_thread(store_payment_status, job_id, blockchain_identifier, payment_status, now)
+    if updated is None:
+        payment_checks.pop(blockchain_identifier, None)
+    elif previous is not None or payment_status != "pending":
+        publish_status(job_id, updated)
+
+def publish_status(job_id: str, job: dict) -> None:
+    """ Pushes a job's current status (and result, once finished) to its /status/stream subscribers """
+    job_event_hub.publish(job_id, "status", status_event(job))
+
+# One poller checks all pending payments with one listing call instead of a monitor per job
+payment_poller = PaymentPoller(
+    payment_factory=new_payment,
+    on_confirmed=lambda job_id, blockchain_identifier: handle_payment_status(job_id, blockchain_identifier),
+    on_status=record_payment_status,
+    logger=logger
 )
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -71,35 +382,135 @@ class StartJobRequest(BaseModel):
             }
         }
 
+BATCH_MAX_PROMPTS = int(os.getenv("BATCH_MAX_PROMPTS", "50"))
+
+class StartBatchRequest(BaseModel):
+    identifier_from_purchaser: str = Field(..., min_length=1, description="Unique identifier from the purchaser")
+    prompts: list[str] = Field(..., min_length=1, description="Photo search prompts, one crew run each")
+
+    @field_validator('prompts')
+    @classmethod
+    def validate_prompts(cls, v):
+        if len(v) > BATCH_MAX_PROMPTS:
+            raise ValueError(f'a batch can contain at most {BATCH_MAX_PROMPTS} prompts')
+        for prompt in v:
+            if not prompt or len(prompt.strip()) < 5:
+                raise ValueError('every prompt must contain at least 5 characters')
+        return [prompt.strip() for prompt in v]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "identifier_from_purchaser": "example_purchaser_123",
+                "prompts": [
+                    "modern tech startup office with diverse team collaborating",
+                    "cozy coffee shop with warm atmosphere and natural lighting"
+                ]
+            }
+        }
+
 class ProvideInputRequest(BaseModel):
     job_id: str
 
 # ─────────────────────────────────────────────────────────────────────────────
 # CrewAI Task Execution
 # ─────────────────────────────────────────────────────────────────────────────
-async def execute_crew_task(input_data: dict) -> str:
-    """ Execute a CrewAI task with Photo Search Agents """
+def run_crew(prompt: str, timings: dict | None = None, job_id: str | SharedReport | None = None):
+    """ Run a pooled Photo Search Crew to completion (blocking, runs on a crew worker), reporting progress to job_id """
+    import crew_metrics  # needs crewai, which is loaded after startup
+    # Progress from the crew's tasks and tools is streamed to the job's subscribers,
+    # search results are ranked against the prompt before the curator sees them,
+    # and the photos shown are kept so the curator's picks can be filled in by ID
+    with crew_pool.acquire() as crew, reporting_for(job_id), ranking_prompt(prompt), collecting_photos(PhotoRegistry()):
+        logger.info("Starting crew execution...")
+        logger.info("LLM model being used: %s", crew.llm.model if hasattr(crew.llm, 'model') else 'Unknown')
+        # Short, concrete prompts skip the analyst and get rule-based search queries
+        planned, inputs = crew.plan(prompt)
+        if timings is not None:
+            timings["query_expansion"] = "rules" if planned is crew.fast_crew else "llm"
+        tasks = list(planned.tasks)
+        crew_metrics.watch(tasks)
+        try:
+            return planned.kickoff(inputs=inputs)
+        finally:
+            breakdown = crew_metrics.collect(tasks)
+            if timings is not None:
+                timings["tasks"] = breakdown
+
+async def execute_crew_task(
+    input_data: dict, timings: dict | None = None, job_id: str | None = None, reservation: str | None = None
+) -> str:
+    """
+    Execute a CrewAI task with Photo Search Agents, filling `timings` with a per-stage breakdown if given
+
+    `reservation` names the crew executor reservation the run uses (see admit()).
+
+    Answered from the result cache when possible; identical prompts arriving while a crew
+    is already running for them wait for that run instead of starting their own.
+    """
     prompt = input_data.get("prompt", "")
-    logger.info(f"Starting photo search task with prompt: {prompt[:100]}...")
+    logger.info("Starting photo search task with prompt: %s...", prompt[:100])
+    timings = timings if timings is not None else {}
+    
+    # Same prompt (or a near-identical one, if RESULT_CACHE_SIMILARITY allows) answered recently: skip the crew
+    if result_cache is not None:
+        cached = result_cache.get(prompt)
+        timings["result_cache_hit"] = cached is not None
+        if cached is not None:
+            return cached
     
+    if not COALESCE_CREW_RUNS:
+        return await run_crew_task(prompt, timings, job_id, reservation)
+    key = canonical_prompt(prompt) or prompt
+    if crew_runs.in_flight(key):
+        # A burst of identical jobs: wait for the running crew instead of starting another
+        logger.info("Joining in-flight crew run for an identical prompt")
+        timings["coalesced"] = True
+        CREW_RUNS_COALESCED_TOTAL.inc()
+        if job_id is not None and key in crew_reports:
+            crew_reports[key].join(job_id)
+        return await crew_runs.do(key, lambda: run_crew_task(prompt, timings, job_id, reservation))
+
+    report = crew_reports[key] = SharedReport(job_id)
+
+    async def shared_run():
+        try:
+            return await run_crew_task(prompt, timings, report, reservation)
+        finally:
+            crew_reports.pop(key, None)
+
+    return await crew_runs.do(key, shared_run)
+
+async def run_crew_task(
+    prompt: str, timings: dict, job_id: str | SharedReport | None = None, reservation: str | None = None
+):
+    """ Run the crew for a prompt on the worker pool and cache its result """
     try:
-        logger.info("Initializing Photo Search Crew...")
-        crew = PhotoSearchCrew(logger=logger)
-        logger.info("Photo Search Crew initialized successfully")
-        
-        logger.info("Starting crew execution...")
-        logger.info(f"LLM model being used: {crew.llm.model if hasattr(crew.llm, 'model') else 'Unknown'}")
-        logger.info(f"OpenAI API Key present: {bool(os.getenv('OPENAI_API_KEY'))}")
-        
-        result = crew.crew.kickoff(inputs={"prompt": prompt})
+        stats = crew_executor.stats()
+        logger.info("Submitting crew to worker pool (%s running, %s queued)", stats['running'], stats['queued'])
+        submitted = time.perf_counter()
+
+        def timed_run():
+            started = time.perf_counter()
+            timings["queue_wait"] = round(started - submitted, 3)
+            JOB_STAGE_SECONDS.observe(started - submitted, stage="queue_wait")
+            try:
+                return run_crew(prompt, timings, job_id)
+            finally:
+                timings["crew"] = round(time.perf_counter() - started, 3)
+                JOB_STAGE_SECONDS.observe(time.perf_counter() - started, stage="crew")
+
+        result = await crew_executor.run(timed_run, reservation=reservation)
         logger.info("Photo search task completed successfully")
+        if result_cache is not None:
+            result_cache.set(prompt, result.raw if hasattr(result, "raw") else str(result), time.perf_counter() - submitted)
         return result
     except Exception as e:
-        logger.error(f"Error during crew execution: {str(e)}", exc_info=True)
-        logger.error(f"Error type: {type(e).__name__}")
-        logger.error(f"OpenAI API Key configured: {bool(os.getenv('OPENAI_API_KEY'))}")
+        logger.error("Error during crew execution: %s", e, exc_info=True)
+        logger.error("Error type: %s", type(e).__name__)
+        logger.error("OpenAI API Key configured: %s", bool(os.getenv('OPENAI_API_KEY')))
         if hasattr(e, 'response'):
-            logger.error(f"API Response: {e.response}")
+            logger.error("API Response: %s", e.response)
         raise
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -110,56 +521,54 @@ async def start_job(data: StartJobRequest):
     """ Initiates a job and creates a payment request """
     print(f"Received data: {data}")
     print(f"Received data.input_data: {data.input_data}")
+
+    job_id = str(uuid.uuid4())
+    admit(job_id)
+
     try:
-        job_id = str(uuid.uuid4())
         agent_identifier = os.getenv("AGENT_IDENTIFIER")
         
         # Log the input prompt (truncate if too long)
         input_prompt = data.input_data.get("prompt", "")
         truncated_input = input_prompt[:100] + "..." if len(input_prompt) > 100 else input_prompt
-        logger.info(f"Received photo search request: '{truncated_input}'")
-        logger.info(f"Starting job {job_id} with agent {agent_identifier}")
+        logger.info("Received photo search request: '%s'", truncated_input)
+        logger.info("Starting job %s with agent %s", job_id, agent_identifier)
 
         # Define payment amounts
         payment_amount = os.getenv("PAYMENT_AMOUNT", "10000000")  # Default 10 ADA
         payment_unit = os.getenv("PAYMENT_UNIT", "lovelace") # Default lovelace
 
-        amounts = [Amount(amount=payment_amount, unit=payment_unit)]
-        logger.info(f"Using payment amount: {payment_amount} {payment_unit}")
+        logger.info("Using payment amount: %s %s", payment_amount, payment_unit)
         
         # Create a payment request using Masumi
-        payment = Payment(
-            agent_identifier=agent_identifier,
-            amounts=amounts,
-            config=config,
+        payment = new_payment(
+            amount=payment_amount,
             identifier_from_purchaser=data.identifier_from_purchaser,
-            input_data=data.input_data,
-            network=NETWORK
+            input_data=data.input_data
         )
+        amounts = payment.amounts
         
         logger.info("Creating payment request...")
-        payment_request = await payment.create_payment_request()
+        with PAYMENT_CALL_SECONDS.time(operation="create_payment_request"):
+            payment_request = await payment.create_payment_request()
         blockchain_identifier = payment_request["data"]["blockchainIdentifier"]
         payment.payment_ids.add(blockchain_identifier)
-        logger.info(f"Created payment request with blockchain identifier: {blockchain_identifier}")
+        logger.info("Created payment request with blockchain identifier: %s", blockchain_identifier)
 
         # Store job info (Awaiting payment)
-        jobs[job_id] = {
+        await asyncio.to_thread(job_store.create, job_id, {
             "status": "awaiting_payment",
             "payment_status": "pending",
             "blockchain_identifier": blockchain_identifier,
             "input_data": data.input_data,
             "result": None,
             "identifier_from_purchaser": data.identifier_from_purchaser
-        }
+        })
 
-        async def payment_callback(blockchain_identifier: str):
-            await handle_payment_status(job_id, blockchain_identifier)
-
-        # Start monitoring the payment status
+        # Hand the payment to the shared poller, which runs handle_payment_status once it confirms
         payment_instances[job_id] = payment
-        logger.info(f"Starting payment status monitoring for job {job_id}")
-        await payment.start_status_monitoring(payment_callback)
+        logger.info("Tracking payment status for job %s", job_id)
+        payment_poller.track(blockchain_identifier, job_id)
 
         # Return the response in the required format
         return {
@@ -177,96 +586,355 @@ async def start_job(data: StartJobRequest):
             "payByTime": payment_request["data"]["payByTime"],
         }
     except ValueError as e:
-        logger.error(f"Validation error in request: {str(e)}", exc_info=True)
+        logger.error("Validation error in request: %s", e, exc_info=True)
+        crew_executor.release(job_id)
         raise HTTPException(
             status_code=400,
             detail=f"Validation error: {str(e)}"
         )
     except KeyError as e:
-        logger.error(f"Missing required field in request: {str(e)}", exc_info=True)
+        logger.error("Missing required field in request: %s", e, exc_info=True)
+        crew_executor.release(job_id)
         raise HTTPException(
             status_code=400,
             detail="Bad Request: Missing required field in request data."
         )
     except Exception as e:
-        logger.error(f"Error in start_job: {str(e)}", exc_info=True)
+        logger.error("Error in start_job: %s", e, exc_info=True)
+        crew_executor.release(job_id)
         raise HTTPException(
             status_code=500,
             detail="Internal server error occurred while processing the request."
         )
 
+# ─────────────────────────────────────────────────────────────────────────────
+# 1b) Start Batch Job (many prompts, one payment each)
+# ─────────────────────────────────────────────────────────────────────────────
+@app.post("/start_batch")
+async def start_batch(data: StartBatchRequest):
+    """
+    Creates one job for many prompts, with a payment request per prompt.
+
+    The payment service charges every payment request the agent's registered price,
+    so each prompt is paid for like a single job: prompt i gets identifier_from_purchaser
+    '<identifier_from_purchaser>-<i>' and input_data {"prompt": ...}, which is what its
+    input_hash covers. The batch runs once every payment is confirmed; its job_id works
+    with /status and /status/stream, and /batch_status reports each prompt separately.
+    """
+    job_id = str(uuid.uuid4())
+    admit(job_id, min(len(data.prompts), BATCH_MAX_PARALLEL))
+
+    try:
+        agent_identifier = os.getenv("AGENT_IDENTIFIER")
+        logger.info("Starting batch job %s with %s prompts", job_id, len(data.prompts))
+
+        items = [
+            {"prompt": prompt, "identifier_from_purchaser": f"{data.identifier_from_purchaser}-{index}"}
+            for index, prompt in enumerate(data.prompts)
+        ]
+        payments = [item_payment(item) for item in items]
+
+        async def request_payment(payment):
+            with PAYMENT_CALL_SECONDS.time(operation="create_payment_request"):
+                return await payment.create_payment_request()
+
+        payment_requests = await asyncio.gather(*(request_payment(payment) for payment in payments))
+        for item, payment, payment_request in zip(items, payments, payment_requests):
+            item.update(
+                blockchain_identifier=payment_request["data"]["blockchainIdentifier"],
+                payment_status="pending", status="pending", result=None
+            )
+        logger.info("Created %s payment requests for batch %s", len(items), job_id)
+
+        await asyncio.to_thread(job_store.create, job_id, {
+            "status": "awaiting_payment",
+            "payment_status": "pending",
+            "blockchain_identifier": items[0]["blockchain_identifier"],
+            "input_data": {"prompts": json.dumps(data.prompts)},
+            "result": None,
+            "identifier_from_purchaser": data.identifier_from_purchaser,
+            "items": items,
+            "paid": []
+        })
+
+        for item in items:
+            payment_poller.track(item["blockchain_identifier"], job_id)
+
+        return {
+            "status": "success",
+            "job_id": job_id,
+            "batch_id": job_id,
+            "items": len(items),
+            "agentIdentifier": agent_identifier,
+            "sellerVKey": os.getenv("SELLER_VKEY"),
+            "identifierFromPurchaser": data.identifier_from_purchaser,
+            "payments": [
+                {
+                    "index": index,
+                    "identifierFromPurchaser": item["identifier_from_purchaser"],
+                    "blockchainIdentifier": item["blockchain_identifier"],
+                    "submitResultTime": payment_request["data"]["submitResultTime"],
+                    "unlockTime": payment_request["data"]["unlockTime"],
+                    "externalDisputeUnlockTime": payment_request["data"]["externalDisputeUnlockTime"],
+                    "amounts": payment.amounts,
+                    "input_hash": payment.input_hash,
+                    "payByTime": payment_request["data"]["payByTime"],
+                }
+                for index, (item, payment, payment_request) in enumerate(zip(items, payments, payment_requests))
+            ],
+        }
+    except KeyError as e:
+        logger.error("Missing field in payment response for batch: %s", e, exc_info=True)
+        crew_executor.release(job_id)
+        raise HTTPException(
+            status_code=502,
+            detail="Payment service returned an incomplete response."
+        )
+    except Exception as e:
+        logger.error("Error in start_batch: %s", e, exc_info=True)
+        crew_executor.release(job_id)
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error occurred while processing the request."
+        )
+
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "2"))  # Crews one batch may run at once
+
+async def execute_batch(job_id: str, items: list, timings: dict) -> str:
+    """
+    Runs every prompt of a batch through the crew, at most BATCH_MAX_PARALLEL at a time
+
+    Identical prompts run once, and identical Pexels searches across the batch
+    are made once. Progress is saved on the job record after each item.
+
+    Returns:
+        The combined markdown result used to complete the payment
+
+    Raises:
+        RuntimeError: If no prompt of the batch succeeded
+    """
+    items = [dict(item) for item in items]
+    searches = SharedSearches()
+    semaphore = asyncio.Semaphore(BATCH_MAX_PARALLEL)
+    runs = {}
+
+    async def save(index: int) -> None:
+        await asyncio.to_thread(job_store.update, job_id, items=items)
+        item = items[index]
+        job_event_hub.publish(job_id, "item", {"index": index, "status": item["status"], "result": item["result"], "error": item.get("error")})
+
+    async def run_prompt(prompt: str) -> str:
+        async with semaphore:
+            # Runs on the crew slots reserved at admission; batch searches queue
+            # behind those of single jobs at the Pexels rate limiter
+            with sharing_searches(searches), request_priority(PRIORITY_BATCH):
+                result = await execute_crew_task({"prompt": prompt}, {}, reservation=job_id)
+            return result.raw if hasattr(result, "raw") else str(result)
+
+    async def run_item(index: int) -> None:
+        item = items[index]
+        key = canonical_prompt(item["prompt"]) or item["prompt"]
+        if key not in runs:
+            runs[key] = asyncio.ensure_future(run_prompt(item["prompt"]))
+        item["status"] = "running"
+        await save(index)
+        try:
+            item["result"] = await runs[key]
+            item["status"] = "completed"
+        except Exception as e:
+            logger.error("Batch %s item %s failed: %s", job_id, index, e)
+            item["status"] = "failed"
+            item["error"] = str(e)
+        await save(index)
+
+    await asyncio.gather(*(run_item(index) for index in range(len(items))))
+    timings["items"] = len(items)
+    timings["crew_runs"] = len(runs)
+    timings["pexels_searches"] = searches.stats()
+
+    if not any(item["status"] == "completed" for item in items):
+        raise RuntimeError(f"All {len(items)} prompts of the batch failed")
+    return "\n\n".join(
+        f"# {index}. {item['prompt']}\n\n" + (item["result"] if item["status"] == "completed" else f"_Failed: {item['error']}_")
+        for index, item in enumerate(items, 1)
+    )
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 2) Process Payment and Execute AI Task
 # ─────────────────────────────────────────────────────────────────────────────
+def confirm_batch_payment(job_id: str, payment_id: str) -> bool:
+    """ Records one confirmed payment of a batch; True once every prompt of it is paid for """
+    while True:
+        job = job_store.get(job_id)
+        if job is None or job["status"] != "awaiting_payment":
+            return False
+        paid = job["paid"]
+        if payment_id not in paid:
+            if job_store.update_if(job_id, {"status": "awaiting_payment", "paid": paid}, paid=paid + [payment_id]) is None:
+                continue
+            paid = paid + [payment_id]
+        return set(paid) >= set(payment_ids(job))
+
 async def handle_payment_status(job_id: str, payment_id: str) -> None:
-    """ Executes CrewAI task after payment confirmation """
+    """ Runs a job once its payment is confirmed, or queues it for a worker process (JOB_EXECUTION=queue) """
+    payment_checks.pop(payment_id, None)
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is not None and job.get("items") is not None and not await asyncio.to_thread(confirm_batch_payment, job_id, payment_id):
+        logger.info("Payment %s of batch %s confirmed, waiting for its other payments", payment_id, job_id)
+        return
+    # Every API process that recovered the job polls its payment; the first to claim it runs it
+    job = await asyncio.to_thread(
+        job_store.update_if, job_id, {"status": "awaiting_payment"},
+        status="running" if job_queue is None else "queued", runner=RUNNER_ID if job_queue is None else None
+    )
+    if job is None:
+        logger.info("Payment %s for job %s is already being handled", payment_id, job_id)
+        return
+    if job_queue is None:
+        await process_paid_job(job_id, payment_id)
+        return
+    await asyncio.to_thread(job_queue.enqueue, job_id, {"payment_id": payment_id})
+    publish_status(job_id, job)
+    logger.info("Payment %s completed for job %s, queued for a worker", payment_id, job_id)
+    # The worker rebuilds the payment from the job record
+    payment_instances.pop(job_id, None)
+
+async def process_paid_job(job_id: str, payment_id: str, retry: bool = False) -> None:
+    """
+    Executes CrewAI task after payment confirmation
+
+    With `retry`, a failure puts the job back to 'queued' and re-raises so the
+    job queue can run it again; otherwise the job is marked failed.
+    """
+    started = time.perf_counter()
+    timings = {}
+    JOBS_IN_FLIGHT.inc()
     try:
-        logger.info(f"Payment {payment_id} completed for job {job_id}, executing task...")
+        logger.info("Payment %s completed for job %s, executing task...", payment_id, job_id)
         
         # Update job status to running
-        jobs[job_id]["status"] = "running"
-        logger.info(f"Input data: {jobs[job_id]["input_data"]}")
+        job = await asyncio.to_thread(job_store.update, job_id, status="running", runner=RUNNER_ID)
+        if job is None:
+            raise KeyError(f"Job {job_id} not found in job store")
+        publish_status(job_id, job)
+        logger.info("Input data: %s", job['input_data'])
+        timings["payment_wait"] = round(time.time() - job["created_at"], 3)
+        JOB_STAGE_SECONDS.observe(timings["payment_wait"], stage="payment_wait")
 
-        # Execute the AI task
-        result = await execute_crew_task(jobs[job_id]["input_data"])
-        logger.info(f"Crew task completed for job {job_id}")
-        
-        # Convert result to string for payment completion
-        # Check if result has .raw attribute (CrewOutput), otherwise convert to string
-        result_string = result.raw if hasattr(result, "raw") else str(result)
+        if job.get("pending_result") is not None:
+            # An earlier attempt finished the crew but not the payment: don't pay for the crew twice
+            result_string = job["pending_result"]
+        elif job.get("items") is not None:
+            # Batch: every prompt was paid for separately and runs now
+            result_string = await execute_batch(job_id, job["items"], timings)
+        else:
+            # Execute the AI task
+            result = await execute_crew_task(job["input_data"], timings, job_id, reservation=job_id)
+            
+            # Convert result to string for payment completion and storage
+            # Check if result has .raw attribute (CrewOutput), otherwise convert to string
+            result_string = result.raw if hasattr(result, "raw") else str(result)
+        logger.info("Crew task completed for job %s", job_id)
+        if retry:
+            await asyncio.to_thread(job_store.update, job_id, pending_result=result_string)
         
         # Mark payment as completed on Masumi
-        await payment_instances[job_id].complete_payment(payment_id, result_string)
-        logger.info(f"Payment completed for job {job_id}")
+        completing = time.perf_counter()
+        if job.get("items") is not None:
+            await complete_batch_payments(job_id)
+        else:
+            with PAYMENT_CALL_SECONDS.time(operation="complete_payment"):
+                await get_payment(job_id, job).complete_payment(payment_id, result_string)
+        timings["complete_payment"] = round(time.perf_counter() - completing, 3)
+        logger.info("Payment completed for job %s", job_id)
 
         # Update job status
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["payment_status"] = "completed"
-        jobs[job_id]["result"] = result
-
-        # Stop monitoring payment status
-        if job_id in payment_instances:
-            payment_instances[job_id].stop_status_monitoring()
-            del payment_instances[job_id]
+        timings["total"] = round(time.perf_counter() - started, 3)
+        JOB_STAGE_SECONDS.observe(timings["total"], stage="total")
+        job = await asyncio.to_thread(
+            job_store.update, job_id, status="completed", payment_status="completed", result=result_string,
+            pending_result=None, error=None, timings=timings
+        )
+        if job is not None:
+            publish_status(job_id, job)
+        JOBS_TOTAL.inc(outcome="completed")
+
+        # Payment is done, drop the local instance
+        payment_instances.pop(job_id, None)
     except Exception as e:
-        logger.error(f"Error processing payment {payment_id} for job {job_id}: {str(e)}", exc_info=True)
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = str(e)
+        logger.error("Error processing payment %s for job %s: %s", payment_id, job_id, e, exc_info=True)
+        timings["total"] = round(time.perf_counter() - started, 3)
+        job = await asyncio.to_thread(
+            job_store.update, job_id, status="queued" if retry else "failed", error=str(e), timings=timings
+        )
+        if job is not None:
+            publish_status(job_id, job)
+        if retry:
+            raise
+        JOBS_TOTAL.inc(outcome="failed")
         
-        # Still stop monitoring to prevent repeated failures
-        if job_id in payment_instances:
-            payment_instances[job_id].stop_status_monitoring()
-            del payment_instances[job_id]
+        # Drop the local instance so the failed job is not retried
+        payment_instances.pop(job_id, None)
+    finally:
+        crew_executor.release(job_id)
+        JOBS_IN_FLIGHT.dec()
+
+async def complete_batch_payments(job_id: str) -> None:
+    """
+    Submits each finished prompt's result to that prompt's own payment
+
+    Payments of failed prompts are left uncompleted, so the buyer gets them back once
+    they unlock. Completed payments are marked on the item, so a retry skips them.
+    """
+    items = (await asyncio.to_thread(job_store.get, job_id))["items"]
+    for item in items:
+        if item["status"] != "completed" or item.get("payment_completed"):
+            continue
+        with PAYMENT_CALL_SECONDS.time(operation="complete_payment"):
+            await item_payment(item).complete_payment(item["blockchain_identifier"], item["result"])
+        item["payment_completed"] = True
+        await asyncio.to_thread(job_store.update, job_id, items=items)
+
+async def process_queued_job(job_id: str, payload: dict, attempt: int, last_attempt: bool) -> None:
+    """ Worker mode: runs one job leased from the job queue (raises to have it retried) """
+    JOB_STAGE_SECONDS.observe(max(0.0, time.time() - payload["enqueued_at"]), stage="job_queue_wait")
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None or job["status"] in TERMINAL_STATUSES:
+        # Evicted, or finished by an earlier attempt whose lease ran out
+        return
+    try:
+        await process_paid_job(job_id, payload["payment_id"], retry=not last_attempt)
+    finally:
+        # Nobody subscribes to a worker process's events: don't keep their history
+        job_event_hub.discard(job_id)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 3) Check Job and Payment Status (MIP-003: /status)
 # ─────────────────────────────────────────────────────────────────────────────
 @app.get("/status")
-async def get_status(job_id: str):
-    """ Retrieves the current status of a specific job """
-    logger.info(f"Checking status for job {job_id}")
-    if job_id not in jobs:
-        logger.warning(f"Job {job_id} not found")
+async def get_status(job_id: str, response: Response):
+    """ Retrieves the current status of a specific job from its last known state """
+    logger.info("Checking status for job %s", job_id)
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        logger.warning("Job %s not found", job_id)
         raise HTTPException(status_code=404, detail="Job not found")
 
-    job = jobs[job_id]
-
-    # Check latest payment status if payment instance exists
-    if job_id in payment_instances:
-        try:
-            status = await payment_instances[job_id].check_payment_status()
-            job["payment_status"] = status.get("data", {}).get("status")
-            logger.info(f"Updated payment status for job {job_id}: {job['payment_status']}")
-        except ValueError as e:
-            logger.warning(f"Error checking payment status: {str(e)}")
-            job["payment_status"] = "unknown"
-        except Exception as e:
-            logger.error(f"Error checking payment status: {str(e)}", exc_info=True)
-            job["payment_status"] = "error"
+    # Answer from the stored state; if it is stale, have the poller check the job's payments
+    # in its next cycle, which shares one listing across all jobs and dispatches confirmations.
+    checked_at = max(
+        [job.get("payment_checked_at") or job["created_at"]]
+        + [payment_checks[bid][2] for bid in payment_ids(job) if bid in payment_checks]
+    )
+    age = max(0.0, time.time() - checked_at)
+    if job["status"] == "awaiting_payment" and age > PAYMENT_STATUS_MAX_AGE:
+        for blockchain_identifier in payment_ids(job):
+            payment_poller.check_soon(blockchain_identifier)
 
+    response.headers["Age"] = str(int(age))
+    response.headers["X-Payment-Status-Checked-At"] = datetime.fromtimestamp(checked_at, timezone.utc).isoformat()
 
-    result_data = job.get("result")
-    result = result_data.raw if result_data and hasattr(result_data, "raw") else None
+    result = job.get("result")
 
     return {
         "job_id": job_id,
@@ -275,21 +943,110 @@ async def get_status(job_id: str):
         "result": result
     }
 
+@app.get("/batch_status")
+async def get_batch_status(batch_id: str):
+    """ Retrieves the status and result of each prompt in a batch job """
+    job = await asyncio.to_thread(job_store.get, batch_id)
+    if job is None or job.get("items") is None:
+        logger.warning("Batch %s not found", batch_id)
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    items = job["items"]
+    counts = {}
+    for item in items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+    return {
+        "batch_id": batch_id,
+        "status": job["status"],
+        "payment_status": job["payment_status"],
+        "counts": counts,
+        "items": [{"index": index, **item} for index, item in enumerate(items)]
+    }
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 3b) Stream Job Progress (Server-Sent Events)
+# ─────────────────────────────────────────────────────────────────────────────
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+# Queue mode: seconds between job store checks for status changes made by worker processes
+STREAM_STORE_POLL_SECONDS = float(os.getenv("STREAM_STORE_POLL_SECONDS", "2"))
+
+@app.get("/status/stream")
+async def stream_status(job_id: str, request: Request, last_event_id: str | None = Header(None)):
+    """
+    Streams a job's progress as Server-Sent Events instead of polling /status.
+
+    Events: status (status changes, with the result once finished), queries (the
+    analyst's search queries), search_started / search (Pexels progress per query),
+    photo (each curated photo as soon as it is chosen) and task_completed.
+    The stream ends after the job completes or fails.
+
+    With JOB_EXECUTION=queue the crew runs in a worker process whose progress events
+    don't reach this process: the stream then carries status events only, read from
+    the job store every STREAM_STORE_POLL_SECONDS.
+    """
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        logger.warning("Job %s not found", job_id)
+        raise HTTPException(status_code=404, detail="Job not found")
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    heartbeat = STREAM_HEARTBEAT_SECONDS if job_queue is None else min(STREAM_HEARTBEAT_SECONDS, STREAM_STORE_POLL_SECONDS)
+
+    async def events():
+        yield format_sse(None, "status", status_event(job))
+        if job["status"] in TERMINAL_STATUSES:
+            return
+        last_status = job["status"]
+        async for item in job_event_hub.subscribe(job_id, after, heartbeat):
+            if await request.is_disconnected():
+                break
+            if item is None:
+                # Quiet for a while: the job may be running in another worker process, so check the store
+                current = await asyncio.to_thread(job_store.get, job_id)
+                if current is None:
+                    break
+                if current["status"] != last_status:
+                    last_status = current["status"]
+                    yield format_sse(None, "status", status_event(current))
+                if current["status"] in TERMINAL_STATUSES:
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            seq, event, data = item
+            if event == "status":
+                last_status = data["status"]
+            yield format_sse(seq, event, data)
+            if event == "status" and data["status"] in TERMINAL_STATUSES:
+                break
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 4) Check Server Availability (MIP-003: /availability)
 # ─────────────────────────────────────────────────────────────────────────────
 @app.get("/availability")
 async def check_availability():
-    """ Checks if the server is operational """
+    """ Checks if the server is operational and has free crew capacity (worker capacity with a job queue) """
     agent_identifier = os.getenv("AGENT_IDENTIFIER")
+    load = capacity()
+    available = load["free_slots"] > 0
     
     return {
-        "status": "available", 
+        "status": "available" if available else "unavailable", 
         "type": "masumi-agent", 
         "agent_type": "stock-photo-search",
         "agentIdentifier": agent_identifier,
         "version": "1.0.0",
-        "message": "Stock Photo Search Agent operational and ready to process photo search queries."
+        "capacity": load,
+        "message": (
+            "Stock Photo Search Agent operational and ready to process photo search queries."
+            if available else
+            "Stock Photo Search Agent is at capacity. Please retry shortly."
+        )
     }
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -381,15 +1138,112 @@ async def get_agent_metadata():
 # ─────────────────────────────────────────────────────────────────────────────
 # 7) Health Check
 # ─────────────────────────────────────────────────────────────────────────────
+@app.get("/startup")
+async def startup_report():
+    """
+    Returns cold-start timings: seconds from process start to each milestone
+    (app_ready, crews_ready) and the import time of each lazily loaded module.
+    """
+    return startup.report()
+
 @app.get("/health")
 async def health():
     """
     Returns the health of the server.
     """
     return {
-        "status": "healthy"
+        "status": "healthy",
+        "crews_ready": startup.reached("crews_ready"),
+        "job_queue": job_queue.stats() if job_queue is not None else None
+    }
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 8) Cache Statistics
+# ─────────────────────────────────────────────────────────────────────────────
+@app.get("/cache_stats")
+async def cache_stats():
+    """
+    Returns hit rates for the job result cache, the Pexels response cache and the local photo catalog.
+    """
+    search_cache = get_search_cache()
+    photo_catalog = get_photo_catalog()
+    return {
+        "result_cache": result_cache.stats() if result_cache is not None else None,
+        "pexels_cache": search_cache.stats() if search_cache is not None else None,
+        "photo_catalog": photo_catalog.stats() if photo_catalog is not None else None
     }
 
+# ─────────────────────────────────────────────────────────────────────────────
+# 9) Prometheus Metrics
+# ─────────────────────────────────────────────────────────────────────────────
+def _cache_counts() -> dict:
+    """ Hit/miss counters of every cache, labelled by cache and result """
+    counts = {}
+    if result_cache is not None:
+        stats = result_cache.stats()
+        counts[("result", "hit")] = stats["exact_hits"] + stats["near_hits"]
+        counts[("result", "miss")] = stats["misses"]
+    search_cache = get_search_cache()
+    if search_cache is not None:
+        stats = search_cache.stats()
+        counts[("pexels", "hit")] = stats["hits"]
+        counts[("pexels", "miss")] = stats["misses"]
+    photo_catalog = get_photo_catalog()
+    if photo_catalog is not None:
+        counts[("photo_catalog", "hit")] = photo_catalog.local_hits
+        counts[("photo_catalog", "miss")] = photo_catalog.fallbacks
+    return counts
+
+REGISTRY.register(FunctionMetric(
+    "stock_photo_crew_workers", "Crew executor slots by state",
+    lambda: {(state,): crew_executor.stats()[state] for state in ("running", "queued", "reserved", "free_slots", "max_workers")},
+    labelnames=["state"]
+))
+REGISTRY.register(FunctionMetric(
+    "stock_photo_pending_payments", "Payments the poller is waiting on",
+    lambda: payment_poller.stats()["pending"]
+))
+REGISTRY.register(FunctionMetric(
+    "stock_photo_payment_poller_upstream_calls_total", "Payment listing calls made by the poller",
+    lambda: payment_poller.stats()["upstream_calls"], kind="counter"
+))
+REGISTRY.register(FunctionMetric(
+    "stock_photo_cache_lookups_total", "Cache lookups by cache and result",
+    _cache_counts, labelnames=["cache", "result"], kind="counter"
+))
+REGISTRY.register(FunctionMetric(
+    "stock_photo_job_queue_entries", "Worker job queue entries by state (JOB_EXECUTION=queue)",
+    lambda: {(state,): count for state, count in job_queue.stats().items()} if job_queue is not None else None,
+    labelnames=["state"]
+))
+REGISTRY.register(FunctionMetric(
+    "stock_photo_stream_subscribers", "Clients connected to /status/stream",
+    lambda: job_event_hub.stats()["subscribers"]
+))
+REGISTRY.register(FunctionMetric(
+    "stock_photo_result_cache_seconds_saved_total", "Crew seconds saved by job result cache hits",
+    lambda: result_cache.stats()["seconds_saved"] if result_cache is not None else None, kind="counter"
+))
+
+REGISTRY.register(FunctionMetric(
+    "stock_photo_startup_seconds", "Seconds from process start to each startup milestone",
+    lambda: {(milestone,): seconds for milestone, seconds in startup.report()["milestones"].items()},
+    labelnames=["milestone"]
+))
+REGISTRY.register(FunctionMetric(
+    "stock_photo_import_seconds", "Import time of the heavy modules loaded after startup",
+    lambda: {(module,): seconds for module, seconds in startup.report()["imports"].items()},
+    labelnames=["module"]
+))
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Returns hot-path timings, token usage, cache hits, queue depth and in-flight jobs
+    in the Prometheus text format.
+    """
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Main Logic if Called as a Script
 # ─────────────────────────────────────────────────────────────────────────────
@@ -408,8 +1262,8 @@ def test_standalone():
     print("🔍 Searching for: " + input_data["prompt"])
     print("\n" + "⏳ This will take 30-60 seconds as the AI agents work...\n")
     
-    crew = PhotoSearchCrew(logger=logger)
-    result = crew.crew.kickoff(inputs=input_data)
+    # Same path as a paid job: planning, ranking and filling the curator's picks in by photo ID
+    result = run_crew(input_data["prompt"])
     
     print("\n" + "="*80)
     print("📸 STOCK PHOTO SEARCH RESULTS:")
@@ -417,9 +1271,44 @@ def test_standalone():
     print(result.raw if hasattr(result, 'raw') else result)
     print("="*80 + "\n")
 
+async def fail_abandoned_job(job_id: str, error: str) -> None:
+    """ Worker mode: fails a job the queue gave up on because its worker died on every attempt """
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None or job["status"] in TERMINAL_STATUSES:
+        return
+    await asyncio.to_thread(job_store.update, job_id, status="failed", error=error)
+    JOBS_TOTAL.inc(outcome="failed")
+
+async def run_worker():
+    """
+    Worker mode: runs paid jobs from the job queue until stopped.
+    Start with `python main.py worker`; the API and workers must share JOB_STORE_PATH and JOB_QUEUE_PATH.
+    """
+    await asyncio.to_thread(warm_up)
+    worker = QueueWorker(
+        job_queue, process_queued_job, concurrency=WORKER_CONCURRENCY, on_expired=fail_abandoned_job, logger=logger
+    )
+    try:
+        await worker.run()
+    finally:
+        crew_executor.shutdown()
+        close_http_client()
+        job_store.close()
+        job_queue.close()
+
 if __name__ == "__main__":
     import sys
     
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        if job_queue is None:
+            sys.exit("Worker mode needs JOB_EXECUTION=queue (for the API processes too)")
+        print("\n🛠️  Starting Stock Photo Search Agent worker (%s concurrent jobs)\n" % WORKER_CONCURRENCY)
+        try:
+            asyncio.run(run_worker())
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
     # Check if running in production (Railway sets PORT environment variable)
     if os.getenv("PORT") or (len(sys.argv) > 1 and sys.argv[1] == "api"):
         print("\n" + "="*80)
@@ -434,6 +1323,7 @@ if __name__ == "__main__":
         
         # Use PORT from environment if available (Railway), otherwise default to 8000
         port = int(os.getenv("PORT", 8000))
+        import uvicorn
         uvicorn.run(app, host="0.0.0.0", port=port)
     else:
         test_standalone()
@@ -0,0 +1,237 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+# Default latency buckets in seconds (Pexels calls up to whole crew runs)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base for metrics kept in a Registry and rendered in Prometheus text format."""
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        """Yield (suffix, label string, value) tuples"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{suffix}{labels} {_format_value(value)}" for suffix, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", _format_labels(self.labelnames, key), value
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Distribution of observed values (durations in seconds) in cumulative buckets."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> [bucket counts..., sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        for key, entry in items:
+            for bound, count in zip(self.buckets, entry):
+                yield "_bucket", _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"'), count
+            yield "_sum", _format_labels(self.labelnames, key), entry[-1]
+            yield "_count", _format_labels(self.labelnames, key), entry[-2]
+
+
+class FunctionMetric(Metric):
+    """
+    Metric read at scrape time from a callback, for state owned elsewhere
+    (queue depth, cache statistics).
+
+    Args:
+        fn: Returns a number, or a dict mapping label-value tuples to numbers
+        kind: 'gauge' or 'counter'
+    """
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], object], labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, help_text, labelnames)
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self):
+        values = self.fn()
+        if values is None:
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            if value is not None:
+                yield "", _format_labels(self.labelnames, key), value
+
+
+class Registry:
+    """Set of metrics exported together on /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        blocks = []
+        for metric in metrics:
+            try:
+                blocks.append(metric.render())
+            except Exception as e:
+                blocks.append(f"# {metric.name} unavailable: {str(e)}")
+        return "\n".join(blocks) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Hot-path metrics shared by the app, crew, Pexels tool and stores
+# ─────────────────────────────────────────────────────────────────────────────
+JOB_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "stock_photo_job_stage_seconds", "Time spent per job stage", ["stage"]
+))
+JOBS_TOTAL = REGISTRY.register(Counter(
+    "stock_photo_jobs_total", "Paid jobs finished, by outcome", ["outcome"]
+))
+JOBS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "stock_photo_jobs_in_flight", "Paid jobs currently being processed"
+))
+CREW_TASK_SECONDS = REGISTRY.register(Histogram(
+    "stock_photo_crew_task_seconds", "Duration of each crew task", ["task"]
+))
+LLM_CALLS_TOTAL = REGISTRY.register(Counter(
+    "stock_photo_llm_calls_total", "LLM calls made by crew tasks", ["task"]
+))
+LLM_TOKENS_TOTAL = REGISTRY.register(Counter(
+    "stock_photo_llm_tokens_total", "LLM tokens used by crew tasks", ["task", "kind"]
+))
+CREW_RUNS_COALESCED_TOTAL = REGISTRY.register(Counter(
+    "stock_photo_crew_runs_coalesced_total", "Jobs answered by joining an identical in-flight crew run"
+))
+QUERY_EXPANSION_TOTAL = REGISTRY.register(Counter(
+    "stock_photo_query_expansion_total", "Jobs by where their search queries came from (rules or the analyst LLM)", ["source"]
+))
+PEXELS_TOOL_SECONDS = REGISTRY.register(Histogram(
+    "stock_photo_pexels_tool_seconds", "Duration of Pexels tool calls", ["tool"]
+))
+PEXELS_SEARCHES_TOTAL = REGISTRY.register(Counter(
+    "stock_photo_pexels_searches_total", "Pexels searches by where they were answered", ["source"]
+))
+PEXELS_API_SECONDS = REGISTRY.register(Histogram(
+    "stock_photo_pexels_api_seconds", "Latency of Pexels API requests", ["outcome"]
+))
+PEXELS_RETRIES_TOTAL = REGISTRY.register(Counter(
+    "stock_photo_pexels_retries_total", "Pexels requests retried, by status code or error", ["reason"]
+))
+PEXELS_RATE_LIMIT_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "stock_photo_pexels_rate_limit_wait_seconds", "Time Pexels requests waited for a rate-limit slot",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+))
+PEXELS_QUOTA_REMAINING = REGISTRY.register(Gauge(
+    "stock_photo_pexels_quota_remaining", "Requests left in the Pexels quota, from the last response headers"
+))
+PEXELS_CANDIDATES_TOTAL = REGISTRY.register(Counter(
+    "stock_photo_pexels_candidates_total", "Photos found by searches and photos passed on to the curator", ["stage"]
+))
+PHOTO_LOOKUPS_TOTAL = REGISTRY.register(Counter(
+    "stock_photo_photo_lookups_total", "Curated photo IDs filled in with their details, by where the details came from", ["source"]
+))
+PAYMENT_CALL_SECONDS = REGISTRY.register(Histogram(
+    "stock_photo_payment_call_seconds", "Latency of payment service calls", ["operation"]
+))
+JOB_STORE_SECONDS = REGISTRY.register(Histogram(
+    "stock_photo_job_store_seconds", "Latency of job store operations", ["operation"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+))
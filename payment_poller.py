@@ -0,0 +1,213 @@
+import os
+import time
+import asyncio
+import inspect
+from typing import Awaitable, Callable, Dict, Optional
+from logging_config import get_logger
+from metrics import PAYMENT_CALL_SECONDS
+
+# Payment states that mean the buyer has paid and the job can run (same rules as masumi's monitor)
+CONFIRMED_ON_CHAIN_STATES = ("FundsLocked", "Complete")
+CONFIRMED_NEXT_ACTIONS = ("PaymentComplete", "None")
+
+
+class PaymentPoller:
+    """
+    One scheduler for every pending payment, replacing a monitoring loop per job.
+
+    The payment service only lists all of the agent's payments, so every poll
+    cycle makes one listing call (paged by `page_size`) and matches all due
+    payments against it. Each payment's check interval grows with its age, so
+    outbound traffic grows slowly with the number of pending jobs. When a payment confirms, on_confirmed
+    is dispatched as `on_confirmed(job_id, blockchain_identifier)`. If given,
+    on_status(job_id, blockchain_identifier, payment) receives every check result
+    (payment is None when the service did not list it yet); it may be async.
+    check_soon() pulls a payment's next check forward (e.g. for a stale /status)
+    while keeping listings at least `min_spacing` seconds apart.
+
+    Args:
+        payment_factory: Returns a masumi Payment used to query the payment service
+        on_confirmed: Async callback run for each confirmed payment
+        base_interval: Seconds between checks for a new payment
+        max_interval: Upper bound on the interval for old payments
+        backoff_after: Age in seconds after which the interval doubles (and doubles again each period)
+        page_size: Payments per page of the listing
+        min_spacing: Minimum seconds between listings started by check_soon()
+        on_status: Optional callback for every status observed
+    """
+
+    def __init__(
+        self,
+        payment_factory: Callable[[], object],
+        on_confirmed: Callable[[str, str], Awaitable[None]],
+        base_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        backoff_after: Optional[float] = None,
+        page_size: Optional[int] = None,
+        min_spacing: Optional[float] = None,
+        on_status: Optional[Callable[[str, str, Optional[dict]], Optional[Awaitable[None]]]] = None,
+        logger=None
+    ):
+        self.payment_factory = payment_factory
+        self.on_confirmed = on_confirmed
+        self.on_status = on_status
+        self.base_interval = base_interval or float(os.getenv("PAYMENT_POLL_INTERVAL", "10"))
+        self.max_interval = max_interval or float(os.getenv("PAYMENT_POLL_MAX_INTERVAL", "120"))
+        self.backoff_after = backoff_after or float(os.getenv("PAYMENT_POLL_BACKOFF_AFTER", "300"))
+        self.page_size = page_size or int(os.getenv("PAYMENT_POLL_PAGE_SIZE", "100"))
+        self.min_spacing = min_spacing if min_spacing is not None else float(os.getenv("PAYMENT_POLL_MIN_SPACING", "1"))
+        self.logger = logger or get_logger(__name__)
+        # blockchain_identifier -> {"job_id", "registered_at", "next_check"}
+        self._pending: Dict[str, dict] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._callback_tasks = set()
+        self._last_poll = float("-inf")
+        self.upstream_calls = 0
+        self.confirmed = 0
+
+    def interval_for(self, age: float) -> float:
+        """Check interval for a payment registered `age` seconds ago"""
+        doublings = int(age // self.backoff_after)
+        return min(self.max_interval, self.base_interval * (2 ** min(doublings, 16)))
+
+    def track(self, blockchain_identifier: str, job_id: str, age: float = 0.0) -> None:
+        """
+        Start watching a payment; the first check happens after base_interval
+
+        `age` is how long the payment has been pending already (for payments
+        picked up again after a restart), so their interval keeps backing off.
+        """
+        now = time.monotonic()
+        self._pending[blockchain_identifier] = {
+            "job_id": job_id,
+            "registered_at": now - max(0.0, age),
+            "next_check": now + self.base_interval,
+        }
+        self._wakeup.set()
+
+    def check_soon(self, blockchain_identifier: str) -> bool:
+        """
+        Check a tracked payment in the next poll cycle instead of waiting for its interval
+
+        Returns:
+            False if the payment is not tracked (confirmed or never registered)
+        """
+        entry = self._pending.get(blockchain_identifier)
+        if entry is None:
+            return False
+        due = max(time.monotonic(), self._last_poll + self.min_spacing)
+        if due < entry["next_check"]:
+            entry["next_check"] = due
+            self._wakeup.set()
+        return True
+
+    def untrack(self, blockchain_identifier: str) -> None:
+        self._pending.pop(blockchain_identifier, None)
+
+    def untrack_jobs(self, job_ids) -> None:
+        """Stop watching the payments of these jobs (e.g. evicted ones)"""
+        job_ids = set(job_ids)
+        for bid in [bid for bid, entry in self._pending.items() if entry["job_id"] in job_ids]:
+            del self._pending[bid]
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "upstream_calls": self.upstream_calls,
+            "confirmed": self.confirmed,
+        }
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self.logger.info(
+                "Payment poller started (interval %ss-%ss, page size %s)", self.base_interval, self.max_interval, self.page_size
+            )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self.logger.info("Payment poller stopped")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._sleep_until_due()
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error("Error in payment poller: %s", e, exc_info=True)
+                await asyncio.sleep(self.base_interval)
+
+    async def _sleep_until_due(self) -> None:
+        self._wakeup.clear()
+        if not self._pending:
+            await self._wakeup.wait()
+            return
+        delay = min(entry["next_check"] for entry in self._pending.values()) - time.monotonic()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def poll_once(self) -> None:
+        """Check every payment that is due against one listing of the payment service"""
+        now = time.monotonic()
+        due = [bid for bid, entry in self._pending.items() if entry["next_check"] <= now]
+        if not due:
+            return
+        checker = self.payment_factory()
+        checker.payment_ids = set(due)
+        self.upstream_calls += 1
+        self._last_poll = now
+        try:
+            with PAYMENT_CALL_SECONDS.time(operation="check_payment_status"):
+                result = await checker.check_payment_status(limit=self.page_size)
+            payments = result.get("data", {}).get("Payments", [])
+        except Exception as e:
+            self.logger.warning("Payment status check failed for %s payment(s): %s", len(due), e)
+            payments = None
+        await self._apply(due, payments)
+
+    async def _apply(self, due, payments) -> None:
+        """Act on the listing for the due payments (payments is None when the check failed)"""
+        by_id = {p.get("blockchainIdentifier"): p for p in payments or []}
+        now = time.monotonic()
+        for bid in due:
+            entry = self._pending.get(bid)
+            if entry is None:
+                continue
+            payment = by_id.get(bid)
+            if self.on_status is not None and payments is not None:
+                try:
+                    recorded = self.on_status(entry["job_id"], bid, payment)
+                    if inspect.isawaitable(recorded):
+                        await recorded
+                except Exception as e:
+                    self.logger.warning("Payment status callback failed for %s: %s", bid, e)
+            if payment is not None and self._is_confirmed(payment):
+                self.untrack(bid)
+                self.confirmed += 1
+                self.logger.info("Payment %s confirmed for job %s", bid, entry['job_id'])
+                self._dispatch(entry["job_id"], bid)
+            else:
+                entry["next_check"] = now + self.interval_for(now - entry["registered_at"])
+
+    @staticmethod
+    def _is_confirmed(payment: dict) -> bool:
+        on_chain_state = payment.get("onChainState")
+        next_action = (payment.get("NextAction") or {}).get("requestedAction")
+        return on_chain_state in CONFIRMED_ON_CHAIN_STATES or next_action in CONFIRMED_NEXT_ACTIONS
+
+    def _dispatch(self, job_id: str, blockchain_identifier: str) -> None:
+        task = asyncio.create_task(self.on_confirmed(job_id, blockchain_identifier))
+        self._callback_tasks.add(task)
+        task.add_done_callback(self._callback_tasks.discard)
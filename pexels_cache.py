@@ -0,0 +1,194 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonicalize a search query so trivially different phrasings share a cache entry
+
+    Lowercases, drops punctuation, collapses whitespace, removes repeated words
+    and sorts the words ("Coffee  shop" and "shop coffee" map to the same key).
+    """
+    words = re.findall(r"[a-z0-9]+", query.lower())
+    return " ".join(sorted(set(words)))
+
+
+def cache_key(query: str, per_page: int, orientation: Optional[str] = None, page: int = 1) -> str:
+    key = f"{normalize_query(query)}|{per_page}|{(orientation or '').lower()}"
+    # First pages keep the key they had before pagination
+    return key if page == 1 else f"{key}|{page}"
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with a per-entry TTL
+
+    Args:
+        max_size: Maximum number of entries before the least recently used is evicted
+        ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def keys(self) -> list:
+        """Snapshot of the current keys, least recently used first"""
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "size": len(self),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteCache(MemoryCache):
+    """
+    On-disk LRU cache with a per-entry TTL that survives restarts
+
+    Values must be JSON serializable.
+
+    Args:
+        path: SQLite database file
+        max_size: Maximum number of entries before the least recently used is evicted
+        ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, path: str = "cache/pexels_cache.db", max_size: int = 5000, ttl: float = 86400):
+        super().__init__(max_size=max_size, ttl=ttl)
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pexels_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pexels_cache_last_used ON pexels_cache(last_used)")
+            self._conn.execute("DELETE FROM pexels_cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM pexels_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM pexels_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE pexels_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pexels_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, payload, now + self.ttl, now)
+            )
+            overflow = len(self) - self.max_size
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM pexels_cache WHERE key IN "
+                    "(SELECT key FROM pexels_cache ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM pexels_cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pexels_cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {**super().stats(), "backend": "sqlite", "path": self.path}
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def create_cache_from_env() -> Optional[MemoryCache]:
+    """
+    Build the Pexels response cache configured by environment variables
+
+    PEXELS_CACHE_BACKEND: 'memory' (default), 'sqlite' or 'none'
+    PEXELS_CACHE_SIZE, PEXELS_CACHE_TTL: entry bound and TTL in seconds
+    PEXELS_CACHE_PATH: database file for the sqlite backend
+
+    Returns:
+        A cache instance, or None when caching is disabled
+    """
+    backend = os.getenv("PEXELS_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("PEXELS_CACHE_TTL", "3600"))
+    if backend in ("none", "off", ""):
+        logger.info("Pexels response cache disabled")
+        return None
+    if backend == "sqlite":
+        path = os.getenv("PEXELS_CACHE_PATH", "cache/pexels_cache.db")
+        size = int(os.getenv("PEXELS_CACHE_SIZE", "5000"))
+        logger.info("Using SQLite Pexels cache at %s (size=%s, ttl=%ss)", path, size, ttl)
+        return SQLiteCache(path=path, max_size=size, ttl=ttl)
+    size = int(os.getenv("PEXELS_CACHE_SIZE", "512"))
+    logger.info("Using in-memory Pexels cache (size=%s, ttl=%ss)", size, ttl)
+    return MemoryCache(max_size=size, ttl=ttl)
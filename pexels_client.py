@@ -0,0 +1,357 @@
+import os
+import time
+import random
+import threading
+import contextvars
+import httpx
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+from logging_config import get_logger
+from pexels_cache import create_cache_from_env
+from photo_catalog import create_photo_catalog_from_env
+from photo_records import PhotoRecord
+from metrics import (
+    PEXELS_API_SECONDS, PEXELS_QUOTA_REMAINING, PEXELS_RATE_LIMIT_WAIT_SECONDS, PEXELS_RETRIES_TOTAL, PEXELS_SEARCHES_TOTAL,
+    PHOTO_LOOKUPS_TOTAL
+)
+from rate_limiter import RateLimitTimeout, create_rate_limiter_from_env, current_priority
+
+logger = get_logger(__name__)
+
+# Base URL of the Pexels API; PEXELS_API_URL overrides it (e.g. a local fake for benchmarks)
+DEFAULT_PEXELS_API_URL = "https://api.pexels.com/v1"
+
+# One pooled, keep-alive client per process, shared by every tool instance and job
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+
+# Response cache shared by every tool instance, created on first search
+_search_cache = None
+_search_cache_ready = False
+_search_cache_lock = threading.Lock()
+
+# Local catalog of every photo seen, shared by every tool instance, created on first search
+_photo_catalog = None
+_photo_catalog_ready = False
+_photo_catalog_lock = threading.Lock()
+
+# Client-side rate limiter shared by every Pexels request, created on first search
+_rate_limiter = None
+_rate_limiter_ready = False
+_rate_limiter_lock = threading.Lock()
+
+# Responses worth retrying: rate limited or a transient server error
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Connection failures where the request never reached Pexels
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+# Searches shared by a group of jobs (e.g. one batch) in the current context
+_shared_searches = contextvars.ContextVar("shared_searches", default=None)
+
+# Worker threads used to fan multi-query searches out in parallel
+_search_executor: Optional[ThreadPoolExecutor] = None
+_search_executor_lock = threading.Lock()
+
+
+def _http2_enabled() -> bool:
+    if os.getenv("PEXELS_HTTP2", "true").lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("PEXELS_HTTP2 requested but the 'h2' package is missing, falling back to HTTP/1.1")
+        return False
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Get the shared Pexels HTTP client, creating it on first use
+
+    Limits and timeouts come from PEXELS_MAX_CONNECTIONS, PEXELS_MAX_KEEPALIVE,
+    PEXELS_KEEPALIVE_EXPIRY, PEXELS_TIMEOUT and PEXELS_CONNECT_TIMEOUT.
+
+    Returns:
+        A thread-safe httpx.Client with connection pooling
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None or _http_client.is_closed:
+            limits = httpx.Limits(
+                max_connections=int(os.getenv("PEXELS_MAX_CONNECTIONS", "20")),
+                max_keepalive_connections=int(os.getenv("PEXELS_MAX_KEEPALIVE", "10")),
+                keepalive_expiry=float(os.getenv("PEXELS_KEEPALIVE_EXPIRY", "60"))
+            )
+            timeout = httpx.Timeout(
+                float(os.getenv("PEXELS_TIMEOUT", "30")),
+                connect=float(os.getenv("PEXELS_CONNECT_TIMEOUT", "5"))
+            )
+            http2 = _http2_enabled()
+            _http_client = httpx.Client(http2=http2, limits=limits, timeout=timeout)
+            logger.info("Created Pexels HTTP client (http2=%s)", http2)
+        return _http_client
+
+
+def get_search_cache():
+    """
+    Get the shared Pexels response cache (see pexels_cache.create_cache_from_env)
+
+    Returns:
+        The cache instance, or None when caching is disabled
+    """
+    global _search_cache, _search_cache_ready
+    with _search_cache_lock:
+        if not _search_cache_ready:
+            _search_cache = create_cache_from_env()
+            _search_cache_ready = True
+        return _search_cache
+
+
+def get_photo_catalog():
+    """
+    Get the shared local photo catalog (see photo_catalog.create_photo_catalog_from_env)
+
+    Returns:
+        The catalog instance, or None when the catalog is disabled or could not be opened
+    """
+    global _photo_catalog, _photo_catalog_ready
+    with _photo_catalog_lock:
+        if not _photo_catalog_ready:
+            try:
+                _photo_catalog = create_photo_catalog_from_env()
+            except Exception as e:
+                # No FTS5, a read-only disk or a locked database: search Pexels without it
+                logger.warning("Photo catalog unavailable, searching without it: %s", e)
+                _photo_catalog = None
+            _photo_catalog_ready = True
+        return _photo_catalog
+
+
+def get_rate_limiter():
+    """
+    Get the shared Pexels rate limiter (see rate_limiter.create_rate_limiter_from_env)
+
+    Returns:
+        The limiter instance, or None when rate limiting is disabled
+    """
+    global _rate_limiter, _rate_limiter_ready
+    with _rate_limiter_lock:
+        if not _rate_limiter_ready:
+            _rate_limiter = create_rate_limiter_from_env()
+            _rate_limiter_ready = True
+        return _rate_limiter
+
+
+def _retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    """Seconds the server asked us to wait (Retry-After), if it said"""
+    if response is None or not response.headers.get("Retry-After"):
+        return None
+    try:
+        return max(0.0, float(response.headers["Retry-After"]))
+    except ValueError:
+        return None
+
+
+def _backoff_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Retry-After when the server sent one, else full-jitter exponential backoff capped at PEXELS_BACKOFF_MAX"""
+    retry_after = _retry_after(response)
+    if retry_after is not None:
+        return retry_after
+    cap = float(os.getenv("PEXELS_BACKOFF_MAX", "10"))
+    base = float(os.getenv("PEXELS_BACKOFF_BASE", "0.5"))
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def pexels_get(url: str, headers: dict, params: dict) -> httpx.Response:
+    """
+    GET a Pexels endpoint through the shared rate limiter, retrying 429/5xx and
+    connection failures with jittered backoff (PEXELS_MAX_RETRIES, default 3)
+
+    Returns:
+        The successful response
+
+    Raises:
+        httpx.HTTPError: If the request still fails after the retries
+        RateLimitTimeout: If no rate-limit slot became available in time, or Pexels asked for a longer wait
+    """
+    limiter = get_rate_limiter()
+    max_retries = int(os.getenv("PEXELS_MAX_RETRIES", "3"))
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            PEXELS_RATE_LIMIT_WAIT_SECONDS.observe(limiter.acquire(current_priority()))
+        response = None
+        try:
+            response = get_http_client().get(url, headers=headers, params=params)
+        except RETRY_EXCEPTIONS as e:
+            if attempt == max_retries:
+                raise
+            reason = type(e).__name__
+        else:
+            if limiter is not None:
+                limiter.update_from_headers(response.headers)
+                if limiter.quota_remaining is not None:
+                    PEXELS_QUOTA_REMAINING.set(limiter.quota_remaining)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+                response.raise_for_status()
+                return response
+            reason = str(response.status_code)
+        delay = _backoff_delay(attempt, response)
+        retry_after = _retry_after(response)
+        if response is not None and response.status_code == 429 and limiter is not None:
+            # Everyone backs off for as long as Pexels asked, not just this request
+            limiter.block_for(delay)
+        max_wait = limiter.max_wait if limiter is not None else float(os.getenv("PEXELS_RATE_MAX_WAIT", "30"))
+        if retry_after is not None and retry_after > max_wait:
+            # Fail now instead of retrying into a wait longer than a request may take
+            raise RateLimitTimeout(f"Pexels asked to retry after {retry_after:.0f}s, more than the {max_wait:.0f}s a request may wait")
+        PEXELS_RETRIES_TOTAL.inc(reason=reason)
+        logger.warning("Pexels request failed (%s), retry %s/%s in %.2fs", reason, attempt + 1, max_retries, delay)
+        time.sleep(delay)
+
+
+def _fetch_photo(photo_id: int) -> Optional[PhotoRecord]:
+    url = os.getenv("PEXELS_API_URL", DEFAULT_PEXELS_API_URL).rstrip("/") + f"/photos/{photo_id}"
+    started = time.perf_counter()
+    try:
+        response = pexels_get(url, {"Authorization": os.getenv("PEXELS_API_KEY", "")}, {})
+    except httpx.HTTPStatusError as e:
+        PEXELS_API_SECONDS.observe(time.perf_counter() - started, outcome="error")
+        if e.response.status_code == 404:
+            return None
+        raise
+    except Exception:
+        PEXELS_API_SECONDS.observe(time.perf_counter() - started, outcome="error")
+        raise
+    PEXELS_API_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+    return PhotoRecord.from_api(response.json())
+
+
+def fetch_photos(ids: Iterable[int]) -> Dict[int, PhotoRecord]:
+    """
+    Look photos up by ID: response cache and local catalog first, then the
+    Pexels photo endpoint (GET /photos/{id}) for the rest, in parallel
+
+    Returns:
+        The photos found, by ID (unknown IDs and failed lookups are left out)
+    """
+    ids = list(dict.fromkeys(ids))
+    cache = get_search_cache()
+    found = {}
+    if cache is not None:
+        for photo_id in ids:
+            cached = cache.get(f"photo:{photo_id}")
+            if cached is not None:
+                found[photo_id] = PhotoRecord.from_dict(cached)
+        PHOTO_LOOKUPS_TOTAL.inc(len(found), source="cache")
+    catalog = get_photo_catalog()
+    if catalog is not None:
+        local = catalog.get(photo_id for photo_id in ids if photo_id not in found)
+        PHOTO_LOOKUPS_TOTAL.inc(len(local), source="catalog")
+        found.update(local)
+    missing = [photo_id for photo_id in ids if photo_id not in found]
+    if not missing:
+        return found
+
+    executor = get_search_executor()
+    futures = [executor.submit(contextvars.copy_context().run, _fetch_photo, photo_id) for photo_id in missing]
+    for photo_id, future in zip(missing, futures):
+        try:
+            record = future.result()
+        except Exception as e:
+            logger.warning("Could not look up Pexels photo %s: %s", photo_id, e)
+            PHOTO_LOOKUPS_TOTAL.inc(source="missing")
+            continue
+        if record is None:
+            logger.warning("Pexels photo %s does not exist", photo_id)
+            PHOTO_LOOKUPS_TOTAL.inc(source="missing")
+            continue
+        PHOTO_LOOKUPS_TOTAL.inc(source="api")
+        found[photo_id] = record
+        if cache is not None:
+            cache.set(f"photo:{photo_id}", record.to_dict())
+    return found
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """Get the shared thread pool for parallel searches (PEXELS_MAX_PARALLEL threads)"""
+    global _search_executor
+    with _search_executor_lock:
+        if _search_executor is None:
+            _search_executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("PEXELS_MAX_PARALLEL", "8")),
+                thread_name_prefix="pexels"
+            )
+        return _search_executor
+
+
+def close_http_client() -> None:
+    """Close the shared Pexels HTTP client and search threads (called on application shutdown)"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+            logger.info("Closed Pexels HTTP client")
+    global _search_executor
+    with _search_executor_lock:
+        if _search_executor is not None:
+            _search_executor.shutdown(wait=False)
+            _search_executor = None
+
+
+class SharedSearches:
+    """
+    Coalesces identical Pexels searches made by a group of jobs, such as the
+    prompts of one batch.
+
+    The first search for a (query, per_page, orientation) runs; identical
+    searches from the group, concurrent or later, reuse its result. A failed
+    search is not remembered, so the next caller tries again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: Dict[str, Future] = {}
+        self.searches = 0
+        self.shared = 0
+
+    def run(self, key: str, fn: Callable[[], tuple]) -> tuple:
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+                self.searches += 1
+            else:
+                self.shared += 1
+        if not owner:
+            PEXELS_SEARCHES_TOTAL.inc(source="shared")
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._results.pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"searches": self.searches, "shared": self.shared}
+
+
+def current_shared_searches() -> Optional[SharedSearches]:
+    return _shared_searches.get()
+
+
+@contextmanager
+def sharing_searches(shared: Optional[SharedSearches]):
+    """Coalesce the Pexels searches made in the with-block (and contexts copied from it) through `shared`"""
+    token = _shared_searches.set(shared)
+    try:
+        yield
+    finally:
+        _shared_searches.reset(token)
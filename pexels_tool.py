@@ -1,15 +1,63 @@
 import os
+import time
+import functools
+import contextvars
 import httpx
 from crewai.tools import BaseTool
-from typing import Type, Optional, Any
+from typing import Iterator, Type, Optional, List, Sequence
 from pydantic import BaseModel, Field
+from logging_config import get_logger
+from pexels_cache import cache_key
+from pexels_client import (
+    DEFAULT_PEXELS_API_URL, current_shared_searches, get_photo_catalog, get_search_cache, get_search_executor,
+    pexels_get
+)
+from photo_records import PhotoFilter, PhotoRecord, serialize
+from photo_ranking import rank_photos
+from photo_registry import register_photos
+from metrics import PEXELS_API_SECONDS, PEXELS_CANDIDATES_TOTAL, PEXELS_SEARCHES_TOTAL, PEXELS_TOOL_SECONDS
+from job_events import emit
+from rate_limiter import RateLimitTimeout
+
+logger = get_logger(__name__)
+
+
+# Largest page the Pexels search endpoint serves
+PEXELS_PAGE_SIZE = 80
+
+
+def max_photos_per_search() -> int:
+    """Most photos one tool call may ask for per query: PEXELS_MAX_PAGES (default 3) full pages"""
+    return PEXELS_PAGE_SIZE * int(os.getenv("PEXELS_MAX_PAGES", "3"))
+
+
+def timed_tool_run(method):
+    """Record the duration of a tool's _run in the Pexels tool metrics"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with PEXELS_TOOL_SECONDS.time(tool=self.name):
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class PexelsSearchInput(BaseModel):
     """Input schema for Pexels search tool."""
     query: str = Field(..., description="The search query for finding stock photos (e.g., 'modern office', 'nature sunset')")
-    per_page: int = Field(default=15, description="Number of results to return (max 80)")
+    per_page: int = Field(default=15, description="Number of results to return (max 240)")
     orientation: Optional[str] = Field(default=None, description="Photo orientation: 'landscape', 'portrait', or 'square'")
+    min_width: Optional[int] = Field(default=None, description="Minimum photo width in pixels")
+    min_height: Optional[int] = Field(default=None, description="Minimum photo height in pixels")
+    exclude: Optional[List[str]] = Field(default=None, description="Terms the photo description must not contain (e.g., 'people')")
+
+
+class PexelsMultiSearchInput(BaseModel):
+    """Input schema for the multi-query Pexels search tool."""
+    queries: List[str] = Field(..., description="All search queries to run at once (e.g., the 2-4 queries from the analyst)")
+    per_page: int = Field(default=15, description="Number of results to return per query (max 240)")
+    orientation: Optional[str] = Field(default=None, description="Photo orientation: 'landscape', 'portrait', or 'square'")
+    min_width: Optional[int] = Field(default=None, description="Minimum photo width in pixels")
+    min_height: Optional[int] = Field(default=None, description="Minimum photo height in pixels")
+    exclude: Optional[List[str]] = Field(default=None, description="Terms the photo descriptions must not contain (e.g., 'people')")
 
 
 class PexelsSearchTool(BaseTool):
@@ -21,73 +69,299 @@ class PexelsSearchTool(BaseTool):
     )
     args_schema: Type[BaseModel] = PexelsSearchInput
     api_key: str = Field(default="")
+    # 'text' for compact LLM-facing lines, 'json' for downstream code
+    output_format: str = Field(default_factory=lambda: os.getenv("PEXELS_TOOL_FORMAT", "text"))
+    # Per-photo fields shown to the LLM (default: PEXELS_PHOTO_FIELDS, else all)
+    fields: Optional[List[str]] = Field(default=None)
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, fields: Optional[Sequence[str]] = None):
         super().__init__()
         self.api_key = api_key
+        self.fields = list(fields) if fields else None
+    
+    def _fetch(
+        self, query: str, per_page: int, orientation: Optional[str] = None, photo_filter: Optional[PhotoFilter] = None
+    ) -> tuple[int, List[PhotoRecord]]:
+        """
+        Collect up to per_page qualifying photos, shared with identical searches of the same job group
+        
+        Returns:
+            (total_results, photo records)
+        """
+        shared = current_shared_searches()
+        if shared is None:
+            return self._collect(query, per_page, orientation, photo_filter)
+        key = cache_key(query, per_page, orientation) + (f"|{photo_filter.key()}" if photo_filter else "")
+        return shared.run(key, lambda: self._collect(query, per_page, orientation, photo_filter))
     
-    def _run(self, query: str, per_page: int = 15, orientation: Optional[str] = None) -> str:
+    def _collect(
+        self, query: str, wanted: int, orientation: Optional[str] = None, photo_filter: Optional[PhotoFilter] = None
+    ) -> tuple[int, List[PhotoRecord]]:
+        """
+        Read result pages until `wanted` photos pass the filter, then stop requesting pages
+        
+        Returns:
+            (total_results, photo records)
+        """
+        # Filtered searches drop some results, so read bigger pages to need fewer of them
+        narrowed = photo_filter is not None and photo_filter.narrows_search()
+        page_size = min(PEXELS_PAGE_SIZE, wanted * 2 if narrowed else wanted)
+        pages = self.search_pages(query, page_size, orientation)
+        total_results = 0
+        read = 0
+        seen_ids = set()
+        photos = []
+        try:
+            for total_results, records in pages:
+                read += 1
+                for record in records:
+                    if record.id in seen_ids:
+                        continue
+                    seen_ids.add(record.id)
+                    if photo_filter is None or photo_filter.matches(record):
+                        photos.append(record)
+                if len(photos) >= wanted:
+                    break
+        finally:
+            pages.close()
+        if read > 1 or narrowed:
+            logger.info("Read %s page(s) for '%s': %s of %s photos qualified", read, query, len(photos), len(seen_ids))
+        return total_results, photos[:wanted]
+    
+    def search_pages(self, query: str, per_page: int, orientation: Optional[str] = None) -> Iterator[tuple[int, List[PhotoRecord]]]:
+        """
+        Yield (total_results, photo records) one result page at a time
+        
+        Each page is only requested when the caller asks for it, up to
+        PEXELS_MAX_PAGES pages or until Pexels has no next page.
+        """
+        max_pages = int(os.getenv("PEXELS_MAX_PAGES", "3"))
+        for page in range(1, max_pages + 1):
+            total_results, records, has_next = self._search(query, per_page, orientation, page)
+            yield total_results, records
+            if not has_next:
+                return
+    
+    def _search(
+        self, query: str, per_page: int, orientation: Optional[str] = None, page: int = 1
+    ) -> tuple[int, List[PhotoRecord], bool]:
+        """
+        Fetch one page of search results, served from the response cache when possible
+        
+        Returns:
+            (total_results, photo records, whether a next page exists)
+        
+        Raises:
+            httpx.HTTPError: If the API request fails
+        """
+        cache = get_search_cache()
+        key = "records:" + cache_key(query, per_page, orientation, page)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                logger.info("Pexels cache hit for '%s' (page %s)", query, page)
+                PEXELS_SEARCHES_TOTAL.inc(source="cache")
+                has_next = cached.get("next_page", page * per_page < cached["total_results"])
+                return cached["total_results"], [PhotoRecord.from_dict(p) for p in cached["photos"]], has_next
+        
+        catalog = get_photo_catalog()
+        if catalog is not None and page == 1:
+            try:
+                local = catalog.lookup(query, per_page, orientation)
+            except Exception as e:
+                logger.warning("Could not look up photos in the local catalog: %s", e)
+                local = None
+            if local is not None:
+                logger.info("Photo catalog served %s photos for '%s'", len(local), query)
+                PEXELS_SEARCHES_TOTAL.inc(source="catalog")
+                # If more are needed, Pexels' second page follows (duplicates are dropped by the caller)
+                return len(local), local, True
+        
+        # Build request
+        url = os.getenv("PEXELS_API_URL", DEFAULT_PEXELS_API_URL).rstrip("/") + "/search"
+        headers = {
+            "Authorization": self.api_key
+        }
+        params = {
+            "query": query,
+            "per_page": per_page
+        }
+        
+        if orientation:
+            params["orientation"] = orientation
+        if page > 1:
+            params["page"] = page
+        
+        # Rate-limited, retried request over the shared keep-alive connection pool
+        PEXELS_SEARCHES_TOTAL.inc(source="api")
+        started = time.perf_counter()
+        try:
+            response = pexels_get(url, headers, params)
+        except Exception:
+            PEXELS_API_SECONDS.observe(time.perf_counter() - started, outcome="error")
+            raise
+        PEXELS_API_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+        data = response.json()
+        
+        total_results = data.get("total_results", 0)
+        records = [PhotoRecord.from_api(photo) for photo in data.get("photos") or []]
+        has_next = bool(data.get("next_page"))
+        if catalog is not None:
+            try:
+                catalog.add(query, records)
+            except Exception as e:
+                logger.warning("Could not add photos to the local catalog: %s", e)
+        if cache is not None:
+            # Cache the compact records rather than the full API payload
+            cache.set(key, {"total_results": total_results, "photos": [r.to_dict() for r in records], "next_page": has_next})
+        return total_results, records, has_next
+    
+    @timed_tool_run
+    def _run(
+        self,
+        query: str,
+        per_page: int = 15,
+        orientation: Optional[str] = None,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        exclude: Optional[List[str]] = None
+    ) -> str:
         """
         Execute the Pexels API search.
         
         Args:
             query: Search query string
-            per_page: Number of results (1-80)
+            per_page: Number of results (1-240, fetched page by page)
             orientation: Optional orientation filter
+            min_width: Optional minimum width in pixels
+            min_height: Optional minimum height in pixels
+            exclude: Optional terms the description must not contain
             
         Returns:
             Formatted string with photo results
         """
         try:
             # Validate per_page
-            per_page = min(max(1, per_page), 80)
-            
-            # Build request
-            url = "https://api.pexels.com/v1/search"
-            headers = {
-                "Authorization": self.api_key
-            }
-            params = {
-                "query": query,
-                "per_page": per_page
-            }
-            
-            if orientation:
-                params["orientation"] = orientation
-            
-            # Make synchronous request
-            with httpx.Client() as client:
-                response = client.get(url, headers=headers, params=params, timeout=30.0)
-                response.raise_for_status()
-                data = response.json()
+            per_page = min(max(1, per_page), max_photos_per_search())
+            photo_filter = PhotoFilter.create(orientation, min_width, min_height, exclude)
+            total_results, photos = self._fetch(query, per_page, orientation, photo_filter)
+            emit("search", query=query, photos=len(photos), total_results=total_results)
             
             # Check if photos were found
-            if not data.get("photos"):
+            if not photos:
                 return f"No photos found for query: '{query}'. Try different search terms."
             
-            # Format results - concise format to reduce context size
-            photos = data["photos"]
-            total_results = data.get("total_results", 0)
+            # Only the best local matches go into the LLM context
+            PEXELS_CANDIDATES_TOTAL.inc(len(photos), stage="found")
+            photos = rank_photos(photos, [query], orientation=orientation)
+            PEXELS_CANDIDATES_TOTAL.inc(len(photos), stage="shown")
+            # Remember what the curator saw, so its picks can be filled in by ID
+            register_photos(photos)
             
-            result = f"Found {total_results} photos for '{query}'. Showing top {len(photos)} results:\n\n"
+            if self.output_format == "json":
+                return serialize(photos, "json", self.fields)
             
-            for i, photo in enumerate(photos, 1):
-                # Include alt description for better selection decisions
-                alt_text = photo.get('alt', 'No description available')
-                # Concise format: Description, ID, photographer, dimensions, Pexels page, thumbnail URL, and Original URL
-                result += f"{i}. Description: {alt_text} | "
-                result += f"Photo ID: {photo['id']} | "
-                result += f"Photographer: [{photo['photographer']}]({photo['photographer_url']}) | "
-                result += f"{photo['width']}x{photo['height']} | "
-                result += f"[Pexels]({photo['url']}) | "
-                result += f"Thumbnail: {photo['src']['medium']} | "
-                result += f"[Original]({photo['src']['original']})\n"
-            
-            return result
+            # Format results - compact format to reduce context size
+            header = f"Found {total_results} photos for '{query}'. Showing top {len(photos)} results:"
+            return header + "\n\n" + serialize(photos, "text", self.fields)
             
         except httpx.HTTPStatusError as e:
             return f"Error searching Pexels API: HTTP {e.response.status_code}. Check your API key and query."
         except httpx.TimeoutException:
             return "Request to Pexels API timed out. Please try again."
+        except RateLimitTimeout:
+            return "Pexels rate limit reached. Use the photos found so far or try again later."
         except Exception as e:
             return f"Unexpected error searching Pexels: {str(e)}"
+
+
+class PexelsMultiSearchTool(PexelsSearchTool):
+    name: str = "Search Stock Photos For Multiple Queries"
+    description: str = (
+        "Searches the Pexels API for several queries at once, in parallel. "
+        "Returns one combined, de-duplicated list of photos with URLs, photographer info, and metadata. "
+        "Use this tool with ALL of your search queries in a single call."
+    )
+    args_schema: Type[BaseModel] = PexelsMultiSearchInput
+    
+    @timed_tool_run
+    def _run(
+        self,
+        queries: List[str],
+        per_page: int = 15,
+        orientation: Optional[str] = None,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        exclude: Optional[List[str]] = None
+    ) -> str:
+        """
+        Execute several Pexels searches concurrently and merge the results.
+        
+        Args:
+            queries: Search query strings
+            per_page: Number of results per query (1-240, fetched page by page)
+            orientation: Optional orientation filter
+            min_width: Optional minimum width in pixels
+            min_height: Optional minimum height in pixels
+            exclude: Optional terms the descriptions must not contain
+            
+        Returns:
+            Formatted string with the merged photo results
+        """
+        per_page = min(max(1, per_page), max_photos_per_search())
+        photo_filter = PhotoFilter.create(orientation, min_width, min_height, exclude)
+        queries = [q for q in dict.fromkeys(q.strip() for q in queries) if q]
+        if not queries:
+            return "No search queries provided."
+        
+        emit("search_started", queries=queries)
+        # Search wall-time is the slowest query rather than the sum of all of them
+        executor = get_search_executor()
+        # Copy the context so each search keeps the caller's request priority
+        futures = [
+            executor.submit(contextvars.copy_context().run, self._fetch, q, per_page, orientation, photo_filter)
+            for q in queries
+        ]
+        
+        seen_ids = set()
+        photos = []
+        notes = []
+        for query, future in zip(queries, futures):
+            try:
+                _, found = future.result()
+            except httpx.HTTPStatusError as e:
+                error = f"HTTP {e.response.status_code}"
+            except httpx.TimeoutException:
+                error = "timed out"
+            except RateLimitTimeout:
+                error = "rate limited"
+            except Exception as e:
+                error = str(e)
+            else:
+                error = None
+            if error is not None:
+                notes.append(f"'{query}': {error}")
+                emit("search", query=query, error=error)
+                continue
+            new_photos = [p for p in found if p.id not in seen_ids]
+            seen_ids.update(p.id for p in new_photos)
+            photos.extend(new_photos)
+            notes.append(f"'{query}': {len(found)} photos ({len(new_photos)} new)")
+            emit("search", query=query, photos=len(found), new=len(new_photos))
+        
+        if not photos:
+            return f"No photos found for queries: {', '.join(queries)}. Try different search terms.\n" + "\n".join(notes)
+        
+        # Rank the merged candidates locally so the curator reads a short, diverse list
+        found = len(photos)
+        PEXELS_CANDIDATES_TOTAL.inc(found, stage="found")
+        photos = rank_photos(photos, queries, orientation=orientation)
+        PEXELS_CANDIDATES_TOTAL.inc(len(photos), stage="shown")
+        register_photos(photos)
+        
+        if self.output_format == "json":
+            return serialize(photos, "json", self.fields)
+        
+        shown = f"the best {len(photos)} of {found} unique photos" if len(photos) < found else f"{found} unique photos"
+        header = f"Searched {len(queries)} queries ({'; '.join(notes)}). Showing {shown}:"
+        return header + "\n\n" + serialize(photos, "text", self.fields)
@@ -0,0 +1,240 @@
+import os
+import json
+import math
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+from logging_config import get_logger
+from photo_records import PhotoRecord
+from prompt_text import content_words
+
+logger = get_logger(__name__)
+
+
+class PhotoCatalog:
+    """
+    Persistent full-text catalog of every Pexels photo we have seen.
+
+    Each photo is indexed (SQLite FTS5, porter stemming, BM25 ranking) on its
+    alt text and on the search queries that returned it, so later searches on
+    well-covered topics can be answered locally instead of calling Pexels.
+    The queries come from user prompts, so photos not seen for `ttl` seconds
+    are deleted along with them, and the least recently seen photos are
+    evicted beyond `max_photos`.
+
+    Args:
+        path: SQLite database file
+        local_first: Answer searches from the catalog when it has enough matches
+        min_coverage: Fraction of the requested per_page that must match locally
+            before the API is skipped (1.0 = a full page)
+        max_photos: Maximum number of photos kept
+        ttl: Seconds a photo (and the queries that found it) is kept after it was last seen
+    """
+
+    # Seconds between evictions triggered by additions
+    EVICTION_INTERVAL = 60
+
+    def __init__(
+        self,
+        path: str = "cache/photo_catalog.db",
+        local_first: bool = False,
+        min_coverage: float = 1.0,
+        max_photos: int = 20000,
+        ttl: float = 86400
+    ):
+        self.path = path
+        self.local_first = local_first
+        self.min_coverage = min_coverage
+        self.max_photos = max_photos
+        self.ttl = ttl
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.fallbacks = 0
+        self.evicted = 0
+        self._last_eviction = 0.0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS photos ("
+                "id INTEGER PRIMARY KEY, width INTEGER NOT NULL, height INTEGER NOT NULL, "
+                "queries TEXT NOT NULL, data TEXT NOT NULL, seen_count INTEGER NOT NULL, last_seen REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS photos_fts USING fts5("
+                "description, queries, tokenize='porter unicode61')"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_photos_last_seen ON photos(last_seen)")
+            self._conn.commit()
+        self.evict()
+
+    def add(self, query: str, records: Iterable[PhotoRecord]) -> None:
+        """
+        Add or refresh photos returned by a Pexels search
+
+        Args:
+            query: The search query that returned the photos
+            records: Photos from the response
+        """
+        query = " ".join(content_words(query))
+        now = time.time()
+        with self._lock:
+            for record in records:
+                row = self._conn.execute("SELECT queries FROM photos WHERE id = ?", (record.id,)).fetchone()
+                queries = row[0].split("\n") if row and row[0] else []
+                if query and query not in queries:
+                    queries.append(query)
+                joined = "\n".join(queries)
+                self._conn.execute(
+                    "INSERT INTO photos (id, width, height, queries, data, seen_count, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET width = excluded.width, height = excluded.height, "
+                    "queries = excluded.queries, data = excluded.data, "
+                    "seen_count = seen_count + 1, last_seen = excluded.last_seen",
+                    (record.id, record.width, record.height, joined, json.dumps(record.to_dict()), now)
+                )
+                self._conn.execute("DELETE FROM photos_fts WHERE rowid = ?", (record.id,))
+                self._conn.execute(
+                    "INSERT INTO photos_fts (rowid, description, queries) VALUES (?, ?, ?)",
+                    (record.id, record.description, joined)
+                )
+            self._conn.commit()
+        if time.monotonic() - self._last_eviction > self.EVICTION_INTERVAL:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Delete photos not seen within the TTL, then the least recently seen ones beyond max_photos
+
+        Returns:
+            Number of photos deleted
+        """
+        self._last_eviction = time.monotonic()
+        stale = (
+            "SELECT id FROM photos WHERE last_seen < ? "
+            "UNION SELECT id FROM (SELECT id FROM photos ORDER BY last_seen DESC LIMIT -1 OFFSET ?)"
+        )
+        params = (time.time() - self.ttl, self.max_photos)
+        with self._lock:
+            self._conn.execute(f"DELETE FROM photos_fts WHERE rowid IN ({stale})", params)
+            deleted = self._conn.execute(f"DELETE FROM photos WHERE id IN ({stale})", params).rowcount
+            self._conn.commit()
+            self.evicted += deleted
+        if deleted:
+            logger.info("Evicted %s photo(s) from the photo catalog", deleted)
+        return deleted
+
+    def search(self, query: str, limit: int = 15, orientation: Optional[str] = None) -> List[PhotoRecord]:
+        """
+        Best local matches for a query: photos matching every content word, by BM25 rank
+
+        Args:
+            query: Search query string
+            limit: Maximum number of photos to return
+            orientation: Optional 'landscape', 'portrait' or 'square' filter
+
+        Returns:
+            Matching photo records, best first
+        """
+        terms = list(dict.fromkeys(content_words(query)))
+        if not terms:
+            return []
+        # Quoted terms are implicitly AND-ed and can't be parsed as FTS operators
+        match = " ".join(f'"{term}"' for term in terms)
+        sql = (
+            "SELECT p.data FROM photos_fts JOIN photos p ON p.id = photos_fts.rowid "
+            "WHERE photos_fts MATCH ?"
+        )
+        orientation = (orientation or "").lower()
+        if orientation == "landscape":
+            sql += " AND p.width > p.height"
+        elif orientation == "portrait":
+            sql += " AND p.height > p.width"
+        elif orientation == "square":
+            sql += " AND abs(p.width - p.height) <= 0.1 * max(p.width, p.height)"
+        sql += " ORDER BY bm25(photos_fts) LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, (match, limit)).fetchall()
+        return [PhotoRecord.from_dict(json.loads(row[0])) for row in rows]
+
+    def get(self, ids: Iterable[int]) -> Dict[int, PhotoRecord]:
+        """Photos with the given IDs that are in the catalog, by ID"""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+        placeholders = ", ".join("?" for _ in ids)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT data FROM photos WHERE id IN ({placeholders})", ids).fetchall()
+        records = [PhotoRecord.from_dict(json.loads(row[0])) for row in rows]
+        return {record.id: record for record in records}
+
+    def lookup(self, query: str, per_page: int, orientation: Optional[str] = None) -> Optional[List[PhotoRecord]]:
+        """
+        Answer a search locally when the catalog covers it well enough
+
+        Returns:
+            The local results, or None when the caller should fall back to the API
+        """
+        if not self.local_first:
+            return None
+        records = self.search(query, per_page, orientation)
+        needed = max(1, math.ceil(per_page * self.min_coverage))
+        with self._lock:
+            if len(records) >= needed:
+                self.local_hits += 1
+                return records
+            self.fallbacks += 1
+        logger.info("Photo catalog has %s/%s matches for '%s', falling back to Pexels", len(records), needed, query)
+        return None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM photos").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "photos": len(self),
+            "local_first": self.local_first,
+            "max_photos": self.max_photos,
+            "ttl": self.ttl,
+            "evicted": self.evicted,
+            "local_hits": self.local_hits,
+            "fallbacks": self.fallbacks,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_photo_catalog_from_env() -> Optional[PhotoCatalog]:
+    """
+    Build the local photo catalog configured by environment variables
+
+    PHOTO_CATALOG_ENABLED: 'true' (default) or 'false'
+    PHOTO_CATALOG_PATH: database file
+    PHOTO_CATALOG_LOCAL_FIRST: 'true' to answer covered searches without calling Pexels
+    PHOTO_CATALOG_MIN_COVERAGE: fraction of per_page needed locally (default 1.0)
+    PHOTO_CATALOG_MAX_PHOTOS: photos kept before the least recently seen are evicted (default 20000)
+    PHOTO_CATALOG_TTL: seconds a photo and its queries are kept after last being seen (default 86400)
+
+    Returns:
+        A catalog instance, or None when the catalog is disabled
+    """
+    if os.getenv("PHOTO_CATALOG_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        logger.info("Local photo catalog disabled")
+        return None
+    path = os.getenv("PHOTO_CATALOG_PATH", "cache/photo_catalog.db")
+    local_first = os.getenv("PHOTO_CATALOG_LOCAL_FIRST", "false").lower() in ("1", "true", "yes")
+    min_coverage = float(os.getenv("PHOTO_CATALOG_MIN_COVERAGE", "1.0"))
+    max_photos = int(os.getenv("PHOTO_CATALOG_MAX_PHOTOS", "20000"))
+    ttl = float(os.getenv("PHOTO_CATALOG_TTL", "86400"))
+    logger.info(
+        "Using local photo catalog at %s (local_first=%s, min_coverage=%s, max_photos=%s, ttl=%ss)",
+        path, local_first, min_coverage, max_photos, ttl
+    )
+    return PhotoCatalog(path=path, local_first=local_first, min_coverage=min_coverage, max_photos=max_photos, ttl=ttl)
@@ -0,0 +1,138 @@
+import os
+import math
+import contextvars
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Sequence
+from photo_records import PhotoRecord
+from prompt_text import content_words
+
+# Prompt of the job whose searches are being ranked (set around the crew run)
+_ranking_prompt = contextvars.ContextVar("ranking_prompt", default=None)
+
+# Target width/height ratio per orientation
+ORIENTATION_RATIOS = {"landscape": 1.5, "portrait": 2 / 3, "square": 1.0}
+
+# Prompt words that imply an orientation when the search did not ask for one
+ORIENTATION_HINTS = {
+    "banner": "landscape", "header": "landscape", "hero": "landscape", "wide": "landscape",
+    "panorama": "landscape", "panoramic": "landscape", "desktop": "landscape", "wallpaper": "landscape",
+    "slide": "landscape", "slides": "landscape", "presentation": "landscape",
+    "vertical": "portrait", "story": "portrait", "stories": "portrait", "poster": "portrait",
+    "mobile": "portrait", "phone": "portrait", "pinterest": "portrait",
+    "square": "square", "avatar": "square", "profile": "square", "instagram": "square",
+}
+
+# Score weights: text match, Pexels' own order, resolution, aspect-ratio fit
+WEIGHTS = (0.55, 0.2, 0.15, 0.1)
+
+
+@contextmanager
+def ranking_prompt(prompt: Optional[str]):
+    """Rank the Pexels results found in the with-block (and contexts copied from it) against this prompt"""
+    token = _ranking_prompt.set(prompt)
+    try:
+        yield
+    finally:
+        _ranking_prompt.reset(token)
+
+
+def top_k_from_env() -> int:
+    """Photos passed on to the curator per search (PEXELS_RANK_TOP_K, 0 disables ranking)"""
+    return int(os.getenv("PEXELS_RANK_TOP_K", "24"))
+
+
+def _overlap(words: set, target: set) -> float:
+    return len(words & target) / len(target) if target else 0.0
+
+
+def _resolution(record: PhotoRecord) -> float:
+    # Short side of 2000px or more is plenty for any use the agent is asked about
+    return min(1.0, min(record.width, record.height) / 2000) if record.width and record.height else 0.0
+
+
+def _aspect_fit(record: PhotoRecord, orientation: Optional[str]) -> float:
+    target = ORIENTATION_RATIOS.get((orientation or "").lower())
+    if target is None or not record.width or not record.height:
+        return 1.0
+    return max(0.0, 1.0 - abs(math.log((record.width / record.height) / target)))
+
+
+def infer_orientation(prompt: Optional[str]) -> Optional[str]:
+    """Orientation implied by the prompt's wording ('wide banner' -> landscape), if any"""
+    for word in content_words(prompt or ""):
+        if word in ORIENTATION_HINTS:
+            return ORIENTATION_HINTS[word]
+    return None
+
+
+def score_photos(
+    records: Sequence[PhotoRecord],
+    queries: Iterable[str],
+    prompt: Optional[str] = None,
+    orientation: Optional[str] = None,
+) -> List[float]:
+    """
+    Relevance score in [0, 1] for each candidate
+
+    Combines alt-text overlap with the prompt and search queries, the order
+    Pexels returned the photos in, resolution, and fit to the wanted orientation.
+    """
+    prompt_words = set(content_words(prompt or ""))
+    query_words = set(word for query in queries for word in content_words(query))
+    orientation = orientation or infer_orientation(prompt)
+    text_weight, order_weight, resolution_weight, aspect_weight = WEIGHTS
+    scores = []
+    for position, record in enumerate(records):
+        words = set(content_words(record.description))
+        if prompt_words:
+            text = 0.6 * _overlap(words, prompt_words) + 0.4 * _overlap(words, query_words)
+        else:
+            text = _overlap(words, query_words)
+        order = 1.0 - position / len(records)
+        scores.append(
+            text_weight * text
+            + order_weight * order
+            + resolution_weight * _resolution(record)
+            + aspect_weight * _aspect_fit(record, orientation)
+        )
+    return scores
+
+
+def rank_photos(
+    records: Sequence[PhotoRecord],
+    queries: Iterable[str],
+    top_k: Optional[int] = None,
+    orientation: Optional[str] = None,
+    prompt: Optional[str] = None,
+    diversity: float = 0.8,
+) -> List[PhotoRecord]:
+    """
+    Best top_k candidates, best first, spread across photographers
+
+    Each further photo by a photographer already picked has its score
+    multiplied by `diversity`, so one prolific photographer can't fill the list.
+
+    Args:
+        records: Candidates in the order Pexels returned them
+        queries: The search queries that found them
+        top_k: Photos to keep (default: PEXELS_RANK_TOP_K; 0 keeps all, unranked)
+        orientation: Wanted orientation, if the search asked for one
+        prompt: The user's prompt (default: the one set with ranking_prompt())
+
+    Returns:
+        The selected records
+    """
+    top_k = top_k_from_env() if top_k is None else top_k
+    if top_k <= 0 or len(records) <= top_k:
+        return list(records)
+    prompt = prompt if prompt is not None else _ranking_prompt.get()
+    scores = score_photos(records, queries, prompt, orientation)
+    remaining = list(range(len(records)))
+    picked_by = {}
+    selected = []
+    while remaining and len(selected) < top_k:
+        best = max(remaining, key=lambda i: scores[i] * diversity ** picked_by.get(records[i].photographer, 0))
+        remaining.remove(best)
+        selected.append(records[best])
+        picked_by[records[best].photographer] = picked_by.get(records[best].photographer, 0) + 1
+    return selected
@@ -0,0 +1,174 @@
+import os
+import json
+from dataclasses import dataclass, asdict
+from typing import Iterable, List, Optional, Sequence, Tuple
+from prompt_text import content_words
+
+# Field names match results_formatter.CuratedPhoto so the curator can copy them one-to-one
+ALL_FIELDS = (
+    "description", "id", "photographer", "photographer_url",
+    "size", "pexels_url", "thumbnail_url", "original_url",
+)
+
+# What the curator needs to choose by ID; URLs and attribution are filled in after curation
+CURATION_FIELDS = ("description", "id", "photographer", "size")
+
+
+@dataclass(slots=True)
+class PhotoRecord:
+    """Compact view of a Pexels photo: only the fields the pipeline uses."""
+    id: int
+    description: str
+    photographer: str
+    photographer_url: str
+    width: int
+    height: int
+    pexels_url: str
+    thumbnail_url: str
+    original_url: str
+
+    @classmethod
+    def from_api(cls, photo: dict) -> "PhotoRecord":
+        """Build a record from one entry of a Pexels API "photos" list"""
+        src = photo.get("src") or {}
+        return cls(
+            id=photo["id"],
+            description=photo.get("alt") or "No description available",
+            photographer=photo.get("photographer", ""),
+            photographer_url=photo.get("photographer_url", ""),
+            width=photo.get("width", 0),
+            height=photo.get("height", 0),
+            pexels_url=photo.get("url", ""),
+            thumbnail_url=src.get("medium", ""),
+            original_url=src.get("original", ""),
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PhotoRecord":
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def field_value(self, field: str):
+        if field == "size":
+            return f"{self.width}x{self.height}"
+        return getattr(self, field)
+
+
+@dataclass(frozen=True)
+class PhotoFilter:
+    """
+    Checks applied to search results as they arrive, so pagination can stop
+    as soon as enough photos qualify.
+
+    Args:
+        orientation: 'landscape', 'portrait' or 'square'
+        min_width: Minimum width in pixels
+        min_height: Minimum height in pixels
+        exclude: Terms whose words must not all appear in the description
+    """
+    orientation: Optional[str] = None
+    min_width: int = 0
+    min_height: int = 0
+    exclude: Tuple[str, ...] = ()
+
+    @classmethod
+    def create(cls, orientation: Optional[str] = None, min_width: Optional[int] = None,
+               min_height: Optional[int] = None, exclude: Optional[Iterable[str]] = None) -> Optional["PhotoFilter"]:
+        """Build a filter from tool arguments, or None when nothing is filtered"""
+        photo_filter = cls(
+            orientation=(orientation or "").lower() or None,
+            min_width=max(0, min_width or 0),
+            min_height=max(0, min_height or 0),
+            exclude=tuple(term.strip().lower() for term in exclude or () if term.strip()),
+        )
+        return photo_filter if photo_filter != cls() else None
+
+    def matches(self, record: PhotoRecord) -> bool:
+        if record.width < self.min_width or record.height < self.min_height:
+            return False
+        if self.orientation == "landscape" and record.width <= record.height:
+            return False
+        if self.orientation == "portrait" and record.height <= record.width:
+            return False
+        if self.orientation == "square" and abs(record.width - record.height) > 0.1 * max(record.width, record.height):
+            return False
+        if self.exclude:
+            words = set(content_words(record.description))
+            for term in self.exclude:
+                if words.issuperset(content_words(term) or [term]):
+                    return False
+        return True
+
+    def narrows_search(self) -> bool:
+        """Whether the filter drops results Pexels itself would return (orientation is filtered server-side)"""
+        return bool(self.min_width or self.min_height or self.exclude)
+
+    def key(self) -> str:
+        """Stable description for coalescing keys"""
+        return f"{self.orientation or ''}|{self.min_width}x{self.min_height}|{','.join(sorted(self.exclude))}"
+
+
+def fields_from_env() -> Sequence[str]:
+    """
+    Per-photo fields to include in tool output (PEXELS_PHOTO_FIELDS, comma separated)
+
+    Returns:
+        The configured fields in canonical order, or ALL_FIELDS when unset
+    """
+    configured = os.getenv("PEXELS_PHOTO_FIELDS")
+    if not configured:
+        return ALL_FIELDS
+    wanted = {f.strip() for f in configured.split(",")}
+    return tuple(f for f in ALL_FIELDS if f in wanted) or ALL_FIELDS
+
+
+def to_text(records: Iterable[PhotoRecord], fields: Optional[Sequence[str]] = None, start: int = 1) -> str:
+    """
+    Serialize records as short numbered lines for the LLM
+
+    Args:
+        records: Photos to serialize
+        fields: Fields to include (default: fields_from_env())
+        start: Number of the first line
+
+    Returns:
+        One "N. field: value | field: value" line per photo
+    """
+    fields = fields or fields_from_env()
+    return "\n".join(
+        f"{i}. " + " | ".join(f"{field}: {record.field_value(field)}" for field in fields)
+        for i, record in enumerate(records, start)
+    )
+
+
+def to_json(records: Iterable[PhotoRecord], fields: Optional[Sequence[str]] = None) -> str:
+    """
+    Serialize records as a JSON array for downstream code
+
+    Args:
+        records: Photos to serialize
+        fields: Fields to include (default: all record fields)
+
+    Returns:
+        JSON string
+    """
+    if not fields:
+        return json.dumps([record.to_dict() for record in records])
+    return json.dumps([{field: record.field_value(field) for field in fields} for record in records])
+
+
+SERIALIZERS = {
+    "text": to_text,
+    "json": to_json,
+}
+
+
+def serialize(records: List[PhotoRecord], output_format: str = "text", fields: Optional[Sequence[str]] = None) -> str:
+    """Serialize records with the named serializer ('text' or 'json')"""
+    try:
+        serializer = SERIALIZERS[output_format]
+    except KeyError:
+        raise ValueError(f"Unknown photo output format: {output_format}")
+    return serializer(records, fields)
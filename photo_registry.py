@@ -0,0 +1,94 @@
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+from logging_config import get_logger
+from metrics import PHOTO_LOOKUPS_TOTAL
+from pexels_client import fetch_photos
+from photo_records import PhotoRecord
+from results_formatter import CuratedPhoto, CuratedPicks, CuratedSelection
+
+logger = get_logger(__name__)
+
+# Registry of the job whose Pexels searches run in the current context (set around the crew run)
+_current_registry = contextvars.ContextVar("photo_registry", default=None)
+
+
+class PhotoRegistry:
+    """
+    Every photo the Pexels tools showed the curator during one job, by ID.
+
+    The curator answers with photo IDs only; URLs and attribution are filled
+    back in from here instead of being copied through the LLM.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._photos: Dict[int, PhotoRecord] = {}
+
+    def add(self, records: Iterable[PhotoRecord]) -> None:
+        with self._lock:
+            for record in records:
+                self._photos[record.id] = record
+
+    def get(self, photo_id: int) -> Optional[PhotoRecord]:
+        with self._lock:
+            return self._photos.get(photo_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._photos)
+
+
+@contextmanager
+def collecting_photos(registry: Optional[PhotoRegistry]):
+    """Record the photos shown by Pexels tools in the with-block (and contexts copied from it) in `registry`"""
+    token = _current_registry.set(registry)
+    try:
+        yield
+    finally:
+        _current_registry.reset(token)
+
+
+def current_photo_registry() -> Optional[PhotoRegistry]:
+    return _current_registry.get()
+
+
+def register_photos(records: Iterable[PhotoRecord]) -> None:
+    """Add photos to the current job's registry, if there is one"""
+    registry = _current_registry.get()
+    if registry is not None:
+        registry.add(records)
+
+
+def hydrate(picks: CuratedPicks, registry: Optional[PhotoRegistry] = None) -> CuratedSelection:
+    """
+    Fill the curator's photo IDs in with their details
+
+    IDs come from the job's registry (default: the current one); IDs it does
+    not have are looked up by ID on Pexels in one parallel, cached batch.
+    IDs that can't be found anywhere are dropped.
+    """
+    registry = registry if registry is not None else _current_registry.get()
+    ids = list(dict.fromkeys(picks.closest_matches + picks.varied_options))
+    records = {}
+    for photo_id in ids:
+        record = registry.get(photo_id) if registry is not None else None
+        if record is not None:
+            records[photo_id] = record
+    PHOTO_LOOKUPS_TOTAL.inc(len(records), source="registry")
+    missing = [photo_id for photo_id in ids if photo_id not in records]
+    if missing:
+        logger.info("Looking up %s curated photo(s) that were not in the job's search results", len(missing))
+        fetched = fetch_photos(missing)
+        records.update(fetched)
+        if registry is not None:
+            registry.add(fetched.values())
+    for photo_id in missing:
+        if photo_id not in records:
+            logger.warning("Dropping curated photo %s: no such Pexels photo", photo_id)
+
+    def photos(section):
+        return [CuratedPhoto(**records[photo_id].to_dict()) for photo_id in dict.fromkeys(section) if photo_id in records]
+
+    return CuratedSelection(closest_matches=photos(picks.closest_matches), varied_options=photos(picks.varied_options))
@@ -0,0 +1,53 @@
+import re
+from typing import List
+
+# Words that carry no search meaning in photo prompts
+STOP_WORDS = frozenset("""
+a an the and or but of for with without in on at to from by into onto over under
+near around about as is are be being been this that these those it its their our your
+my some any very really quite just more most much many lots lot kind sort type style
+photo photos picture pictures image images stock shot shots looking look show showing
+i we you me us need want find get please something like
+""".split())
+
+# Words that exclude what follows them; a canonical key must not lose them
+NEGATIONS = frozenset("no not without except excluding never".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric words of text, in order"""
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def content_words(text: str) -> List[str]:
+    """Tokens of text with stop words removed, in order (duplicates kept)"""
+    return [word for word in tokenize(text) if word not in STOP_WORDS]
+
+
+def canonical_prompt(text: str) -> str:
+    """
+    Canonical form of a prompt for cache lookups
+
+    Content words only, de-duplicated and sorted, so word order, case,
+    punctuation and filler words don't change the key. Words excluded by a
+    negation are kept apart as '-word' ('without people' -> '-people'), and a
+    negation carries over 'or'/'and'/'nor' ('no people or cars').
+    """
+    words = set()
+    negated = carried = False
+    for word in tokenize(text):
+        if word in NEGATIONS:
+            negated = True
+        elif word in ("or", "and", "nor"):
+            negated = negated or carried
+        elif word not in STOP_WORDS:
+            words.add("-" + word if negated else word)
+            carried, negated = negated, False
+    return " ".join(sorted(words))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    """Token-set similarity in [0, 1]"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
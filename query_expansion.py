@@ -0,0 +1,213 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from prompt_text import content_words, tokenize
+
+# Subject terms (single words or two-word phrases) and the search terms that find the same photos
+CONCEPTS: Dict[str, Tuple[str, ...]] = {
+    # Places
+    "office": ("workplace", "coworking space", "business team"),
+    "coffee shop": ("cafe", "coffee bar", "barista"),
+    "cafe": ("coffee shop", "coffee bar"),
+    "restaurant": ("dining", "bistro", "chef"),
+    "kitchen": ("cooking", "home kitchen"),
+    "home": ("house interior", "living room"),
+    "living room": ("home interior", "sofa"),
+    "bedroom": ("bed", "home interior"),
+    "city": ("urban", "downtown", "skyline"),
+    "street": ("city street", "urban"),
+    "beach": ("seaside", "ocean shore", "coast"),
+    "ocean": ("sea", "waves"),
+    "forest": ("woods", "trees"),
+    "mountain": ("mountains", "peak", "alpine"),
+    "mountains": ("mountain", "peaks", "alpine"),
+    "trail": ("path", "hiking trail"),
+    "lake": ("lakeside", "water"),
+    "desert": ("sand dunes", "arid"),
+    "park": ("garden", "green space"),
+    "garden": ("plants", "backyard"),
+    "classroom": ("school", "students"),
+    "hospital": ("healthcare", "clinic"),
+    "gym": ("fitness", "workout"),
+    "farm": ("agriculture", "countryside"),
+    "market": ("marketplace", "market stall"),
+    "studio": ("workspace", "creative studio"),
+    "startup": ("tech company", "entrepreneurs"),
+    # Activities
+    "hiking": ("hiker", "trekking", "backpacking"),
+    "running": ("runner", "jogging"),
+    "cycling": ("bicycle", "cyclist"),
+    "yoga": ("meditation", "stretching"),
+    "meeting": ("business meeting", "conference"),
+    "collaborating": ("teamwork", "collaboration"),
+    "collaboration": ("teamwork", "working together"),
+    "teamwork": ("collaboration", "team"),
+    "working": ("work", "workspace"),
+    "cooking": ("chef", "kitchen"),
+    "travel": ("traveler", "journey", "vacation"),
+    "camping": ("tent", "campfire"),
+    "surfing": ("surfer", "waves"),
+    "reading": ("book", "reader"),
+    "shopping": ("shopper", "retail"),
+    "celebration": ("party", "celebrating"),
+    "wedding": ("bride", "ceremony"),
+    "adventure": ("explorer", "expedition"),
+    "outdoor": ("outdoors", "nature"),
+    "outdoors": ("outdoor", "nature"),
+    # People
+    "team": ("colleagues", "coworkers"),
+    "family": ("parents", "children"),
+    "people": ("group", "crowd"),
+    "woman": ("female", "girl"),
+    "man": ("male", "guy"),
+    "child": ("kid", "children"),
+    "children": ("kids", "child"),
+    "students": ("student", "learning"),
+    "doctor": ("physician", "medical"),
+    "diverse": ("multicultural", "diversity"),
+    # Things
+    "coffee": ("espresso", "latte", "coffee cup"),
+    "laptop": ("computer", "notebook computer"),
+    "tech": ("technology", "digital"),
+    "technology": ("tech", "digital"),
+    "food": ("meal", "dish"),
+    "car": ("automobile", "vehicle"),
+    "dog": ("puppy", "pet"),
+    "cat": ("kitten", "pet"),
+    "flowers": ("flower", "blossom", "bouquet"),
+    "books": ("book", "library"),
+    "sunset": ("dusk", "golden hour"),
+    "sunrise": ("dawn", "morning light"),
+    "snow": ("winter", "snowy"),
+    "rain": ("rainy", "raindrops"),
+    "night": ("nighttime", "city lights"),
+    "sky": ("clouds", "blue sky"),
+    "water": ("river", "lake"),
+    "plants": ("greenery", "houseplants"),
+}
+
+# Mood and style words: searched alongside the subject rather than on their own
+MOODS = frozenset("""
+cozy warm calm serene peaceful moody dark bright vibrant colorful cheerful happy joyful
+energetic dramatic romantic nostalgic mysterious relaxing relaxed busy quiet lonely
+fresh clean elegant luxurious luxury rustic playful professional friendly inviting
+""".split())
+STYLES = frozenset("""
+minimalist minimal modern vintage retro aerial closeup macro candid cinematic
+monochrome film bokeh blurred abstract flatlay overhead silhouette natural
+lighting light lit golden sunny misty foggy
+""".split())
+
+# Words asking for an idea rather than a depicted scene, and negations a keyword search can't express
+ABSTRACT_WORDS = frozenset("""
+concept conceptual represent represents representing representation metaphor symbol symbolizing
+symbolize idea ideas feeling emotion emotions meaning success freedom growth innovation
+future hope strategy vision
+""".split())
+NEGATIONS = frozenset("no not without except avoid excluding never".split())
+
+# Words that describe the request rather than what is in the photo
+FILLER = frozenset("atmosphere vibe vibes mood aesthetic feel feeling setting scene background theme".split())
+
+
+@dataclass
+class QueryExpansion:
+    """Search queries derived from a prompt, and how far they can be trusted to stand in for the analyst."""
+    queries: List[str]
+    confidence: float
+    subjects: List[str] = field(default_factory=list)
+    moods: List[str] = field(default_factory=list)
+
+    def as_text(self) -> str:
+        """The queries as a numbered list, for the curator's task description"""
+        return "\n".join(f"{number}. {query}" for number, query in enumerate(self.queries, 1))
+
+
+def min_confidence_from_env() -> float:
+    """
+    Confidence at or above which the analyst LLM is skipped
+
+    QUERY_EXPANSION: 'auto' (default) uses the rule-based queries when they are
+        confident enough, 'llm' always runs the analyst
+    QUERY_EXPANSION_MIN_CONFIDENCE: threshold for 'auto' (default 0.6)
+    """
+    if os.getenv("QUERY_EXPANSION", "auto").lower() == "llm":
+        return float("inf")
+    return float(os.getenv("QUERY_EXPANSION_MIN_CONFIDENCE", "0.6"))
+
+
+def _terms(words: List[str]) -> List[str]:
+    """Merge adjacent words that form a known two-word concept ('coffee shop')"""
+    terms = []
+    index = 0
+    while index < len(words):
+        pair = " ".join(words[index:index + 2])
+        if index + 1 < len(words) and pair in CONCEPTS:
+            terms.append(pair)
+            index += 2
+        else:
+            terms.append(words[index])
+            index += 1
+    return terms
+
+
+def _confidence(terms: List[str], subjects: List[str], tokens: List[str]) -> float:
+    if not subjects:
+        return 0.0
+    words = len(" ".join(terms).split())
+    # Short concrete prompts are what keyword search handles well; long briefs need the analyst
+    if words == 1:
+        length = 0.6
+    elif words <= 6:
+        length = 1.0
+    else:
+        length = max(0.0, 1.0 - 0.15 * (words - 6))
+    known = sum(1 for term in terms if term in CONCEPTS or term in MOODS or term in STYLES)
+    coverage = known / len(terms)
+    penalty = 0.5 if ABSTRACT_WORDS.intersection(tokens) or NEGATIONS.intersection(tokens) else 1.0
+    return round(length * (0.5 + 0.5 * coverage) * penalty, 3)
+
+
+def expand_query(prompt: str, max_queries: int = 4) -> QueryExpansion:
+    """
+    Turn a prompt into 2-4 Pexels search queries without an LLM
+
+    Keeps the content words, splits mood/style words from subject terms, and
+    varies the subject with the concept table. The confidence in [0, 1] is
+    high for short prompts made of known concrete terms, and low for long
+    briefs, abstract ideas and negations, which need the analyst.
+    """
+    tokens = tokenize(prompt)
+    terms = _terms([word for word in dict.fromkeys(content_words(prompt)) if word not in FILLER])
+    subjects = [term for term in terms if term not in MOODS and term not in STYLES]
+    moods = [term for term in terms if term in MOODS or term in STYLES]
+    confidence = _confidence(terms, subjects, tokens)
+    if not subjects:
+        return QueryExpansion([], confidence, subjects, moods)
+
+    # Up to four subject words per query: Pexels matches short queries best
+    core = []
+    for term in subjects:
+        if core and len(" ".join(core + [term]).split()) > 4:
+            break
+        core.append(term)
+    # Swap one subject term for a synonym per variant, first synonyms of every term before second ones
+    variants = [
+        " ".join(core[:index] + [synonyms[rank]] + core[index + 1:])
+        for rank in range(2)
+        for index, synonyms in enumerate(CONCEPTS.get(term, ()) for term in core)
+        if len(synonyms) > rank
+    ]
+    moody = [" ".join(moods[1:3] + core[-2:])] if len(moods) > 1 else []
+    candidates = [" ".join(moods[:1] + core), *variants[:1], *moody, *variants[1:], " ".join(core)]
+
+    queries = []
+    for query in candidates:
+        query = " ".join(dict.fromkeys(query.split()))
+        if query and query not in queries:
+            queries.append(query)
+        if len(queries) == max_queries:
+            break
+    if len(queries) < 2:
+        confidence = min(confidence, 0.5)
+    return QueryExpansion(queries, confidence, subjects, moods)
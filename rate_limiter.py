@@ -0,0 +1,181 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Mapping, Optional
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Lower numbers are served first: single paid jobs, then the items of batch jobs
+PRIORITY_PAID = 0
+PRIORITY_BATCH = 5
+
+# Priority of outbound requests made in the current context (single paid job unless said otherwise)
+_request_priority = contextvars.ContextVar("request_priority", default=PRIORITY_PAID)
+
+
+def current_priority() -> int:
+    return _request_priority.get()
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Run the with-block's rate-limited requests at the given priority"""
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+class RateLimitTimeout(RuntimeError):
+    """Raised when a request could not get a rate-limit slot within max_wait."""
+
+
+class PriorityTokenBucket:
+    """
+    Thread-safe token bucket shared by every request to one API.
+
+    Waiting callers are served strictly in (priority, arrival) order, so a
+    single job is never stuck behind the searches of a large batch. The bucket also follows the
+    API's quota headers: when the server reports no remaining requests (or a
+    429 asks us to back off), every caller pauses until the reported reset.
+
+    Args:
+        rate: Tokens added per second
+        capacity: Maximum burst size
+        max_wait: Seconds a caller may wait before RateLimitTimeout is raised
+    """
+
+    def __init__(self, rate: float, capacity: float, max_wait: float = 30.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.acquired = 0
+        self.throttled = 0
+        self.timeouts = 0
+        self.quota_limit: Optional[int] = None
+        self.quota_remaining: Optional[int] = None
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority: int = PRIORITY_PAID, timeout: Optional[float] = None) -> float:
+        """
+        Take one token, waiting behind higher-priority and earlier callers
+
+        Args:
+            priority: Lower is served first (see PRIORITY_*)
+            timeout: Seconds to wait at most (default: max_wait)
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            RateLimitTimeout: If no token became available in time
+        """
+        start = time.monotonic()
+        deadline = start + (self.max_wait if timeout is None else timeout)
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            waited = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    at_head = self._waiters[0] == ticket
+                    if at_head and now >= self._blocked_until and self._tokens >= 1:
+                        self._tokens -= 1
+                        heapq.heappop(self._waiters)
+                        self.acquired += 1
+                        if waited:
+                            self.throttled += 1
+                        self._cond.notify_all()
+                        return now - start
+                    ready_at = max(self._blocked_until, now + (1 - self._tokens) / self.rate)
+                    if ready_at > deadline:
+                        # Fail fast instead of sleeping through a wait that can't succeed
+                        self.timeouts += 1
+                        raise RateLimitTimeout(f"rate limit slot not available within {deadline - start:.1f}s")
+                    waited = True
+                    self._cond.wait((ready_at - now) if at_head else (deadline - now))
+            except BaseException:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                raise
+
+    def block_for(self, seconds: float) -> None:
+        """Pause every caller for the given number of seconds (e.g. after a 429)"""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Track the quota reported by the API (X-Ratelimit-Limit / -Remaining / -Reset)
+
+        When nothing remains, callers are paused until the reset time.
+        """
+        try:
+            if "X-Ratelimit-Limit" in headers:
+                self.quota_limit = int(headers["X-Ratelimit-Limit"])
+            if "X-Ratelimit-Remaining" in headers:
+                self.quota_remaining = int(headers["X-Ratelimit-Remaining"])
+            reset = float(headers["X-Ratelimit-Reset"]) if "X-Ratelimit-Reset" in headers else None
+        except ValueError:
+            return
+        if self.quota_remaining is not None and self.quota_remaining <= 0 and reset:
+            wait = reset - time.time()
+            if wait > 0:
+                logger.warning("API quota exhausted, pausing requests for %.0fs", wait)
+                self.block_for(wait)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "rate": self.rate,
+                "capacity": self.capacity,
+                "tokens": round(self._tokens, 2),
+                "waiting": len(self._waiters),
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "timeouts": self.timeouts,
+                "quota_limit": self.quota_limit,
+                "quota_remaining": self.quota_remaining,
+            }
+
+
+def create_rate_limiter_from_env() -> Optional[PriorityTokenBucket]:
+    """
+    Build the Pexels request limiter configured by environment variables
+
+    PEXELS_RATE_LIMIT_ENABLED: 'true' (default) or 'false'
+    PEXELS_RATE_PER_SECOND: sustained requests per second (default 5)
+    PEXELS_RATE_BURST: burst size (default 10)
+    PEXELS_RATE_MAX_WAIT: seconds a request may wait for a slot (default 30)
+
+    Returns:
+        A limiter instance, or None when rate limiting is disabled
+    """
+    if os.getenv("PEXELS_RATE_LIMIT_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        logger.info("Pexels rate limiting disabled")
+        return None
+    rate = float(os.getenv("PEXELS_RATE_PER_SECOND", "5"))
+    burst = float(os.getenv("PEXELS_RATE_BURST", "10"))
+    max_wait = float(os.getenv("PEXELS_RATE_MAX_WAIT", "30"))
+    logger.info("Pexels rate limit: %s req/s, burst %s, max wait %ss", rate, burst, max_wait)
+    return PriorityTokenBucket(rate=rate, capacity=burst, max_wait=max_wait)
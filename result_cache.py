@@ -0,0 +1,113 @@
+import os
+import threading
+from typing import Optional
+from logging_config import get_logger
+from pexels_cache import MemoryCache
+from prompt_text import canonical_prompt, jaccard
+
+logger = get_logger(__name__)
+
+
+class ResultCache:
+    """
+    Whole-job result cache keyed on the canonical prompt.
+
+    Exact matches are looked up by key; otherwise, when a similarity threshold
+    below 1 is set, the cached prompt with the highest token-set (Jaccard)
+    similarity at or above the threshold is used. Entries are bounded by size
+    (LRU) and TTL.
+
+    Args:
+        max_size: Maximum number of cached results
+        ttl: Seconds a result stays valid
+        similarity_threshold: Minimum Jaccard similarity for a near-duplicate hit (1.0 = exact only)
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 21600, similarity_threshold: float = 1.0):
+        self._cache = MemoryCache(max_size=max_size, ttl=ttl)
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+    def get(self, prompt: str) -> Optional[str]:
+        """
+        Look up a cached result for the prompt
+
+        Returns:
+            The cached result string, or None on a miss
+        """
+        key = canonical_prompt(prompt)
+        entry = self._cache.get(key)
+        hit_kind = "exact"
+        if entry is None and self.similarity_threshold < 1.0:
+            entry = self._near_duplicate(key)
+            hit_kind = "near"
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if hit_kind == "exact":
+                self.exact_hits += 1
+            else:
+                self.near_hits += 1
+            self.seconds_saved += entry["duration"]
+        logger.info("Result cache %s hit for prompt '%s'", hit_kind, prompt[:100])
+        return entry["result"]
+
+    def _near_duplicate(self, key: str) -> Optional[dict]:
+        tokens = frozenset(key.split())
+        best_key, best_score = None, self.similarity_threshold
+        for candidate in self._cache.keys():
+            score = jaccard(tokens, frozenset(candidate.split()))
+            if score >= best_score:
+                best_key, best_score = candidate, score
+        return self._cache.get(best_key) if best_key is not None else None
+
+    def set(self, prompt: str, result: str, duration: float) -> None:
+        """
+        Store a finished job's result
+
+        Args:
+            prompt: The original prompt
+            result: The result string returned to the buyer
+            duration: Seconds the crew took, counted as saved on each later hit
+        """
+        self._cache.set(canonical_prompt(prompt), {"result": result, "duration": duration})
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            hits = self.exact_hits + self.near_hits
+            return {
+                "size": len(self._cache),
+                "max_size": self._cache.max_size,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "seconds_saved": round(self.seconds_saved, 2),
+            }
+
+
+def create_result_cache_from_env() -> Optional[ResultCache]:
+    """
+    Build the job result cache configured by environment variables
+
+    RESULT_CACHE_ENABLED: 'true' (default) or 'false'
+    RESULT_CACHE_SIZE, RESULT_CACHE_TTL: entry bound and TTL in seconds
+    RESULT_CACHE_SIMILARITY: near-duplicate threshold, e.g. 0.8 (default 1.0: exact matches only)
+    """
+    if os.getenv("RESULT_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        logger.info("Job result cache disabled")
+        return None
+    size = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+    similarity = float(os.getenv("RESULT_CACHE_SIMILARITY", "1.0"))
+    logger.info("Job result cache enabled (size=%s, similarity=%s)", size, similarity)
+    return ResultCache(
+        max_size=size,
+        ttl=float(os.getenv("RESULT_CACHE_TTL", "21600")),
+        similarity_threshold=similarity
+    )
@@ -0,0 +1,66 @@
+import html
+from typing import List
+from pydantic import BaseModel, Field
+
+ATTRIBUTION_NOTE = (
+    "Photos provided by Pexels. "
+    "Please provide attribution by linking to the photographer's Pexels profile."
+)
+
+
+class CuratedPhoto(BaseModel):
+    """One photo selected by the curator, copied from the Pexels search results."""
+    id: int = Field(..., description="Pexels photo ID")
+    description: str = Field(..., description="Photo description (alt text)")
+    photographer: str = Field(..., description="Photographer name")
+    photographer_url: str = Field(..., description="Photographer's Pexels profile URL")
+    width: int = Field(..., description="Width in pixels")
+    height: int = Field(..., description="Height in pixels")
+    pexels_url: str = Field(..., description="Pexels page URL")
+    thumbnail_url: str = Field(..., description="Thumbnail URL")
+    original_url: str = Field(..., description="Original download URL")
+
+
+class CuratedPicks(BaseModel):
+    """The curator's picks by Pexels photo ID; details are filled in from the search results afterwards."""
+    closest_matches: List[int] = Field(..., description="IDs of 2-3 photos that most directly match the request")
+    varied_options: List[int] = Field(..., description="IDs of 2-3 related photos offering more variety")
+
+
+class CuratedSelection(BaseModel):
+    """The curator's picks, split into the two result sections."""
+    closest_matches: List[CuratedPhoto] = Field(..., description="2-3 photos that most directly match the request")
+    varied_options: List[CuratedPhoto] = Field(..., description="2-3 related photos offering more variety")
+
+
+def render_photo(photo: CuratedPhoto) -> str:
+    """Render one photo as an inline thumbnail followed by its details"""
+    alt = html.escape(photo.description, quote=True)
+    return (
+        f'<img src="{html.escape(photo.thumbnail_url, quote=True)}" alt="{alt}" width="200" '
+        f'style="vertical-align:middle; margin-right:10px;" /> '
+        f'**{photo.description}** | Photographer: [{photo.photographer}]({photo.photographer_url}) | '
+        f'Dimensions: {photo.width}x{photo.height} | [Pexels]({photo.pexels_url}) | [Original]({photo.original_url})'
+    )
+
+
+def render_results(selection: CuratedSelection) -> str:
+    """
+    Render the curated selection in the same layout the formatter agent produces
+
+    Args:
+        selection: Structured curator output
+
+    Returns:
+        Markdown/HTML string with "## Closest Matches" and "## More Varied Options" sections
+    """
+    sections = [
+        ("## Closest Matches", selection.closest_matches),
+        ("## More Varied Options", selection.varied_options),
+    ]
+    parts = []
+    for header, photos in sections:
+        parts.append(header)
+        parts.append("\n\n".join(render_photo(photo) for photo in photos) or "_No photos in this section._")
+    parts.append(ATTRIBUTION_NOTE)
+    return "\n\n".join(parts) + "\n"
@@ -0,0 +1,78 @@
+import os
+import time
+import importlib
+import threading
+from typing import Dict, Iterable
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Reference point for every startup number: when the app module began importing
+_started = time.perf_counter()
+_lock = threading.Lock()
+_milestones: Dict[str, float] = {}
+_imports: Dict[str, float] = {}
+
+
+def _process_age() -> float:
+    """Seconds since the process was created (falls back to this module's import time off Linux)"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = float(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter() - _started
+
+
+# Interpreter start-up and imports before this module count towards cold start too
+_started -= max(0.0, _process_age() - (time.perf_counter() - _started))
+
+
+def mark(milestone: str) -> float:
+    """
+    Record that a startup milestone was reached (first call wins)
+
+    Returns:
+        Seconds since the process started
+    """
+    elapsed = round(time.perf_counter() - _started, 3)
+    with _lock:
+        elapsed = _milestones.setdefault(milestone, elapsed)
+    logger.info("Startup milestone '%s' reached after %.2fs", milestone, elapsed)
+    return elapsed
+
+
+def reached(milestone: str) -> bool:
+    with _lock:
+        return milestone in _milestones
+
+
+def import_timed(name: str):
+    """Import a module, recording how long it took if this call loaded it"""
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - started
+    with _lock:
+        _imports.setdefault(name, round(elapsed, 3))
+    return module
+
+
+def warm_imports(modules: Iterable[str]) -> None:
+    """Import heavy modules (in order) so the first request that needs them doesn't pay for it"""
+    for name in modules:
+        try:
+            import_timed(name)
+        except Exception as e:
+            logger.warning("Could not pre-import %s: %s", name, e)
+
+
+def report() -> dict:
+    """Milestones and timed imports, in seconds since the process started"""
+    with _lock:
+        return {
+            "uptime": round(time.perf_counter() - _started, 3),
+            "milestones": dict(_milestones),
+            "imports": dict(_imports),
+        }
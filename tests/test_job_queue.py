@@ -0,0 +1,94 @@
+import time
+import asyncio
+
+from job_queue import QueueWorker, SQLiteJobQueue
+
+
+def make_queue(tmp_path, **kwargs):
+    return SQLiteJobQueue(path=str(tmp_path / "queue.db"), retry_delay=0, **kwargs)
+
+
+def test_expired_lease_is_leased_again(tmp_path):
+    queue = make_queue(tmp_path, visibility_timeout=0.05, max_attempts=3)
+    queue.enqueue("job-1", {"payment_id": "p1"})
+
+    first = queue.lease("worker-a")
+    assert first["job_id"] == "job-1"
+    assert first["attempts"] == 1
+    assert queue.lease("worker-b") is None
+
+    time.sleep(0.1)
+    second = queue.lease("worker-b")
+    assert second["job_id"] == "job-1"
+    assert second["attempts"] == 2
+    assert second["payload"] == {"payment_id": "p1"}
+    # The first worker lost the lease and may no longer extend it
+    assert not queue.extend("job-1", "worker-a")
+    assert queue.extend("job-1", "worker-b")
+
+
+def test_lease_expiring_on_last_attempt_marks_entry_dead(tmp_path):
+    queue = make_queue(tmp_path, visibility_timeout=0.05, max_attempts=1)
+    queue.enqueue("job-1", {})
+    assert queue.lease("worker-a") is not None
+
+    time.sleep(0.1)
+    assert queue.lease("worker-b") is None
+    assert queue.expire_leases() == ["job-1"]
+    assert queue.expire_leases() == []
+    assert queue.stats() == {"queued": 0, "leased": 0, "done": 0, "dead": 1}
+
+
+def test_worker_gives_up_on_expired_last_attempt(tmp_path):
+    queue = make_queue(tmp_path, visibility_timeout=0.05, max_attempts=1)
+    queue.enqueue("job-1", {})
+    queue.lease("crashed-worker")
+    time.sleep(0.1)
+    expired = []
+
+    async def on_expired(job_id, error):
+        expired.append(job_id)
+
+    async def handler(job_id, payload, attempt, last_attempt):
+        raise AssertionError("an expired last attempt must not run again")
+
+    async def run():
+        worker = QueueWorker(queue, handler, poll_interval=0.01, on_expired=on_expired)
+        task = asyncio.create_task(worker.run())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert expired == ["job-1"]
+    assert queue.stats()["dead"] == 1
+
+
+def test_worker_cancels_handler_when_lease_is_lost(tmp_path, monkeypatch):
+    queue = make_queue(tmp_path, visibility_timeout=0.15, max_attempts=3)
+    queue.enqueue("job-1", {})
+    monkeypatch.setattr(queue, "extend", lambda job_id, owner: False)
+
+    async def run():
+        stopped = asyncio.Event()
+
+        async def handler(job_id, payload, attempt, last_attempt):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+        worker = QueueWorker(queue, handler, poll_interval=0.01)
+        task = asyncio.create_task(worker.run())
+        await asyncio.wait_for(stopped.wait(), 2)
+        await asyncio.sleep(0.01)
+        assert not task.done()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return worker
+
+    worker = asyncio.run(run())
+    # Neither completed nor failed: the entry stays with whoever holds its lease
+    assert (worker.completed, worker.failed) == (0, 0)
+    assert queue.stats()["leased"] == 1
@@ -0,0 +1,42 @@
+import threading
+
+import pytest
+
+from job_store import MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = MemoryJobStore() if request.param == "memory" else SQLiteJobStore(str(tmp_path / "jobs.db"))
+    yield store
+    store.close()
+
+
+def test_update_if_loses_race_on_stale_expectation(store):
+    store.create("job-1", {"status": "awaiting_payment", "paid": []})
+
+    # Two processes claim the same paid job: only the first wins
+    assert store.update_if("job-1", {"status": "awaiting_payment"}, status="running", runner="a")["runner"] == "a"
+    assert store.update_if("job-1", {"status": "awaiting_payment"}, status="running", runner="b") is None
+    assert store.get("job-1")["runner"] == "a"
+
+
+def test_update_if_missing_job(store):
+    assert store.update_if("missing", {}, status="running") is None
+
+
+def test_concurrent_compare_and_set_loses_no_updates(store):
+    store.create("job-1", {"status": "awaiting_payment", "paid": []})
+
+    def confirm(payment_id):
+        while True:
+            paid = store.get("job-1")["paid"]
+            if store.update_if("job-1", {"paid": paid}, paid=paid + [payment_id]) is not None:
+                return
+
+    threads = [threading.Thread(target=confirm, args=(f"p{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(store.get("job-1")["paid"]) == sorted(f"p{i}" for i in range(8))
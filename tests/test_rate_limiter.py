@@ -0,0 +1,87 @@
+import time
+import threading
+
+import httpx
+import pytest
+
+import pexels_client
+from rate_limiter import PRIORITY_BATCH, PRIORITY_PAID, PriorityTokenBucket, RateLimitTimeout
+
+
+def wait_for_waiters(bucket, count):
+    deadline = time.monotonic() + 2
+    while bucket.stats()["waiting"] < count:
+        assert time.monotonic() < deadline, "waiter never queued"
+        time.sleep(0.005)
+
+
+def test_paid_waiter_is_served_before_earlier_batch_waiter():
+    bucket = PriorityTokenBucket(rate=4, capacity=1, max_wait=5)
+    bucket.acquire()
+    served = []
+
+    def take(priority, name):
+        bucket.acquire(priority)
+        served.append(name)
+
+    batch = threading.Thread(target=take, args=(PRIORITY_BATCH, "batch"))
+    batch.start()
+    wait_for_waiters(bucket, 1)
+    paid = threading.Thread(target=take, args=(PRIORITY_PAID, "paid"))
+    paid.start()
+    wait_for_waiters(bucket, 2)
+    batch.join()
+    paid.join()
+    assert served == ["paid", "batch"]
+
+
+def test_times_out_when_quota_reset_is_past_max_wait():
+    bucket = PriorityTokenBucket(rate=100, capacity=10, max_wait=1)
+    bucket.update_from_headers({
+        "X-Ratelimit-Limit": "200", "X-Ratelimit-Remaining": "0", "X-Ratelimit-Reset": str(time.time() + 60)
+    })
+    started = time.monotonic()
+    with pytest.raises(RateLimitTimeout):
+        bucket.acquire()
+    # Fails fast instead of sleeping through max_wait
+    assert time.monotonic() - started < 0.5
+    assert bucket.stats()["timeouts"] == 1
+
+
+def test_waits_for_quota_reset_within_max_wait():
+    bucket = PriorityTokenBucket(rate=100, capacity=10, max_wait=5)
+    bucket.update_from_headers({"X-Ratelimit-Remaining": "0", "X-Ratelimit-Reset": str(time.time() + 0.2)})
+    assert bucket.acquire() >= 0.1
+
+
+@pytest.fixture
+def pexels(monkeypatch):
+    """Routes pexels_client requests to a handler, with a fresh rate limiter"""
+    monkeypatch.setenv("PEXELS_RATE_PER_SECOND", "100")
+    monkeypatch.setenv("PEXELS_RATE_MAX_WAIT", "2")
+    monkeypatch.setenv("PEXELS_BACKOFF_MAX", "0.01")
+    monkeypatch.setattr(pexels_client, "_rate_limiter", None)
+    monkeypatch.setattr(pexels_client, "_rate_limiter_ready", False)
+
+    def route(handler):
+        monkeypatch.setattr(pexels_client, "_http_client", httpx.Client(transport=httpx.MockTransport(handler)))
+
+    return route
+
+
+def test_retry_after_past_max_wait_raises(pexels):
+    pexels(lambda request: httpx.Response(429, headers={"Retry-After": "60"}))
+    with pytest.raises(RateLimitTimeout):
+        pexels_client.pexels_get("https://pexels.test/v1/search", {}, {})
+    # Every other request backs off for the full Retry-After too
+    with pytest.raises(RateLimitTimeout):
+        pexels_client.get_rate_limiter().acquire()
+
+
+def test_retry_after_is_honoured_in_full(pexels):
+    responses = iter([httpx.Response(429, headers={"Retry-After": "0.3"}), httpx.Response(200, json={})])
+    pexels(lambda request: next(responses))
+    started = time.monotonic()
+    assert pexels_client.pexels_get("https://pexels.test/v1/search", {}, {}).status_code == 200
+    # Not cut down to PEXELS_BACKOFF_MAX
+    assert time.monotonic() - started >= 0.3